@@ -0,0 +1,398 @@
+"""
+Banc de charge reproductible contre un serveur lancé (uvicorn main:app).
+
+    python seed_fake_data_metier.py --leads 100000   # 10k / 100k / 1M leads
+    uvicorn main:app                                 # migre la base au démarrage
+    python load_test.py --scenario workflow --agents 20 --duration 60 --json bench.json
+    python load_test.py --compare avant.json apres.json
+
+Scénarios :
+- workflow : chaque agent enchaîne le parcours réel, /lead -> /action (avec relance)
+  -> /relances -> /relances/next -> /relance/{call_id}/complete ; --pollers threads
+  rafraîchissent le dashboard comme les écrans ouverts.
+- mixed : lectures (relances, leads, calls, dashboard) et, selon --write-ratio,
+  des écritures (lead, action avec relance, complétion).
+
+Affiche le débit et la latence p50 / p95 / p99 par route, puis le verrou d'écriture
+SQLite pendant le banc (compteurs du writer relevés sur /health/db avant et après : un
+seul processus serveur par --base-url) ; --json écrit le même rapport (avec le commit
+git) pour comparer deux versions avec --compare.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+PROJETS = ["Colisée", "Nohée"]
+TYPES = ["Web", "Appel entrant"]
+RESULTS = ["Pas de réponse", "Injoignable", "À rappeler", "Qualifié"]
+NON_DEFINITIFS = ["Pas de réponse", "Injoignable", "À rappeler"]
+DEFINITIFS = ["Qualifié", "Pas intéressé", "Annulé"]
+
+print_lock = threading.Lock()
+
+
+def request(base_url, method, path, body=None, timeout=30):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(
+        base_url + path, data=data, method=method,
+        headers={"Content-Type": "application/json"} if data else {}
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.status, json.loads(resp.read() or b"null")
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def summarize(values, errors, elapsed):
+    values = sorted(values)
+    return {
+        "n": len(values),
+        "errors": errors,
+        "rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "mean": round(sum(values) / len(values), 2) if values else 0.0,
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(values[-1], 2) if values else 0.0,
+    }
+
+
+def git_commit():
+    """Commit du serveur testé (best effort) : le rapport dit quelle version il mesure"""
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def writer_stats(base_url):
+    """Compteurs du writer exposés par /health/db ; None si indisponibles"""
+    try:
+        return request(base_url, "GET", "/health/db")[1].get("writer")
+    except (urllib.error.URLError, OSError, ValueError, AttributeError):
+        return None
+
+
+def writer_delta(before, after):
+    """Écritures, reprises SQLITE_BUSY et verrou d'écriture (attente, détention) pendant le banc"""
+    if not before or not after:
+        return None
+    delta = {k: after[k] - before[k] for k in ("writes", "failed", "busy_retries")}
+    for k in ("lock_wait_ms_total", "lock_hold_ms_total"):
+        if k in after:  # détention mesurée depuis la UnitOfWork du writer
+            delta[k] = round(after[k] - before[k], 1)
+    writes = delta["writes"] or 1
+    delta["lock_wait_ms_mean"] = round(delta["lock_wait_ms_total"] / writes, 3)
+    if "lock_hold_ms_total" in delta:
+        delta["lock_hold_ms_mean"] = round(delta["lock_hold_ms_total"] / writes, 3)
+    return delta
+
+
+def format_writer(w):
+    hold = f", verrou tenu {w['lock_hold_ms_mean']:.3f} ms/écriture" if "lock_hold_ms_mean" in w else ""
+    return (f"writer : {w['writes']} écritures, {w['failed']} échecs, {w['busy_retries']} reprises SQLITE_BUSY, "
+            f"attente du verrou {w['lock_wait_ms_total']:.1f} ms ({w['lock_wait_ms_mean']:.3f} ms/écriture){hold}")
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}  # route -> [ms]
+        self.errors = {}
+
+    def timed(self, route, fn):
+        started = time.perf_counter()
+        try:
+            return fn()
+        except (urllib.error.URLError, OSError, ValueError):
+            with self._lock:
+                self.errors[route] = self.errors.get(route, 0) + 1
+            return None
+        finally:
+            ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self.latencies.setdefault(route, []).append(ms)
+
+    def summary(self, elapsed):
+        routes = {
+            route: summarize(self.latencies[route], self.errors.get(route, 0), elapsed)
+            for route in sorted(self.latencies)
+        }
+        everything = [ms for values in self.latencies.values() for ms in values]
+        return routes, summarize(everything, sum(self.errors.values()), elapsed)
+
+
+def print_report(routes, total, elapsed):
+    print(f"{'route':<34}{'n':>7}{'err':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for route, s in list(routes.items()) + [("TOTAL", total)]:
+        print(f"{route:<34}{s['n']:>7}{s['errors']:>6}"
+              f"{s['p50']:>9.1f}{s['p95']:>9.1f}{s['p99']:>9.1f}{s['max']:>9.1f}")
+    print(f"{total['rps']:.1f} req/s sur {elapsed:.1f}s (latences en ms)")
+
+
+def fr_now():
+    return datetime.now().strftime("%d/%m/%Y %H:%M")
+
+
+def complete_body(rnd):
+    """Résultat d'un appel ; un non définitif replanifie une relance"""
+    body = {"result": rnd.choice(NON_DEFINITIFS + DEFINITIFS), "priority": "NORMAL"}
+    if body["result"] in NON_DEFINITIFS:
+        relance_at = datetime.now() + timedelta(minutes=rnd.choice([30, 60, 120]))
+        body.update(relance_level="2", relance_at=relance_at.isoformat(timespec="minutes"),
+                    relance_priority=rnd.choice(["NORMAL", "P1"]))
+    return body
+
+
+def simulate_mixed(agent_id, args, recorder, stop_at):
+    rnd = random.Random(args.seed * 1000 + agent_id)
+    agent = f"LOAD-{agent_id}"
+    base = args.base_url
+    counter = 0
+
+    while time.monotonic() < stop_at:
+        projet = rnd.choice(PROJETS + [""])
+        query = f"?projet={urllib.request.quote(projet)}" if projet else "?"
+
+        if rnd.random() >= args.write_ratio:
+            route = rnd.choice(["/relances", "/leads", "/calls", "/dashboard"])
+            recorder.timed(f"GET {route}", lambda: request(base, "GET", route + query))
+            continue
+
+        kind = rnd.choice(["lead", "action", "complete"])
+        if kind == "lead":
+            counter += 1
+            body = {
+                "lead_key": f"{agent}-{int(time.time() * 1000)}-{counter}",
+                "projet": rnd.choice(PROJETS),
+                "type_lead": rnd.choice(TYPES),
+                "lead_created_at": fr_now(),
+            }
+            recorder.timed("POST /lead", lambda: request(base, "POST", "/lead", body))
+        elif kind == "action":
+            page = recorder.timed("GET /leads", lambda: request(base, "GET", "/leads" + query))
+            leads = (page or (0, {}))[1].get("data") or []
+            if not leads:
+                continue
+            lead = rnd.choice(leads)
+            relance_at = datetime.now() + timedelta(hours=rnd.randint(1, 72))
+            body = {
+                "lead_id": lead["lead_id"],
+                "phone": lead["phone"] or f"336{rnd.randint(10000000, 99999999)}",
+                "agent": agent,
+                "attempt_level": "1",
+                "result": rnd.choice(RESULTS),
+                "priority": "NORMAL",
+                "relance_level": "2",
+                "relance_at": relance_at.isoformat(timespec="minutes"),
+                "relance_priority": rnd.choice(["NORMAL", "P1"]),
+            }
+            recorder.timed("POST /action", lambda: request(base, "POST", "/action", body))
+        else:
+            # La relance due est attribuée par le serveur : jamais deux agents sur la même
+            claim = {"agent": agent, "projet": projet}
+            claimed = recorder.timed("POST /relances/next", lambda: request(base, "POST", "/relances/next", claim))
+            relance = (claimed or (0, {}))[1].get("relance")
+            if not relance:
+                continue
+            call_id = relance["call_id"]
+            body = {"result": rnd.choice(RESULTS), "priority": "NORMAL"}
+            recorder.timed("POST /relance/{call_id}/complete",
+                           lambda: request(base, "POST", f"/relance/{call_id}/complete", body))
+
+
+def simulate_workflow(agent_id, args, recorder, stop_at):
+    """Parcours d'un agent : nouveau lead, premier appel, vue "maintenant", relance due"""
+    rnd = random.Random(args.seed * 1000 + agent_id)
+    agent = f"LOAD-{agent_id}"
+    projet = PROJETS[agent_id % len(PROJETS)]
+    base = args.base_url
+    counter = 0
+
+    def think():
+        if args.think:
+            time.sleep(rnd.uniform(0, 2 * args.think))
+
+    while time.monotonic() < stop_at:
+        counter += 1
+        lead = {
+            "lead_key": f"{agent}-{args.seed}-{int(time.time() * 1000)}-{counter}",
+            "projet": projet,
+            "type_lead": rnd.choice(TYPES),
+            "lead_created_at": fr_now(),
+        }
+        created = recorder.timed("POST /lead", lambda: request(base, "POST", "/lead", lead))
+        lead_id = (created or (0, {}))[1].get("lead_id")
+        think()
+
+        if lead_id:
+            relance_at = datetime.now() + timedelta(minutes=rnd.choice([30, 60, 120]))
+            action = {
+                "lead_id": lead_id,
+                "phone": f"336{rnd.randint(10000000, 99999999)}",
+                "agent": agent,
+                "attempt_level": "1",
+                "result": rnd.choice(NON_DEFINITIFS),
+                "priority": "NORMAL",
+                "relance_level": "2",
+                "relance_at": relance_at.isoformat(timespec="minutes"),
+                "relance_priority": rnd.choice(["NORMAL", "P1"]),
+            }
+            recorder.timed("POST /action", lambda: request(base, "POST", "/action", action))
+            think()
+
+        query = f"/relances?projet={urllib.request.quote(projet)}&limit=20"
+        recorder.timed("GET /relances", lambda: request(base, "GET", query))
+        think()
+
+        claim = {"agent": agent, "projet": projet}
+        claimed = recorder.timed("POST /relances/next", lambda: request(base, "POST", "/relances/next", claim))
+        relance = (claimed or (0, {}))[1].get("relance")
+        if relance:
+            call_id = relance["call_id"]
+            recorder.timed("GET /relance/{call_id}",
+                           lambda: request(base, "GET", f"/relance/{call_id}?agent={urllib.request.quote(agent)}"))
+            think()
+            body = complete_body(rnd)
+            recorder.timed("POST /relance/{call_id}/complete",
+                           lambda: request(base, "POST", f"/relance/{call_id}/complete", body))
+        think()
+
+
+def poll_dashboard(poller_id, args, recorder, stop_at):
+    """Écran de supervision : KPI, tendance du jour et stats agents à intervalle fixe"""
+    rnd = random.Random(args.seed * 1000 + 500 + poller_id)
+    base = args.base_url
+    routes = ["/dashboard", "/dashboard/trend?grain=hour", "/agents/stats"]
+    while time.monotonic() < stop_at:
+        for route in routes:
+            projet = rnd.choice(PROJETS + [""])
+            sep = "&" if "?" in route else "?"
+            path = route + (f"{sep}projet={urllib.request.quote(projet)}" if projet else "")
+            recorder.timed(f"GET {route.split('?')[0]}", lambda: request(base, "GET", path))
+        time.sleep(args.poll_interval)
+
+
+def compare(base_path, new_path, threshold):
+    """Écart de latence route par route entre deux rapports ; échoue au-delà de --threshold %"""
+    with open(base_path, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    def delta(a, b):
+        return (b - a) / a * 100 if a else 0.0
+
+    print(f"{base_path} ({base['meta'].get('commit')}) -> {new_path} ({new['meta'].get('commit')})")
+    print(f"{'route':<34}{'p50':>16}{'p95':>16}{'p99':>16}{'req/s':>16}")
+    regressions = []
+    rows = [(r, base["routes"].get(r), new["routes"][r]) for r in new["routes"]] + [("TOTAL", base["total"], new["total"])]
+    for route, a, b in rows:
+        if a is None:
+            print(f"{route:<34}  (nouvelle route)")
+            continue
+        cells = "".join(f"{b[k]:>8.1f} {delta(a[k], b[k]):>+6.0f}%" for k in ("p50", "p95", "p99", "rps"))
+        print(f"{route:<34}{cells}")
+        if delta(a["p95"], b["p95"]) > threshold:
+            regressions.append(route)
+    for label, report in ((base_path, base), (new_path, new)):
+        if report.get("writer"):
+            print(f"{label} {format_writer(report['writer'])}")
+    if regressions:
+        print(f"p95 en hausse de plus de {threshold:.0f} % : {', '.join(regressions)}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de charge HTTP sur l'API (parcours agents, dashboard)")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenario", choices=["workflow", "mixed"], default="workflow")
+    parser.add_argument("--agents", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="secondes")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="mixed : part des itérations qui écrivent")
+    parser.add_argument("--think", type=float, default=0.0, help="workflow : pause moyenne entre deux étapes (s)")
+    parser.add_argument("--pollers", type=int, default=2, help="workflow : écrans dashboard ouverts")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="secondes entre deux rafraîchissements")
+    parser.add_argument("--seed", type=int, default=0, help="graine : même suite de requêtes d'un run à l'autre")
+    parser.add_argument("--json", metavar="PATH", help="écrit le rapport JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare deux rapports JSON")
+    parser.add_argument("--threshold", type=float, default=20.0, help="--compare : hausse de p95 tolérée (%%)")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(compare(*args.compare, args.threshold))
+
+    try:
+        leads_total = request(args.base_url, "GET", "/dashboard")[1].get("leads_total")
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        sys.exit(f"Serveur injoignable sur {args.base_url} : {e}")
+
+    writer_before = writer_stats(args.base_url)
+    recorder = Recorder()
+    started = time.monotonic()
+    stop_at = started + args.duration
+    target = simulate_workflow if args.scenario == "workflow" else simulate_mixed
+    threads = [
+        threading.Thread(target=target, args=(i, args, recorder, stop_at), daemon=True)
+        for i in range(args.agents)
+    ]
+    if args.scenario == "workflow":
+        threads += [
+            threading.Thread(target=poll_dashboard, args=(i, args, recorder, stop_at), daemon=True)
+            for i in range(args.pollers)
+        ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    elapsed = time.monotonic() - started
+    routes, total = recorder.summary(elapsed)
+    writer = writer_delta(writer_before, writer_stats(args.base_url))
+    with print_lock:
+        print_report(routes, total, elapsed)
+        if writer:
+            print(format_writer(writer))
+
+    if args.json:
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "scenario": args.scenario,
+                "agents": args.agents,
+                "pollers": args.pollers if args.scenario == "workflow" else 0,
+                "duration": args.duration,
+                "write_ratio": args.write_ratio if args.scenario == "mixed" else None,
+                "think": args.think,
+                "seed": args.seed,
+                "leads_at_start": leads_total,
+                "base_url": args.base_url,
+            },
+            "elapsed_s": round(elapsed, 2),
+            "routes": routes,
+            "total": total,
+            "writer": writer,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Rapport écrit : {args.json}")
+
+
+if __name__ == "__main__":
+    main()
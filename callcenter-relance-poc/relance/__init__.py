@@ -0,0 +1 @@
+"""Back-end des relances : modules assemblés par main.py (app FastAPI et CLI)"""
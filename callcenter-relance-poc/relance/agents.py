@@ -0,0 +1,66 @@
+"""Dimension agent et compteurs agent_stats tenus par triggers"""
+
+from relance.db.schema import history_sources
+
+# ================= AGENTS =================
+# Dimension agent : calls.agent_id référence agents(id), table de correspondance de
+# DICTIONARIES. Les écritures hors API passent par calls_named, qui encode l'agent.
+DEFINITIVE_RESULTS = ("Qualifié", "Pas intéressé", "Annulé")
+AGENT_STATS_MEASURES = ("calls_done", "pending", "definitive", "attempts_sum")
+
+def agent_contribution_sql(row: str, sign: int) -> str:
+    """Upsert de la contribution d'une ligne calls (NEW / OLD) à agent_stats"""
+    definitive = definitive_ids_sql()
+    return f"""
+        INSERT INTO agent_stats (agent_id, projet, {", ".join(AGENT_STATS_MEASURES)})
+        SELECT {row}.agent_id, l.projet,
+               {sign} * ({row}.done_at IS NOT NULL),
+               {sign} * ({row}.done_at IS NULL AND {row}.next_call_at IS NOT NULL),
+               {sign} * ({row}.done_at IS NOT NULL AND {row}.result_id IN {definitive}),
+               {sign} * ({row}.done_at IS NOT NULL AND {row}.result_id IN {definitive}) * {row}.attempt_level
+        FROM leads_named l
+        WHERE l.id={row}.lead_id AND {row}.agent_id IS NOT NULL
+        ON CONFLICT (agent_id, projet) DO UPDATE SET
+          {", ".join(f"{m}={m}+excluded.{m}" for m in AGENT_STATS_MEASURES)};
+    """
+
+def definitive_ids_sql() -> str:
+    """Ids des résultats définitifs, résolus par SQLite (triggers compris)"""
+    names = ", ".join(f"'{r}'" for r in DEFINITIVE_RESULTS)
+    return f"(SELECT id FROM results WHERE name IN ({names}))"
+
+# agent_stats suit calls quel que soit l'écrivain (API, scripts) : compteurs en O(1)
+AGENT_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS agent_stats_insert AFTER INSERT ON calls
+       WHEN NEW.agent_id IS NOT NULL
+       BEGIN {agent_contribution_sql("NEW", 1)} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS agent_stats_update
+       AFTER UPDATE OF agent_id, done_at, next_call_at, result_id, attempt_level ON calls
+       BEGIN {agent_contribution_sql("OLD", -1)} {agent_contribution_sql("NEW", 1)} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS agent_stats_delete AFTER DELETE ON calls
+       BEGIN {agent_contribution_sql("OLD", -1)} END""",
+]
+
+def agent_stats_add_sql(calls_src: str, leads_src: str, where: str = "1") -> str:
+    """Ajoute à agent_stats les compteurs des appels de `calls_src` retenus par `where`"""
+    definitive = definitive_ids_sql()
+    return f"""
+        INSERT INTO agent_stats (agent_id, projet, {", ".join(AGENT_STATS_MEASURES)})
+        SELECT c.agent_id, l.projet,
+               SUM(c.done_at IS NOT NULL),
+               SUM(c.done_at IS NULL AND c.next_call_at IS NOT NULL),
+               SUM(c.done_at IS NOT NULL AND c.result_id IN {definitive}),
+               SUM((c.done_at IS NOT NULL AND c.result_id IN {definitive}) * c.attempt_level)
+        FROM {calls_src} c
+        JOIN {leads_src} l ON l.id=c.lead_id
+        WHERE {where}
+        GROUP BY c.agent_id, l.projet
+        ON CONFLICT (agent_id, projet) DO UPDATE SET
+          {", ".join(f"{m}={m}+excluded.{m}" for m in AGENT_STATS_MEASURES)}
+    """
+
+def rebuild_agent_stats(c):
+    """Recalcule agent_stats depuis calls, archive comprise"""
+    c.execute("DELETE FROM agent_stats")
+    for calls_src, leads_src, _ in history_sources(c):
+        c.execute(agent_stats_add_sql(calls_src, leads_src))
@@ -0,0 +1,354 @@
+"""Archivage de l'historique vers calls_archive.db et compactage"""
+
+from datetime import datetime, timedelta
+import asyncio
+import json
+import os
+import logging
+import threading
+import time
+
+from relance.agents import DEFINITIVE_RESULTS, agent_stats_add_sql
+from relance.cache import HTTP_CACHE
+from relance.calendar import PARIS, iso_now
+from relance.counts import COUNTS
+from relance.db.pool import DB, archive_attached, archive_path
+from relance.db.reader import READER
+from relance.db.schema import archive_named
+from relance.db.writer import UnitOfWork, WRITER
+from relance.lead_stats import LEAD_STATS_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# ================= ARCHIVE =================
+# Leads clos définitivement depuis longtemps, avec leurs appels et leur lead_stats,
+# déplacés dans calls_archive.db (attachée sous le nom `archive`). Les listes ne lisent
+# l'archive que si la page descend jusqu'à ses dates ; KPI, rollups et agent_stats
+# comptent toujours tout l'historique.
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "365"))  # ancienneté du dernier appel
+ARCHIVE_MIN_DAYS = 30           # garde-fou de POST /archive/run et du CLI
+# Passage quotidien sur demande seulement (ex. ARCHIVE_AT=03:00, heure de Paris) : vide par
+# défaut, rien ne quitte calls.db sans ARCHIVE_AT, POST /archive/run ou le CLI archive
+ARCHIVE_AT = os.environ.get("ARCHIVE_AT", "")
+ARCHIVE_BATCH = 500             # leads par lot : une transaction d'écriture courte par lot
+ARCHIVE_TTL = 60.0              # secondes : bornes relues (archivage lancé par un autre process)
+COMPACT_STEP_PAGES = 500        # pages rendues par étape (~5 ms de verrou), entre deux écritures
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+# Même forme que le schéma encodé, sans AUTOINCREMENT ni clés étrangères : les ids sont
+# ceux de la base (jamais réattribués, AUTOINCREMENT), lead_stats y est figée
+ARCHIVE_SCHEMA = [
+    # Sans effet si l'archive a déjà des tables (VACUUM requis, voir le CLI compact)
+    "PRAGMA archive.auto_vacuum=INCREMENTAL",
+    "PRAGMA archive.journal_mode=WAL",
+    """CREATE TABLE IF NOT EXISTS archive.leads (
+        id INTEGER PRIMARY KEY,
+        lead_key TEXT NOT NULL,
+        phone TEXT,
+        projet_id INTEGER NOT NULL,
+        type_lead_id INTEGER NOT NULL,
+        lead_created_at TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        archived_at TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS archive.calls (
+        id INTEGER PRIMARY KEY,
+        lead_id INTEGER NOT NULL,
+        agent_id INTEGER NOT NULL,
+        attempt_level INTEGER NOT NULL,
+        result_id INTEGER NOT NULL,
+        priority_id INTEGER NOT NULL,
+        next_call_at TEXT,
+        done_at TEXT,
+        created_at TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS archive.lead_stats (
+        lead_id INTEGER PRIMARY KEY,
+        call_count INTEGER NOT NULL DEFAULT 0,
+        first_done_at TEXT,
+        first_call_at TEXT,
+        first_agent TEXT,
+        last_result TEXT,
+        last_done_at TEXT,
+        reactivity_in_scope INTEGER NOT NULL DEFAULT 0,
+        reactivity_minutes INTEGER
+    )""",
+    # Mêmes chemins d'accès que la base : les deux côtés de l'union suivent leur index
+    """CREATE INDEX IF NOT EXISTS archive.idx_calls_done
+       ON calls(done_at)
+       WHERE done_at IS NOT NULL""",
+    "CREATE INDEX IF NOT EXISTS archive.idx_calls_lead ON calls(lead_id)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_leads_created ON leads(lead_created_at)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_leads_projet_type ON leads(projet_id, type_lead_id, lead_created_at)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_leads_type ON leads(type_lead_id, lead_created_at)",
+    # Archive filtrée par projet seul : lue dans l'ordre de l'union, sans tri à part
+    "CREATE INDEX IF NOT EXISTS archive.idx_leads_projet_created ON leads(projet_id, lead_created_at)",
+    # Clé déjà archivée : /lead et /leads/bulk renvoient le lead archivé, sans le recréer
+    "CREATE INDEX IF NOT EXISTS archive.idx_leads_key ON leads(lead_key)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_lead_stats_last_result ON lead_stats(last_result, last_done_at)",
+    """CREATE INDEX IF NOT EXISTS archive.idx_lead_stats_last_call
+       ON lead_stats(COALESCE(last_done_at, ''), lead_id)""",
+]
+
+def archived_lead_ids(c, keys) -> dict:
+    """{lead_key: id} des clés présentes dans l'archive"""
+    if not keys or not archive_attached(c):
+        return {}
+    marks = ",".join("?" * len(keys))
+    return dict(c.execute(f"SELECT lead_key, id FROM archive.leads WHERE lead_key IN ({marks})", keys))
+
+def ensure_archive_schema(c):
+    if not archive_attached(c):
+        return
+    for statement in ARCHIVE_SCHEMA:
+        c.execute(statement)
+    c.commit()
+
+# Clé la plus récente de l'archive, par liste : au-dessus, une page ne lit que la base
+ARCHIVE_BOUNDS_SQL = {
+    "calls": "SELECT MAX(done_at) FROM archive.calls WHERE done_at IS NOT NULL",
+    "leads_created": "SELECT MAX(lead_created_at) FROM archive.leads",
+    "leads_last_call": "SELECT MAX(COALESCE(last_done_at, '')) FROM archive.lead_stats",
+}
+
+class ArchiveIndex:
+    """Bornes et totaux de l'archive : décident si une page (ou un export) doit la lire"""
+
+    def __init__(self, ttl: float = ARCHIVE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._bounds = {}       # nom -> clé max (None : archive vide ou absente)
+        self._totals = {"leads": 0, "calls": 0}
+        self._loaded_at = None
+        self._counts = {}       # (sql, params) -> COUNT(*) de l'archive
+        self._generation = 0    # incrémenté à chaque changement de l'archive
+        self.running = False
+        self.task = None
+        self.last_run = None    # rapport du dernier archivage
+        self.next_run = None
+
+    def load(self, c):
+        """Relit bornes et totaux ; les COUNT en cache sont jetés si l'archive a changé"""
+        if archive_attached(c):
+            bounds = {name: c.execute(sql).fetchone()[0] for name, sql in ARCHIVE_BOUNDS_SQL.items()}
+            totals = {table: c.execute(f"SELECT COUNT(*) FROM archive.{table}").fetchone()[0]
+                      for table in ("leads", "calls")}
+        else:
+            bounds, totals = {}, {"leads": 0, "calls": 0}
+        with self._lock:
+            if bounds != self._bounds or totals != self._totals:
+                self._counts.clear()
+                self._generation += 1
+            self._bounds, self._totals = bounds, totals
+            self._loaded_at = time.monotonic()
+
+    def bound(self, c, name: str):
+        """Borne `name`, relue sur `c` au-delà du TTL"""
+        with self._lock:
+            fresh = self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+        if not fresh:
+            self.load(c)
+        with self._lock:
+            return self._bounds.get(name)
+
+    def count(self, c, sql: str, params: list) -> int:
+        key = (sql, tuple(params))
+        with self._lock:
+            if key in self._counts:
+                return self._counts[key]
+            generation = self._generation
+        total = c.execute(sql, params).fetchone()[0]
+        with self._lock:
+            # Même règle que CountCache : un archivage pendant le COUNT le rend douteux
+            if self._generation == generation:
+                self._counts[key] = total
+        return total
+
+    def clear_counts(self):
+        with self._lock:
+            self._counts.clear()
+            self._generation += 1
+
+    def try_start(self) -> bool:
+        with self._lock:
+            if self.running:
+                return False
+            self.running = True
+            return True
+
+    def finish(self, report: dict | None):
+        with self._lock:
+            self.running = False
+            if report:
+                self.last_run = report
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**{f"archived_{table}": n for table, n in self._totals.items()},
+                    "count_entries": len(self._counts), "running": int(self.running)}
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"bounds": dict(self._bounds), "totals": dict(self._totals), "running": self.running,
+                    "after_days": ARCHIVE_AFTER_DAYS, "schedule": ARCHIVE_AT or None,
+                    "next_run": self.next_run, "last_run": self.last_run}
+
+ARCHIVE = ArchiveIndex()
+
+# Leads archivables : dernier appel définitif avant l'horizon, aucune relance en attente
+ARCHIVE_CANDIDATES_SQL = f"""
+    SELECT s.lead_id
+    FROM lead_stats s
+    WHERE s.last_result IN ({", ".join(f"'{r}'" for r in DEFINITIVE_RESULTS)})
+      AND s.last_done_at < ?
+      AND NOT EXISTS (SELECT 1 FROM calls p WHERE p.lead_id=s.lead_id AND p.done_at IS NULL)
+    LIMIT ?
+"""
+
+def _archive_batch(c, horizon: str, archived_at: str, limit: int) -> tuple[int, int]:
+    """Copie puis purge un lot de leads : deux transactions, sans perte ni doublon visible.
+
+    Entre les deux COMMIT, les lignes sont dans les deux bases ; archive_named() ne
+    lit que la copie de la base. Une seule tâche du writer : aucune écriture ne passe
+    entre la copie et la purge. Rejoué après un SQLITE_BUSY, la copie est idempotente.
+    """
+    lead_ids = [row[0] for row in c.execute(ARCHIVE_CANDIDATES_SQL, (horizon, limit)).fetchall()]
+    if not lead_ids:
+        return 0, 0
+    marks = ", ".join("?" * len(lead_ids))
+    c.execute(f"""
+        INSERT OR REPLACE INTO archive.leads
+          (id, lead_key, phone, projet_id, type_lead_id, lead_created_at, created_at, archived_at)
+        SELECT id, lead_key, phone, projet_id, type_lead_id, lead_created_at, created_at, ?
+        FROM main.leads WHERE id IN ({marks})
+    """, [archived_at, *lead_ids])
+    calls = c.execute(f"""
+        INSERT OR REPLACE INTO archive.calls
+          (id, lead_id, agent_id, attempt_level, result_id, priority_id, next_call_at, done_at, created_at)
+        SELECT id, lead_id, agent_id, attempt_level, result_id, priority_id, next_call_at, done_at, created_at
+        FROM main.calls WHERE lead_id IN ({marks})
+    """, lead_ids).rowcount
+    c.execute(f"""
+        INSERT OR REPLACE INTO archive.lead_stats (lead_id, {LEAD_STATS_COLUMNS})
+        SELECT lead_id, {LEAD_STATS_COLUMNS} FROM main.lead_stats WHERE lead_id IN ({marks})
+    """, lead_ids)
+    WRITER.split(c)
+    # Bornes à jour avant la purge : une page lit déjà l'archive quand les lignes quittent la base
+    ARCHIVE.load(c)
+
+    # Les triggers retirent ces appels de agent_stats : rajoutés depuis l'archive
+    c.execute(f"DELETE FROM main.calls WHERE lead_id IN ({marks})", lead_ids)
+    c.execute(f"DELETE FROM main.lead_stats WHERE lead_id IN ({marks})", lead_ids)
+    c.execute(f"DELETE FROM main.leads WHERE id IN ({marks})", lead_ids)
+    c.execute(agent_stats_add_sql(archive_named("calls"), archive_named("leads"), f"c.lead_id IN ({marks})"),
+              lead_ids)
+
+    def moved():
+        COUNTS.invalidate()
+        ARCHIVE.clear_counts()  # comptés pendant la copie : lignes encore côté base
+        HTTP_CACHE.bump("leads", "calls")
+
+    WRITER.on_commit(moved)
+    return len(lead_ids), calls
+
+def _compact_step(c, schema: str, pages: int) -> int:
+    """Rend au système jusqu'à `pages` pages libres de `schema` ; 0 si rien à faire.
+
+    Job du writer sans transaction (transaction=False) : l'étape prend sa propre
+    transaction courte, bornée à `pages` pages.
+    """
+    if c.execute(f"PRAGMA {schema}.auto_vacuum").fetchone()[0] != 2:
+        return 0  # base créée sans auto_vacuum=INCREMENTAL : voir le CLI compact
+    free = c.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+    if not free:
+        return 0
+    with UnitOfWork(c, "compact"):
+        # sqlite3 n'exécute qu'un pas d'un PRAGMA sans colonne : une page par execute
+        for _ in range(min(pages, free)):
+            c.execute(f"PRAGMA {schema}.incremental_vacuum(1)")
+    return free - c.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+
+def checkpoint(c):
+    # Le WAL grossi par la purge est ramené à zéro (toutes les bases attachées)
+    return c.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+
+def space_report(c) -> dict:
+    """Taille sur disque (fichier + WAL), pages et pages libres de la base et de l'archive"""
+    report = {}
+    for schema, path in (("main", DB), ("archive", archive_path(DB))):
+        if schema == "archive" and not archive_attached(c):
+            continue
+        size = sum(os.path.getsize(f) for f in (path, path + "-wal") if os.path.exists(f))
+        report[schema] = {
+            "bytes": size,
+            "pages": c.execute(f"PRAGMA {schema}.page_count").fetchone()[0],
+            "free_pages": c.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0],
+            "auto_vacuum": AUTO_VACUUM_MODES[c.execute(f"PRAGMA {schema}.auto_vacuum").fetchone()[0]],
+        }
+    return report
+
+def archive_horizon(days: int) -> str:
+    # Même convention que les dates stockées (heure de Paris) ; comparée en texte
+    return (datetime.now(PARIS) - timedelta(days=days)).replace(tzinfo=None).isoformat(timespec="seconds")
+
+async def archive_once(days: int = ARCHIVE_AFTER_DAYS, claimed: bool = False) -> dict | None:
+    """Archive par lots, compacte par étapes puis renvoie le rapport ; None si déjà en cours"""
+    if not claimed and not ARCHIVE.try_start():
+        return None
+    report = None
+    try:
+        started_at = iso_now()
+        horizon = archive_horizon(days)
+        before = await READER.run(space_report)
+        leads = calls = 0
+        while True:
+            n, m = await WRITER.run(_archive_batch, horizon, started_at, ARCHIVE_BATCH)
+            leads += n
+            calls += m
+            if n < ARCHIVE_BATCH:
+                break
+        # Compactage par étapes : chacune est un job court du writer, entre deux écritures
+        for schema in before:
+            while await WRITER.run(_compact_step, schema, COMPACT_STEP_PAGES, transaction=False):
+                pass
+        await WRITER.run(checkpoint, transaction=False)
+        after = await READER.run(space_report)
+        await READER.run(ARCHIVE.load)
+        report = {
+            "started_at": started_at,
+            "finished_at": iso_now(),
+            "horizon": horizon,
+            "archived_leads": leads,
+            "archived_calls": calls,
+            "space": {
+                schema: {
+                    "bytes_before": before[schema]["bytes"],
+                    "bytes_after": after[schema]["bytes"],
+                    "reclaimed_bytes": before[schema]["bytes"] - after[schema]["bytes"],
+                    "free_pages": after[schema]["free_pages"],
+                    "auto_vacuum": after[schema]["auto_vacuum"],
+                }
+                for schema in after
+            },
+        }
+        logger.info(f"Archivage : {json.dumps(report, ensure_ascii=False)}")
+        return report
+    finally:
+        ARCHIVE.finish(report)
+
+def next_archive_run(now: datetime) -> datetime:
+    """Prochain passage à ARCHIVE_AT (heure de Paris) après `now`"""
+    hour, minute = (int(part) for part in ARCHIVE_AT.split(":"))
+    run = now.astimezone(PARIS).replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return run if run > now else run + timedelta(days=1)
+
+async def archive_loop():
+    """Archivage quotidien à ARCHIVE_AT ; une erreur est journalisée, le passage suivant a lieu"""
+    while True:
+        run = next_archive_run(datetime.now(PARIS))
+        ARCHIVE.next_run = run.isoformat()
+        await asyncio.sleep((run - datetime.now(PARIS)).total_seconds())
+        try:
+            await archive_once(ARCHIVE_AFTER_DAYS)
+        except Exception as e:
+            logger.error(f"Archivage échoué : {str(e)}")
@@ -0,0 +1,168 @@
+"""Cache HTTP des listes : ETag par version des tables, 304 et réponses gardées en mémoire"""
+
+from starlette.datastructures import Headers
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode
+import os
+import re
+import threading
+import time
+
+# ================= HTTP CACHE =================
+# Réponses des lectures identifiées par la version des tables qu'elles lisent : les
+# écritures incrémentent ces versions après COMMIT. If-None-Match égal -> 304, et une
+# réponse déjà construite pour la même URL et les mêmes versions est resservie telle
+# quelle : ni pool ni SQLite. Écritures d'un autre process : le writer les repère par
+# PRAGMA data_version et incrémente toutes les versions (EXTERNAL_WRITE_POLL).
+HTTP_CACHE_MAX_ENTRIES = 500
+HTTP_CACHE_MAX_BODY = 256 * 1024  # octets : une page plus grosse n'est pas gardée
+API_CACHE_CONTROL = b"private, no-cache"  # le navigateur revalide à chaque fois
+STATIC_CACHE_CONTROL = b"no-cache"        # fichiers sans empreinte dans le nom : revalidés (304)
+
+# (gabarit, motif, tables lues, paramètres qui interdisent le cache)
+# Les lignes de leads affichées avec un appel ne changent (téléphone) qu'avec l'insertion
+# d'un appel : les listes parties de calls ne dépendent que de "calls"
+HTTP_CACHE_ROUTES = [
+    ("/relances", re.compile(r"/relances"), ("calls",), ()),
+    ("/relance/{call_id}", re.compile(r"/relance/\d+"), ("calls",), ("agent",)),  # agent : réserve la relance
+    ("/calls", re.compile(r"/calls"), ("calls",), ()),
+    ("/leads", re.compile(r"/leads"), ("leads", "calls"), ()),
+    ("/dashboard", re.compile(r"/dashboard"), ("leads", "calls"), ()),
+]
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match : liste d'ETags (faibles acceptés) ou *"""
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+class ResponseCache:
+    """Versions d'écriture par table et dernières réponses par (route, paramètres)"""
+
+    def __init__(self, max_entries: int = HTTP_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        # Propre à ce process : un ETag d'avant redémarrage ne correspond jamais
+        self.boot = f"{int(time.time()):x}{os.getpid():x}"
+        self._lock = threading.Lock()
+        self._versions = {}               # table -> compteur d'écritures
+        self._entries = OrderedDict()     # (chemin, paramètres triés) -> (etag, en-têtes, corps)
+        self._stats = {"not_modified": 0, "hits": 0, "misses": 0, "bumps": 0}
+
+    def bump(self, *tables: str):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+            self._stats["bumps"] += 1
+
+    def bump_all(self):
+        """Écriture hors process : on ne sait pas quelles tables, toutes sont périmées"""
+        self.bump(*{table for _, _, tables, _ in HTTP_CACHE_ROUTES for table in tables})
+
+    def etag(self, tables) -> str:
+        # Versions seules : sans écriture, l'ETag ne change pas et le client garde ses 304
+        with self._lock:
+            versions = ".".join(str(self._versions.get(t, 0)) for t in tables)
+        return f'"{self.boot}-{versions}"'
+
+    def get(self, key, etag: str):
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit and hit[0] == etag:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return hit
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key, etag: str, headers: list, body: bytes):
+        with self._lock:
+            self._entries[key] = (etag, headers, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def count_not_modified(self):
+        with self._lock:
+            self._stats["not_modified"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else None,
+            }
+
+HTTP_CACHE = ResponseCache()
+
+def cache_route(path: str):
+    for template, pattern, tables, bypass in HTTP_CACHE_ROUTES:
+        if pattern.fullmatch(path):
+            return template, tables, bypass
+    return None
+
+class ResponseCacheMiddleware:
+    """ETag / 304 et réponses resservies pour les lectures de HTTP_CACHE_ROUTES ;
+    Cache-Control sur les fichiers statiques (StaticFiles gère déjà ETag et 304)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        if path == "/" or path.startswith("/static/"):
+            await self.app(scope, receive, self.with_headers(send, [(b"cache-control", STATIC_CACHE_CONTROL)]))
+            return
+        route = cache_route(path)
+        params = sorted(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True))
+        if not route or any(name in route[2] and value for name, value in params):
+            await self.app(scope, receive, send)
+            return
+
+        template, tables, _ = route
+        scope["cache_route"] = template
+        # Versions lues avant la requête : une écriture concurrente rend l'ETag périmé, jamais faux
+        etag = HTTP_CACHE.etag(tables)
+        validators = [(b"etag", etag.encode()), (b"cache-control", API_CACHE_CONTROL)]
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            HTTP_CACHE.count_not_modified()
+            await send({"type": "http.response.start", "status": 304, "headers": validators})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        key = (path, urlencode(params))
+        hit = HTTP_CACHE.get(key, etag)
+        if hit:
+            await send({"type": "http.response.start", "status": 200, "headers": hit[1] + validators})
+            await send({"type": "http.response.body", "body": hit[2]})
+            return
+
+        start, chunks, size = None, [], 0
+
+        async def send_cached(message):
+            nonlocal start, size
+            if message["type"] == "http.response.start":
+                start = message
+                if message["status"] == 200:
+                    message = {**message, "headers": list(message.get("headers", [])) + validators}
+            elif start and start["status"] == 200 and size <= HTTP_CACHE_MAX_BODY:
+                chunks.append(message.get("body", b""))
+                size += len(chunks[-1])
+                if not message.get("more_body") and size <= HTTP_CACHE_MAX_BODY \
+                        and HTTP_CACHE.etag(tables) == etag:
+                    HTTP_CACHE.put(key, etag, list(start.get("headers", [])), b"".join(chunks))
+            await send(message)
+
+        await self.app(scope, receive, send_cached)
+
+    @staticmethod
+    def with_headers(send, extra):
+        async def send_with(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+        return send_with
@@ -0,0 +1,172 @@
+"""Fuseau de Paris, calendrier d'ouverture et créneaux de relance"""
+
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ================= TIMEZONE =================
+PARIS = ZoneInfo("Europe/Paris")
+
+def iso_now():
+    # Convention : toutes les dates sont stockées en heure Europe/Paris
+    return datetime.now(PARIS).isoformat()
+
+# ================= CALENDAR =================
+SLOT_MINUTES = 15               # granularité des créneaux de relance
+AGENT_CALLS_PER_SLOT = 2        # relances qu'un agent absorbe par créneau
+CAPACITY_LOOKBACK_DAYS = 14     # agents actifs d'un projet = ceux qui ont appelé sur la période
+CAPACITY_TTL = 300.0            # secondes de cache de la capacité par projet
+CALENDAR_FILE = "calendar.json" # surcharge optionnelle, voir load_calendars()
+
+# Horaires par jour (0=lundi … 6=dimanche) ; un jour absent est fermé
+DEFAULT_HOURS = {
+    0: "09:00-19:00", 1: "09:00-19:00", 2: "09:00-19:00", 3: "09:00-19:00",
+    4: "09:00-19:00", 5: "09:00-18:00", 6: "09:00-18:00",
+}
+
+def parse_hours(value: str) -> tuple[int, int]:
+    """"HH:MM-HH:MM" -> (ouverture, fermeture) en minutes depuis minuit"""
+    start, end = value.split("-")
+    (h1, m1), (h2, m2) = (map(int, start.split(":")), map(int, end.split(":")))
+    if not 0 <= h1 * 60 + m1 < h2 * 60 + m2 <= 24 * 60:
+        raise ValueError(f"Invalid opening hours: {value}")
+    return h1 * 60 + m1, h2 * 60 + m2
+
+def easter(year: int) -> date:
+    # Algorithme de Meeus / Jones / Butcher (calendrier grégorien)
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+def french_public_holidays(year: int) -> set[date]:
+    paques = easter(year)
+    return {
+        date(year, 1, 1), date(year, 5, 1), date(year, 5, 8), date(year, 7, 14),
+        date(year, 8, 15), date(year, 11, 1), date(year, 11, 11), date(year, 12, 25),
+        paques + timedelta(days=1),   # lundi de Pâques
+        paques + timedelta(days=39),  # Ascension
+        paques + timedelta(days=50),  # lundi de Pentecôte
+    }
+
+class BusinessCalendar:
+    """Horaires d'ouverture d'un projet : jours fériés, créneaux, prochaine ouverture"""
+
+    def __init__(self, hours: dict, holidays=(), public_holidays: bool = True):
+        self.hours = {int(d): parse_hours(v) for d, v in hours.items() if v}
+        self.holidays = {date.fromisoformat(str(d)) for d in holidays}
+        self.public_holidays = public_holidays
+        self._public = {}  # année -> fériés, calculés à la demande
+
+    def is_holiday(self, d: date) -> bool:
+        if d in self.holidays:
+            return True
+        if not self.public_holidays:
+            return False
+        if d.year not in self._public:
+            self._public[d.year] = french_public_holidays(d.year)
+        return d in self._public[d.year]
+
+    def in_hours(self, dt: datetime) -> bool:
+        """Horaires hebdomadaires seuls (périmètre de réactivité)"""
+        hours = self.hours.get(dt.weekday())
+        return bool(hours) and hours[0] <= dt.hour * 60 + dt.minute < hours[1]
+
+    def is_open(self, dt: datetime) -> bool:
+        return self.in_hours(dt) and not self.is_holiday(dt.date())
+
+    def next_open(self, dt: datetime) -> datetime:
+        """`dt` s'il tombe pendant l'ouverture, sinon l'ouverture suivante"""
+        day = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+        minute = dt.hour * 60 + dt.minute
+        for offset in range(366):
+            hours = self.hours.get(day.weekday())
+            if hours and not self.is_holiday(day.date()):
+                if offset == 0 and hours[0] <= minute < hours[1]:
+                    return dt
+                if offset > 0 or minute < hours[0]:
+                    return day + timedelta(minutes=hours[0])
+            day += timedelta(days=1)
+        raise ValueError("No opening day within a year")
+
+    def slot_at(self, dt: datetime) -> datetime:
+        """Premier créneau ouvert qui commence à `dt` ou après"""
+        start = dt.replace(second=0, microsecond=0)
+        if start != dt or start.minute % SLOT_MINUTES:
+            start += timedelta(minutes=SLOT_MINUTES - start.minute % SLOT_MINUTES)
+        return self.next_open(start)
+
+    def next_slot(self, slot: datetime) -> datetime:
+        return self.next_open(slot + timedelta(minutes=SLOT_MINUTES))
+
+DEFAULT_CALENDAR = BusinessCalendar(DEFAULT_HOURS)
+CALENDARS = {}  # projet -> BusinessCalendar ; absent = DEFAULT_CALENDAR
+
+def default_calendar() -> BusinessCalendar:
+    # Remplacé par load_calendars : les autres modules le relisent à chaque appel
+    return DEFAULT_CALENDAR
+
+def calendar_for(projet: str) -> BusinessCalendar:
+    return CALENDARS.get(projet, DEFAULT_CALENDAR)
+
+def load_calendars(path: str = CALENDAR_FILE):
+    """Charge calendar.json s'il existe :
+
+    {"default": {"hours": {"6": null}, "holidays": ["2026-12-24"], "public_holidays": true},
+     "projets": {"Nohée": {"hours": {"5": "10:00-16:00"}}}}
+
+    Chaque niveau complète le précédent (horaires jour par jour, fériés cumulés).
+    """
+    global DEFAULT_CALENDAR
+    try:
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return
+
+    def build(base_hours, base_holidays, base_public, override):
+        hours = {**base_hours, **{int(d): v for d, v in override.get("hours", {}).items()}}
+        holidays = list(base_holidays) + list(override.get("holidays", []))
+        return hours, holidays, override.get("public_holidays", base_public)
+
+    default = build(DEFAULT_HOURS, [], True, config.get("default", {}))
+    DEFAULT_CALENDAR = BusinessCalendar(*default)
+    CALENDARS.clear()
+    for projet, override in config.get("projets", {}).items():
+        CALENDARS[projet] = BusinessCalendar(*build(*default, override))
+    logger.info(f"Calendrier chargé : {path} ({len(CALENDARS)} projet(s) spécifique(s))")
+
+def paris_wall_time(value: str) -> datetime:
+    """ISO avec ou sans offset -> heure murale Paris sans offset, comme en base"""
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo:
+        dt = dt.astimezone(PARIS).replace(tzinfo=None)
+    return dt
+
+def parse_fr_dt(s: str | None):
+    if not s:
+        return None
+    s = s.strip()
+    if not s:
+        return None
+    try:
+        # Date issue de Creatio / saisie humaine → heure Paris déjà correcte
+        return datetime.strptime(s, "%d/%m/%Y %H:%M").isoformat()
+    except Exception:
+        return None
+
+def in_business_hours(dt: datetime):
+    # Horaires hebdomadaires du calendrier par défaut (les fériés ne changent pas le KPI)
+    return DEFAULT_CALENDAR.in_hours(dt)
+
+def paris_wall_now() -> str:
+    """Heure Paris sans offset : comparable aux next_call_at stockés"""
+    return datetime.now(PARIS).replace(tzinfo=None).isoformat()
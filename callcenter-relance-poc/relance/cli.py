@@ -0,0 +1,224 @@
+"""Outils d'exploitation de calls.db (python main.py <commande>)"""
+
+from contextlib import closing
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import time
+
+try:
+    import numpy as np  # optionnel : calcul vectorisé de la réactivité
+except ImportError:
+    np = None
+
+from relance.agents import DEFINITIVE_RESULTS, rebuild_agent_stats
+from relance.archive import (ARCHIVE, ARCHIVE_AFTER_DAYS, ARCHIVE_MIN_DAYS, archive_once, checkpoint,
+                             space_report)
+from relance.calendar import PARIS
+from relance.db.pool import DB, POOL, attach_archive
+from relance.db.reader import READER
+from relance.db.schema import create_schema
+from relance.db.writer import WRITER
+from relance.lead_stats import compute_reactivity, reactivity_batch, rebuild_lead_stats
+from relance.migrations import MIGRATIONS, encode_dictionaries, init_db
+from relance.plans import check_leads_equivalence, check_query_plans
+from relance.rollups import rebuild_rollups
+
+# ================= CLI =================
+def main():
+    parser = argparse.ArgumentParser(description="Outils d'exploitation de calls.db")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("check-plans", help="échoue si une requête de route fait un full scan")
+    sub.add_parser("check-leads", help="test d'équivalence : /leads comparé à la requête de référence (échoue au moindre écart)")
+    sub.add_parser("rebuild-stats", help="recalcule lead_stats, rollups et agent_stats après un import (seed, script)")
+    sub.add_parser("backfill-rollups", help="recalcule les rollups KPI (/dashboard/trend) depuis calls.db")
+    archive = sub.add_parser("archive", help="archive les leads clos avant --days jours et compacte (rapport JSON)")
+    archive.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS)
+    sub.add_parser("compact", help="passe base et archive en auto_vacuum incrémental (VACUUM, serveur arrêté)")
+    bench = sub.add_parser("bench-reactivity", help="compare calcul vectorisé et boucle Python de la réactivité")
+    bench.add_argument("--leads", type=int, default=1_000_000)
+    bench = sub.add_parser("bench-storage", help="taille et filtres : colonnes texte vs encodage (DICTIONARIES)")
+    bench.add_argument("--leads", type=int, default=200_000)
+    args = parser.parse_args()
+
+    if args.command == "check-plans":
+        init_db()
+        with closing(attach_archive(sqlite3.connect(DB))) as c:
+            failures = check_query_plans(c)
+        for failure in failures:
+            print(f"FULL SCAN  {failure}")
+        print(f"{len(failures)} requête(s) en full scan")
+        sys.exit(1 if failures else 0)
+
+    if args.command == "check-leads":
+        init_db()
+        with closing(sqlite3.connect(DB)) as c:
+            mismatches = check_leads_equivalence(c)
+        for mismatch in mismatches[:50]:
+            print(f"ÉCART  {mismatch}")
+        print(f"{len(mismatches)} écart(s)")
+        sys.exit(1 if mismatches else 0)
+
+    if args.command == "rebuild-stats":
+        init_db()
+        with closing(attach_archive(sqlite3.connect(DB))) as c:
+            rebuild_lead_stats(c)
+            rebuild_rollups(c)
+            rebuild_agent_stats(c)
+            c.commit()
+            total = c.execute("SELECT COUNT(*) FROM lead_stats").fetchone()[0]
+        print(f"lead_stats reconstruite : {total} leads")
+
+    if args.command == "backfill-rollups":
+        init_db()
+        with closing(attach_archive(sqlite3.connect(DB))) as c:
+            started = time.perf_counter()
+            rebuild_rollups(c)
+            c.commit()
+            buckets = c.execute("SELECT grain, COUNT(*) FROM kpi_rollups GROUP BY grain").fetchall()
+        print(f"rollups reconstruits en {time.perf_counter() - started:.2f}s : "
+              + ", ".join(f"{n} créneau(x) {grain}" for grain, n in buckets))
+
+    if args.command == "archive":
+        if args.days < ARCHIVE_MIN_DAYS:
+            parser.error(f"--days doit valoir au moins {ARCHIVE_MIN_DAYS}")
+        init_db()
+        with closing(attach_archive(sqlite3.connect(DB))) as c:
+            ARCHIVE.load(c)
+        POOL.open()
+        READER.start()
+        WRITER.start()
+        try:
+            report = asyncio.run(archive_once(args.days))
+        finally:
+            WRITER.stop()
+            READER.stop()
+            POOL.close()
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.command == "compact":
+        # Une base créée sans auto_vacuum ne change de mode qu'avec un VACUUM complet
+        init_db()
+        with closing(attach_archive(sqlite3.connect(DB))) as c:
+            before = space_report(c)
+            for schema in before:
+                c.execute(f"PRAGMA {schema}.auto_vacuum=INCREMENTAL")
+                c.execute(f"VACUUM {schema}")
+            checkpoint(c)
+            after = space_report(c)
+        for schema in after:
+            print(f"{schema:8} {before[schema]['bytes']:>12} -> {after[schema]['bytes']:>12} octets  "
+                  f"auto_vacuum {after[schema]['auto_vacuum']}")
+
+    if args.command == "bench-reactivity":
+        import random
+
+        # Dates synthétiques : naïves (seed) et avec offset (iso_now), sur plusieurs changements d'heure
+        rnd = random.Random(0)
+        start = datetime(2024, 1, 1)
+        created, first = [], []
+        for i in range(args.leads):
+            lead_at = start + timedelta(minutes=rnd.randrange(3 * 365 * 24 * 60))
+            call_at = lead_at + timedelta(minutes=rnd.randrange(3 * 24 * 60))
+            created.append(lead_at.isoformat(timespec="seconds"))
+            first.append(call_at.replace(tzinfo=PARIS).isoformat() if i % 2 else None if i % 7 == 0 else call_at.isoformat())
+
+        started = time.perf_counter()
+        expected = [compute_reactivity(a, b) for a, b in zip(created, first)]
+        python_s = time.perf_counter() - started
+        started = time.perf_counter()
+        in_scope, minutes = reactivity_batch(created, first)
+        batch_s = time.perf_counter() - started
+
+        mismatches = sum(1 for e, got in zip(expected, zip(in_scope, minutes)) if e != got)
+        print(f"{args.leads} leads  python {python_s:.2f}s  "
+              f"{'numpy' if np is not None else 'python (numpy absent)'} {batch_s:.2f}s  "
+              f"x{python_s / batch_s:.1f}  {mismatches} écart(s)")
+        sys.exit(1 if mismatches else 0)
+
+    if args.command == "bench-storage":
+        import random
+        import shutil
+        import tempfile
+
+        # Base synthétique au schéma d'origine, puis copie encodée par la migration 7
+        rnd = random.Random(0)
+        agents = [f"Agent {i}" for i in range(40)]
+        results = list(DEFINITIVE_RESULTS) + ["Pas de réponse", "Injoignable", "À rappeler", "Planifiée"]
+        start = datetime(2025, 1, 1)
+        workdir = tempfile.mkdtemp()
+        text_db, encoded_db = os.path.join(workdir, "text.db"), os.path.join(workdir, "encoded.db")
+        with closing(sqlite3.connect(text_db)) as c:
+            create_schema(c)
+            leads, calls = [], []
+            for i in range(1, args.leads + 1):
+                created = start + timedelta(minutes=rnd.randrange(365 * 24 * 60))
+                leads.append((i, f"BENCH-{i}", f"336{rnd.randrange(10**8):08d}", rnd.choice(["Colisée", "Nohée"]),
+                              rnd.choice(["Web", "Appel entrant", "ODP"]), created.isoformat(), created.isoformat()))
+                for level in range(1, rnd.randint(1, 5)):
+                    done = (created + timedelta(minutes=30 * level)).isoformat()
+                    calls.append((i, rnd.choice(agents), level, rnd.choice(results), rnd.choice(["NORMAL", "P1"]),
+                                  None, done, done))
+            c.executemany("INSERT INTO leads VALUES (?,?,?,?,?,?,?)", leads)
+            c.executemany("""
+                INSERT INTO calls (lead_id, agent, attempt_level, result, priority, next_call_at, done_at, created_at)
+                VALUES (?,?,?,?,?,?,?,?)
+            """, calls)
+            for step in MIGRATIONS[0][2]:
+                c.execute(step)
+            c.commit()
+            c.execute("VACUUM")
+        shutil.copy(text_db, encoded_db)
+        with closing(sqlite3.connect(encoded_db)) as c:
+            c.execute("CREATE TABLE agents (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL)")
+            encode_dictionaries(c)
+            c.execute("ANALYZE")
+            c.commit()
+            c.execute("VACUUM")
+
+        # Même question (appels réalisés d'un projet, 100 derniers avec textes) sur les deux schémas
+        queries = {
+            "count projet": (
+                """SELECT COUNT(*) FROM calls c JOIN leads l ON l.id=c.lead_id
+                   WHERE c.done_at IS NOT NULL AND l.projet=?""",
+                """SELECT COUNT(*) FROM calls c JOIN leads l ON l.id=c.lead_id
+                   WHERE c.done_at IS NOT NULL AND l.projet_id=(SELECT id FROM projets WHERE name=?)""",
+            ),
+            "leads projet": (
+                "SELECT COUNT(*) FROM leads l WHERE l.projet=?",
+                "SELECT COUNT(*) FROM leads l WHERE l.projet_id=(SELECT id FROM projets WHERE name=?)",
+            ),
+            "page projet": (
+                """SELECT c.id, l.projet, l.type_lead, c.agent, c.result, c.priority, c.done_at
+                   FROM calls c CROSS JOIN leads l ON l.id=c.lead_id
+                   WHERE c.done_at IS NOT NULL AND l.projet=? ORDER BY c.done_at DESC, c.id DESC LIMIT 100""",
+                """SELECT c.id, l.projet, l.type_lead, c.agent, c.result, c.priority, c.done_at
+                   FROM calls_named c CROSS JOIN leads_named l ON l.id=c.lead_id
+                   WHERE c.done_at IS NOT NULL AND l.projet_id=(SELECT id FROM projets WHERE name=?)
+                   ORDER BY c.done_at DESC, c.id DESC LIMIT 100""",
+            ),
+        }
+        size_text, size_encoded = os.path.getsize(text_db), os.path.getsize(encoded_db)
+        print(f"{args.leads} leads, {len(calls)} appels")
+        print(f"taille  texte {size_text / 2**20:.1f} Mo  encodé {size_encoded / 2**20:.1f} Mo  "
+              f"({100 * (size_encoded - size_text) / size_text:+.0f} %)")
+        mismatches = 0
+        with closing(sqlite3.connect(text_db)) as text, closing(sqlite3.connect(encoded_db)) as encoded:
+            for name, (text_sql, encoded_sql) in queries.items():
+                timings = []
+                for c, sql in ((text, text_sql), (encoded, encoded_sql)):
+                    c.execute(sql, ("Nohée",)).fetchall()  # cache chaud
+                    started = time.perf_counter()
+                    for _ in range(5):
+                        rows = c.execute(sql, ("Nohée",)).fetchall()
+                    timings.append(((time.perf_counter() - started) / 5 * 1000, rows))
+                (text_ms, expected), (encoded_ms, got) = timings
+                mismatches += expected != got
+                print(f"{name:<14} texte {text_ms:8.1f} ms  encodé {encoded_ms:8.1f} ms  x{text_ms / encoded_ms:.1f}")
+        shutil.rmtree(workdir)
+        print(f"{mismatches} écart(s)")
+        sys.exit(1 if mismatches else 0)
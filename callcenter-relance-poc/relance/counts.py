@@ -0,0 +1,76 @@
+"""Totaux des listes en cache, ajustés par les écritures"""
+
+import threading
+import time
+
+from relance.db.writer import WRITER
+from relance.kpi import filter_keys
+
+# ================= COUNT CACHE =================
+COUNT_CACHE_TTL = 60.0  # secondes : filet pour les écritures hors process (scripts, seed)
+
+class CountCache:
+    """COUNT(*) des listes par (endpoint, projet, type_lead), ajustés par les écritures"""
+
+    def __init__(self, ttl: float = COUNT_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}      # (endpoint, projet, type_lead) -> (total, computed_at)
+        self._generation = {}   # endpoint -> compteur d'écritures
+        self._stats = {"hits": 0, "misses": 0, "adjustments": 0}
+
+    def get(self, c, endpoint: str, projet: str, type_lead: str, count_sql: str, params: list) -> int:
+        key = (endpoint, projet, type_lead)
+        now = time.monotonic()
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit and now - hit[1] < self.ttl:
+                self._stats["hits"] += 1
+                return hit[0]
+            self._stats["misses"] += 1
+            generation = self._generation.get(endpoint, 0)
+
+        total = c.execute(count_sql, params).fetchone()[0]
+
+        with self._lock:
+            # Une écriture committée pendant le COUNT le rend douteux : on ne le garde pas
+            if self._generation.get(endpoint, 0) == generation:
+                self._entries[key] = (total, now)
+        return total
+
+    def adjust(self, endpoint: str, projet: str, type_lead: str, delta: int):
+        """Reporte une écriture sur les totaux en cache des filtres concernés"""
+        with self._lock:
+            self._generation[endpoint] = self._generation.get(endpoint, 0) + 1
+            for key in filter_keys(projet, type_lead):
+                hit = self._entries.get((endpoint, *key))
+                if hit:
+                    self._entries[(endpoint, *key)] = (hit[0] + delta, hit[1])
+                    self._stats["adjustments"] += 1
+
+    def invalidate(self, endpoint: str | None = None):
+        with self._lock:
+            for key in [k for k in self._entries if endpoint is None or k[0] == endpoint]:
+                del self._entries[key]
+            for name in ([endpoint] if endpoint else list(self._generation)):
+                self._generation[name] = self._generation.get(name, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else None,
+            }
+
+COUNTS = CountCache()
+
+def count_on_commit(c, lead_id: int, **deltas):
+    """Ajuste après COMMIT les totaux en cache des listes touchées par une écriture sur un lead"""
+    lead = c.execute("SELECT projet, type_lead FROM leads_named WHERE id=?", (lead_id,)).fetchone()
+    if not lead:
+        return  # lead inconnu : la jointure l'exclut déjà des listes
+    for endpoint, delta in deltas.items():
+        if delta:
+            WRITER.on_commit(lambda e=endpoint, d=delta: COUNTS.adjust(e, lead[0], lead[1], d))
@@ -0,0 +1 @@
+"""Accès SQLite : pool des lecteurs, écrivain unique et schéma"""
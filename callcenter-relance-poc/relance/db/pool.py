@@ -0,0 +1,209 @@
+"""Connexions SQLite : réglages, archive attachée, pool des lecteurs, verrou du process"""
+
+from contextlib import contextmanager
+import os
+import sqlite3
+import threading
+import time
+
+from relance.metrics import METRICS, TimedConnection
+
+# ================= DB POOL =================
+# CALLS_DB : autre base que calls.db (tests sur une copie, bancs)
+DB = os.environ.get("CALLS_DB", "calls.db")
+
+# Réglages appliqués à chaque connexion (WAL activé une fois dans init_db)
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_PRAGMAS = {
+    "synchronous": "NORMAL",     # suffisant et sûr en WAL
+    "cache_size": -32000,        # ~32 Mo de cache de pages
+    "mmap_size": 268435456,      # 256 Mo mappés en mémoire
+    "temp_store": "MEMORY",
+}
+
+def configure_connection(conn: sqlite3.Connection, readonly: bool = False):
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    for name, value in SQLITE_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    if readonly:
+        # Les connexions du pool ne font que lire : les écritures passent par WRITER
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+# Historique archivé (ARCHIVE) : fichier voisin de la base, attaché à chaque connexion
+ARCHIVE_SUFFIX = "_archive"
+
+def archive_path(path: str) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}{ARCHIVE_SUFFIX}{ext or '.db'}"
+
+def archive_attached(conn: sqlite3.Connection) -> bool:
+    return any(row[1] == "archive" for row in conn.execute("PRAGMA database_list"))
+
+def attach_archive(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """Attache l'archive sous le nom `archive` (fichier créé vide au besoin)"""
+    if archive_attached(conn):
+        return conn
+    main_file = next(row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main")
+    if main_file:  # rien à attacher pour une base en mémoire
+        conn.execute("ATTACH DATABASE ? AS archive", (archive_path(main_file),))
+    return conn
+
+def open_connection(path: str, role: str) -> sqlite3.Connection:
+    """Connexion chronométrée ; rôle : reader (pool, lecture seule) ou writer"""
+    started = time.perf_counter()
+    conn = sqlite3.connect(path, check_same_thread=False, factory=TimedConnection)
+    configure_connection(conn, readonly=role == "reader")
+    attach_archive(conn)
+    METRICS.observe("relance_sqlite_connection_open_seconds", time.perf_counter() - started, role=role)
+    return conn
+
+POOL_MAX_SIZE = 16          # connexions ouvertes au maximum
+POOL_ACQUIRE_TIMEOUT = 5.0  # secondes d'attente max quand le pool est plein
+POOL_HEALTH_INTERVAL = 30.0 # au-delà, une connexion inactive est re-vérifiée
+
+class PoolTimeout(Exception):
+    pass
+
+class ConnectionPool:
+    """Pool borné de connexions SQLite, réutilisées en priorité par le même thread"""
+
+    def __init__(self, path: str, max_size: int = POOL_MAX_SIZE,
+                 timeout: float = POOL_ACQUIRE_TIMEOUT,
+                 health_interval: float = POOL_HEALTH_INTERVAL):
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self._cond = threading.Condition()
+        self._idle = []      # [(conn, thread_id du dernier emprunteur, released_at)]
+        self._size = 0
+        self._closed = True
+        self._stats = {"opened": 0, "reused": 0, "waits": 0, "timeouts": 0,
+                       "discarded": 0, "health_checks": 0}
+
+    def open(self):
+        with self._cond:
+            self._closed = False
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            for conn, _, _ in self._idle:
+                conn.close()
+            self._size -= len(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+
+    def _connect(self) -> sqlite3.Connection:
+        return open_connection(self.path, "reader")
+
+    def _take_idle(self):
+        # Affinité : on reprend la connexion déjà utilisée par ce thread si possible
+        me = threading.get_ident()
+        for i in range(len(self._idle) - 1, -1, -1):
+            if self._idle[i][1] == me:
+                return self._idle.pop(i)
+        return self._idle.pop()
+
+    def _healthy(self, conn: sqlite3.Connection) -> bool:
+        self._stats["health_checks"] += 1
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self) -> sqlite3.Connection:
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                if self._idle:
+                    conn, _, released_at = self._take_idle()
+                    if time.monotonic() - released_at < self.health_interval or self._healthy(conn):
+                        self._stats["reused"] += 1
+                        return conn
+                    self._stats["discarded"] += 1
+                    self._size -= 1
+                    conn.close()
+                    continue
+                if self._size < self.max_size:
+                    self._size += 1
+                    self._stats["opened"] += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout("No database connection available")
+                self._stats["waits"] += 1
+                self._cond.wait(remaining)
+
+        # Ouverture hors verrou : le slot est déjà réservé
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn: sqlite3.Connection):
+        # Une transaction laissée ouverte garderait ses verrous : on l'annule
+        broken = False
+        try:
+            conn.close_cursors()  # mesures enregistrées ici, sur le thread emprunteur
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            broken = True
+
+        with self._cond:
+            if broken or self._closed:
+                self._size -= 1
+                self._stats["discarded"] += 1
+                conn.close()
+            else:
+                self._idle.append((conn, threading.get_ident(), time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        started = time.perf_counter()
+        conn = self.acquire()
+        METRICS.observe("relance_sqlite_pool_acquire_seconds", time.perf_counter() - started)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                **self._stats,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+            }
+
+POOL = ConnectionPool(DB)
+
+def db():
+    """Emprunte une connexion au pool : `with db() as c:` la rend toujours"""
+    return POOL.connection()
+
+# ---------- VERROU DU PROCESS ----------
+def lock_database(path: str) -> sqlite3.Connection:
+    """Un seul process sert une base : scheduler, compteurs, caches et file d'écriture sont
+    en mémoire. Verrou exclusif SQLite sur un fichier voisin, rendu par l'OS si le process
+    meurt ; un second worker (uvicorn --workers, second serveur) refuse de démarrer."""
+    lock = sqlite3.connect(f"{path}.lock", timeout=0, isolation_level=None, check_same_thread=False)
+    try:
+        lock.execute("PRAGMA locking_mode=EXCLUSIVE")
+        lock.execute("BEGIN EXCLUSIVE")
+    except sqlite3.OperationalError:
+        lock.close()
+        raise RuntimeError(f"{path} est déjà servie par un autre process : un seul worker par base")
+    return lock
@@ -0,0 +1,85 @@
+"""Lectures sur un pool de threads, chacune avec une connexion du pool"""
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import threading
+import time
+
+from relance.db.pool import ConnectionPool, POOL
+from relance.metrics import METRICS
+
+# ================= READER =================
+class ReadExecutor:
+    """Lectures hors event loop : threads dédiés, bornés à la taille du pool"""
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats = {"reads": 0, "failed": 0, "in_flight": 0,
+                       "queue_wait_ms_total": 0.0, "queue_wait_ms_max": 0.0}
+
+    def start(self):
+        if self._executor:
+            return
+        # Autant de threads que de connexions : une lecture n'attend jamais le pool
+        self._executor = ThreadPoolExecutor(max_workers=self.pool.max_size,
+                                            thread_name_prefix="sqlite-reader")
+
+    def stop(self):
+        if not self._executor:
+            return
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    def _call(self, fn, args, queued_at):
+        ms = (time.perf_counter() - queued_at) * 1000
+        METRICS.observe("relance_reader_queue_wait_seconds", ms / 1000)
+        with self._lock:
+            self._stats["in_flight"] += 1
+            self._stats["queue_wait_ms_total"] += ms
+            self._stats["queue_wait_ms_max"] = max(self._stats["queue_wait_ms_max"], ms)
+        try:
+            return fn(*args)
+        except BaseException:
+            with self._lock:
+                self._stats["failed"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._stats["in_flight"] -= 1
+                self._stats["reads"] += 1
+
+    async def call(self, fn, *args):
+        """`fn(*args)` exécuté sur un thread lecteur, sans connexion"""
+        # Contexte de l'appelant propagé : temps SQL attribués à sa requête HTTP
+        ctx = contextvars.copy_context()
+        return await asyncio.wrap_future(
+            self._executor.submit(ctx.run, self._call, fn, args, time.perf_counter())
+        )
+
+    async def run(self, fn, *args):
+        """`fn(c, *args)` exécuté sur un thread lecteur avec une connexion du pool"""
+        def with_connection():
+            with self.pool.connection() as c:
+                return fn(c, *args)
+        return await self.call(with_connection)
+
+    async def iterate(self, gen):
+        """Consomme un générateur synchrone (qui lit la base) lot par lot sur les threads lecteurs"""
+        done = object()
+        try:
+            while True:
+                item = await self.call(next, gen, done)
+                if item is done:
+                    break
+                yield item
+        finally:
+            await self.call(gen.close)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "max_workers": self.pool.max_size}
+
+READER = ReadExecutor(POOL)
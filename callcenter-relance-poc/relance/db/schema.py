@@ -0,0 +1,198 @@
+"""Schéma : tables d'origine, tables de correspondance et vues décodées (*_named)"""
+
+from relance.db.pool import archive_attached
+from relance.db.writer import WRITER
+
+# ================= SCHEMA =================
+def ensure_columns(c, table: str, wanted: dict[str, str]):
+    cols = {row[1] for row in c.execute(f"PRAGMA table_info({table})").fetchall()}
+    for name, coldef in wanted.items():
+        if name not in cols:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {name} {coldef}")
+
+def create_schema(c):
+    # Schéma d'origine (colonnes texte) : la migration 7 l'encode (DICTIONARIES)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS leads (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        lead_key TEXT UNIQUE NOT NULL,
+        phone TEXT,
+        projet TEXT NOT NULL,
+        type_lead TEXT NOT NULL,
+        lead_created_at TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    """)
+
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS calls (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        lead_id INTEGER NOT NULL,
+        agent TEXT NOT NULL,
+        attempt_level INTEGER NOT NULL,
+        result TEXT NOT NULL,
+        priority TEXT NOT NULL,
+        next_call_at TEXT,
+        done_at TEXT,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY (lead_id) REFERENCES leads(id)
+    )
+    """)
+
+    # migrations soft
+    ensure_columns(c, "leads", {"phone": "TEXT"})
+    ensure_columns(c, "calls", {"done_at": "TEXT", "agent_id": "INTEGER"})
+    # lead_stats (migration 2) : colonnes ajoutées depuis, présentes avant toute reconstruction
+    if c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='lead_stats'").fetchone():
+        ensure_columns(c, "lead_stats", {"last_result": "TEXT", "last_done_at": "TEXT", "first_agent": "TEXT"})
+
+# ================= DICTIONARIES =================
+# Les textes répétés (projet, type, agent, résultat, priorité) sont stockés en entiers.
+# Les vues leads_named / calls_named redonnent les colonnes texte : les lectures gardent
+# leur forme, et un texte n'est décodé que si la requête le lit.
+DICTIONARIES = {
+    # colonne texte -> (table de correspondance, table encodée)
+    "projet": ("projets", "leads"),
+    "type_lead": ("lead_types", "leads"),
+    "agent": ("agents", "calls"),
+    "result": ("results", "calls"),
+    "priority": ("priorities", "calls"),
+}
+DICTIONARY_IDS = {}  # (colonne, texte) -> id, valeurs committées seulement
+
+def encode(c, column: str, name: str) -> int:
+    """Id d'un texte, ajouté à sa table de correspondance au besoin (transaction de l'écriture)"""
+    key = (column, name)
+    cached = DICTIONARY_IDS.get(key)
+    if cached is not None:
+        return cached
+    table = DICTIONARIES[column][0]
+    row = c.execute(f"SELECT id FROM {table} WHERE name=?", (name,)).fetchone()
+    row_id = row[0] if row else c.execute(f"INSERT INTO {table} (name) VALUES (?)", (name,)).lastrowid
+    # Caché après COMMIT : un id créé dans une transaction annulée ne doit pas survivre
+    WRITER.on_commit(lambda: DICTIONARY_IDS.setdefault(key, row_id))
+    return row_id
+
+def dictionary_id_sql(column: str) -> str:
+    """Filtre côté lecture : le texte est traduit une fois, l'index porte sur l'id"""
+    return f"(SELECT id FROM {DICTIONARIES[column][0]} WHERE name=?)"
+
+ENCODED_TABLES = {
+    "leads": """
+        CREATE TABLE {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lead_key TEXT UNIQUE NOT NULL,
+            phone TEXT,
+            projet_id INTEGER NOT NULL REFERENCES projets(id),
+            type_lead_id INTEGER NOT NULL REFERENCES lead_types(id),
+            lead_created_at TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )""",
+    "calls": """
+        CREATE TABLE {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lead_id INTEGER NOT NULL REFERENCES leads(id),
+            agent_id INTEGER NOT NULL REFERENCES agents(id),
+            attempt_level INTEGER NOT NULL,
+            result_id INTEGER NOT NULL REFERENCES results(id),
+            priority_id INTEGER NOT NULL REFERENCES priorities(id),
+            next_call_at TEXT,
+            done_at TEXT,
+            created_at TEXT NOT NULL
+        )""",
+}
+
+ENCODED_COPIES = {
+    "leads": """
+        INSERT INTO {name} (id, lead_key, phone, projet_id, type_lead_id, lead_created_at, created_at)
+        SELECT l.id, l.lead_key, l.phone, p.id, t.id, l.lead_created_at, l.created_at
+        FROM leads l
+        JOIN projets p ON p.name=l.projet
+        JOIN lead_types t ON t.name=l.type_lead""",
+    "calls": """
+        INSERT INTO {name} (id, lead_id, agent_id, attempt_level, result_id, priority_id,
+                            next_call_at, done_at, created_at)
+        SELECT c.id, c.lead_id, a.id, c.attempt_level, r.id, p.id, c.next_call_at, c.done_at, c.created_at
+        FROM calls c
+        JOIN agents a ON a.name=c.agent
+        JOIN results r ON r.name=c.result
+        JOIN priorities p ON p.name=c.priority""",
+}
+
+# Index des migrations 1 et 6, recréés sur les colonnes encodées
+ENCODED_INDEXES = [
+    """CREATE INDEX IF NOT EXISTS idx_calls_pending
+       ON calls(next_call_at)
+       WHERE done_at IS NULL AND next_call_at IS NOT NULL""",
+    "CREATE INDEX IF NOT EXISTS idx_calls_lead_done ON calls(lead_id, done_at, result_id, created_at)",
+    """CREATE INDEX IF NOT EXISTS idx_calls_done
+       ON calls(done_at)
+       WHERE done_at IS NOT NULL""",
+    "CREATE INDEX IF NOT EXISTS idx_calls_agent ON calls(agent_id, done_at)",
+    "CREATE INDEX IF NOT EXISTS idx_leads_created ON leads(lead_created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_leads_projet_type ON leads(projet_id, type_lead_id, lead_created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_leads_type ON leads(type_lead_id, lead_created_at)",
+]
+
+# Décodage des vues, repris tel quel pour lire l'archive (ARCHIVE)
+NAMED_SELECTS = {
+    "leads": """SELECT l.id, l.lead_key, l.phone,
+              (SELECT name FROM projets WHERE id=l.projet_id) AS projet,
+              (SELECT name FROM lead_types WHERE id=l.type_lead_id) AS type_lead,
+              l.lead_created_at, l.created_at, l.projet_id, l.type_lead_id
+       FROM {schema}leads l{where}""",
+    "calls": """SELECT c.id, c.lead_id,
+              (SELECT name FROM agents WHERE id=c.agent_id) AS agent,
+              c.attempt_level,
+              (SELECT name FROM results WHERE id=c.result_id) AS result,
+              (SELECT name FROM priorities WHERE id=c.priority_id) AS priority,
+              c.next_call_at, c.done_at, c.created_at, c.agent_id, c.result_id, c.priority_id
+       FROM {schema}calls c{where}""",
+}
+
+def archive_named(table: str) -> str:
+    """Équivalent de leads_named / calls_named sur l'archive, en sous-requête.
+
+    Une ligne encore présente dans la base (entre la copie et la purge d'un lot
+    d'archivage) n'est lue qu'une fois : côté base.
+    """
+    alias = {"leads": "l", "calls": "c"}[table]
+    where = f" WHERE NOT EXISTS (SELECT 1 FROM main.{table} m WHERE m.id={alias}.id)"
+    return f"({NAMED_SELECTS[table].format(schema='archive.', where=where)})"
+
+def history_sources(c) -> list[tuple[str, str, str]]:
+    """(calls, leads, lead_stats) de la base, puis de l'archive si elle est attachée"""
+    sources = [("calls_named", "leads_named", "lead_stats")]
+    if archive_attached(c):
+        sources.append((archive_named("calls"), archive_named("leads"), "archive.lead_stats"))
+    return sources
+
+NAMED_VIEWS = [
+    "CREATE VIEW IF NOT EXISTS leads_named AS\n       " + NAMED_SELECTS["leads"].format(schema="", where=""),
+    "CREATE VIEW IF NOT EXISTS calls_named AS\n       " + NAMED_SELECTS["calls"].format(schema="", where=""),
+    # Écrivains hors API (scripts d'import) : insertion en texte dans les vues, encodée ici
+    """CREATE TRIGGER IF NOT EXISTS leads_named_insert INSTEAD OF INSERT ON leads_named
+       BEGIN
+         INSERT OR IGNORE INTO projets (name) VALUES (NEW.projet);
+         INSERT OR IGNORE INTO lead_types (name) VALUES (NEW.type_lead);
+         INSERT INTO leads (lead_key, phone, projet_id, type_lead_id, lead_created_at, created_at)
+         VALUES (NEW.lead_key, NEW.phone,
+                 (SELECT id FROM projets WHERE name=NEW.projet),
+                 (SELECT id FROM lead_types WHERE name=NEW.type_lead),
+                 NEW.lead_created_at, NEW.created_at);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS calls_named_insert INSTEAD OF INSERT ON calls_named
+       BEGIN
+         INSERT OR IGNORE INTO agents (name) VALUES (NEW.agent);
+         INSERT OR IGNORE INTO results (name) VALUES (NEW.result);
+         INSERT OR IGNORE INTO priorities (name) VALUES (NEW.priority);
+         INSERT INTO calls (lead_id, agent_id, attempt_level, result_id, priority_id,
+                            next_call_at, done_at, created_at)
+         VALUES (NEW.lead_id,
+                 (SELECT id FROM agents WHERE name=NEW.agent),
+                 NEW.attempt_level,
+                 (SELECT id FROM results WHERE name=NEW.result),
+                 (SELECT id FROM priorities WHERE name=NEW.priority),
+                 NEW.next_call_at, NEW.done_at, NEW.created_at);
+       END""",
+]
@@ -0,0 +1,233 @@
+"""Écrivain unique : file des écritures, transactions (UnitOfWork) et reprises sur SQLITE_BUSY"""
+
+from concurrent.futures import Future
+from contextlib import contextmanager
+import asyncio
+import contextvars
+import queue
+import sqlite3
+import logging
+import threading
+import time
+
+from relance.cache import HTTP_CACHE
+from relance.db.pool import DB, open_connection
+from relance.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# ================= WRITER =================
+WRITE_MAX_RETRIES = 5      # tentatives supplémentaires sur SQLITE_BUSY
+WRITE_BACKOFF_BASE = 0.02  # secondes, doublé à chaque tentative
+WRITE_BACKOFF_MAX = 0.5
+
+def is_busy_error(e: Exception) -> bool:
+    if not isinstance(e, sqlite3.OperationalError):
+        return False
+    code = getattr(e, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
+
+class UnitOfWork:
+    """Transaction d'écriture : BEGIN IMMEDIATE … COMMIT, ROLLBACK sur toute erreur.
+
+    IMMEDIATE prend le verrou d'écriture dès le BEGIN, où s'applique busy_timeout :
+    une transaction ne découvre plus au premier UPDATE, après ses lectures, qu'un
+    autre processus écrit (SQLITE_BUSY immédiat, sans attente). Mesure l'attente
+    puis la détention du verrou.
+    """
+    __slots__ = ("c", "op", "wait", "hold", "_acquired")
+
+    def __init__(self, c: sqlite3.Connection, op: str = "write"):
+        self.c = c
+        self.op = op
+        self.wait = 0.0
+        self.hold = 0.0
+
+    def __enter__(self):
+        started = time.perf_counter()
+        self.c.execute("BEGIN IMMEDIATE")
+        self._acquired = time.perf_counter()
+        self.wait = self._acquired - started
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                try:
+                    self.c.commit()
+                except BaseException:
+                    self.c.rollback()
+                    raise
+            else:
+                self.c.rollback()
+        finally:
+            self.hold = time.perf_counter() - self._acquired
+            METRICS.observe("relance_sqlite_write_lock_hold_seconds", self.hold, op=self.op)
+        return False
+
+EXTERNAL_WRITE_POLL = 1.0  # secondes : délai de repérage des écritures d'un autre process
+
+class WriteQueue:
+    """Thread unique qui sérialise toutes les écritures sur sa propre connexion"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue = queue.Queue()
+        self._thread = None
+        self._conn = None
+        self._hooks = []
+        self._data_version = None  # (PRAGMA data_version par base attachée, vu à)
+        self._stats = {"writes": 0, "failed": 0, "busy_retries": 0,
+                       "lock_wait_ms_total": 0.0, "lock_wait_ms_max": 0.0,
+                       "lock_hold_ms_total": 0.0, "lock_hold_ms_max": 0.0,
+                       "queue_wait_ms_total": 0.0}
+
+    def start(self):
+        if self._thread:
+            return
+        self._conn = open_connection(self.path, "writer")
+        self._data_version = None
+        self._watch_external_writes()  # référence : écritures antérieures au démarrage exclues
+        self._thread = threading.Thread(target=self._loop, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._queue.put(None)  # les écritures déjà en file passent avant
+        self._thread.join()
+        self._thread = None
+        self._conn.close()
+        self._conn = None
+
+    def submit(self, fn, *args, transaction: bool = True) -> Future:
+        fut = Future()
+        # Contexte de l'appelant : les requêtes SQL comptent dans les temps de sa requête HTTP
+        self._queue.put((fn, args, transaction, fut, time.perf_counter(), contextvars.copy_context()))
+        return fut
+
+    async def run(self, fn, *args, transaction: bool = True):
+        """`fn(c, *args)` exécuté dans une UnitOfWork du writer, sans bloquer l'event loop.
+
+        transaction=False : hors transaction, pour ce que SQLite refuse dedans (wal_checkpoint).
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, transaction=transaction))
+
+    def on_commit(self, cb):
+        """Enregistre un callback exécuté après le COMMIT de la transaction courante"""
+        self._hooks.append(cb)
+
+    @contextmanager
+    def savepoint(self, c, name: str = "item"):
+        """Sous-transaction : en cas d'erreur, ses écritures et ses callbacks post-COMMIT sont annulés"""
+        hooks = len(self._hooks)
+        c.execute(f"SAVEPOINT {name}")
+        try:
+            yield
+        except BaseException:
+            c.execute(f"ROLLBACK TO {name}")
+            c.execute(f"RELEASE {name}")
+            del self._hooks[hooks:]
+            raise
+        c.execute(f"RELEASE {name}")
+
+    def split(self, c):
+        """COMMIT au milieu d'une écriture puis nouveau BEGIN IMMEDIATE : la file reste à elle"""
+        c.commit()
+        c.execute("BEGIN IMMEDIATE")
+
+    def _watch_external_writes(self):
+        """data_version de la connexion du writer : ne bouge qu'aux COMMIT des autres
+        connexions, c'est-à-dire d'un autre process (seed, script, CLI) -> cache HTTP périmé"""
+        now = time.monotonic()
+        if self._data_version and now - self._data_version[1] < EXTERNAL_WRITE_POLL:
+            return
+        c = self._conn
+        versions = tuple(c.execute(f"PRAGMA {row[1]}.data_version").fetchone()[0]
+                         for row in c.execute("PRAGMA database_list").fetchall())
+        if self._data_version and versions != self._data_version[0]:
+            HTTP_CACHE.bump_all()
+        self._data_version = (versions, now)
+
+    def _loop(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=EXTERNAL_WRITE_POLL)
+            except queue.Empty:
+                self._watch_external_writes()
+                self._conn.close_cursors()
+                continue
+            if item is None:
+                break
+            self._watch_external_writes()
+            fn, args, transaction, fut, queued_at, ctx = item
+            waited = time.perf_counter() - queued_at
+            self._stats["queue_wait_ms_total"] += waited * 1000
+            METRICS.observe("relance_writer_queue_wait_seconds", waited)
+            if not fut.set_running_or_notify_cancel():
+                continue
+            error = None
+            try:
+                result = ctx.run(self._execute, fn, args, transaction)
+            except BaseException as e:
+                self._stats["failed"] += 1
+                error = e
+            # Curseurs du job fermés (et mesurés) dans son contexte, avant de rendre la main
+            ctx.run(self._conn.close_cursors)
+            if error is None:
+                fut.set_result(result)
+            else:
+                fut.set_exception(error)
+
+    def _execute(self, fn, args, transaction):
+        c = self._conn
+        if not transaction:
+            return fn(c, *args)
+        lock_wait = 0.0
+        attempt = 0
+        try:
+            while True:
+                self._hooks = []
+                started = time.perf_counter()
+                try:
+                    with UnitOfWork(c, fn.__name__) as uow:
+                        result = fn(c, *args)
+                    lock_wait += uow.wait
+                    break
+                except Exception as e:
+                    if not is_busy_error(e) or attempt >= WRITE_MAX_RETRIES:
+                        raise
+                    delay = min(WRITE_BACKOFF_MAX, WRITE_BACKOFF_BASE * (2 ** attempt))
+                    attempt += 1
+                    self._stats["busy_retries"] += 1
+                    time.sleep(delay)
+                    lock_wait += time.perf_counter() - started
+        finally:
+            ms = lock_wait * 1000
+            self._stats["lock_wait_ms_total"] += ms
+            self._stats["lock_wait_ms_max"] = max(self._stats["lock_wait_ms_max"], ms)
+            METRICS.observe("relance_sqlite_write_lock_wait_seconds", lock_wait)
+
+        self._stats["writes"] += 1
+        ms = uow.hold * 1000
+        self._stats["lock_hold_ms_total"] += ms
+        self._stats["lock_hold_ms_max"] = max(self._stats["lock_hold_ms_max"], ms)
+        hooks, self._hooks = self._hooks, []
+        for cb in hooks:
+            try:
+                cb()
+            except Exception as e:
+                logger.error(f"Post-commit hook failed: {str(e)}")
+        return result
+
+    def stats(self) -> dict:
+        return {**self._stats, "queue_depth": self._queue.qsize()}
+
+WRITER = WriteQueue(DB)
+
+def bump_on_commit(*tables: str):
+    """Périme après COMMIT les réponses qui lisent ces tables"""
+    WRITER.on_commit(lambda: HTTP_CACHE.bump(*tables))
@@ -0,0 +1,109 @@
+"""Bus d'événements des relances, diffusé en Server-Sent Events"""
+
+from collections import deque
+import asyncio
+import signal
+import threading
+
+# ================= EVENTS =================
+EVENT_HISTORY = 1000        # événements gardés pour la reprise (Last-Event-ID)
+EVENT_QUEUE_SIZE = 1000     # au-delà, l'abonné trop lent reçoit un "reset"
+
+class Subscription:
+    """File d'un client SSE, alimentée sur l'event loop"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.lost = False
+
+    def push(self, event):
+        if self.lost:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Client trop lent : on vide et il rechargera sa liste
+            self.reset()
+
+    def reset(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait((None, "reset", {}))
+        self.lost = True
+
+class EventBus:
+    """Diffusion des changements de relances aux clients SSE, publiée après COMMIT"""
+
+    def __init__(self, history: int = EVENT_HISTORY):
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._stats = {"published": 0, "resumed": 0, "resets": 0}
+
+    def publish(self, kind: str, data: dict):
+        """Appelable depuis n'importe quel thread (hooks du writer)"""
+        with self._lock:
+            event = (self._next_id, kind, data)
+            self._next_id += 1
+            self._history.append(event)
+            self._stats["published"] += 1
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.push, event)
+            except RuntimeError:
+                pass  # event loop arrêtée : arrêt du serveur
+
+    def subscribe(self, last_event_id: int | None = None) -> Subscription:
+        sub = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(sub)
+            if last_event_id is None:
+                return sub
+            oldest = self._history[0][0] if self._history else self._next_id
+            if last_event_id < oldest - 1 or last_event_id >= self._next_id:
+                # Trou dans l'historique (ou redémarrage) : rechargement complet
+                self._stats["resets"] += 1
+                sub.reset()
+                return sub
+            self._stats["resumed"] += 1
+            for event in self._history:
+                if event[0] > last_event_id:
+                    sub.push(event)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def last_id(self) -> int:
+        """Dernier événement publié : relevé avant une lecture, il sépare ce qu'elle contient déjà"""
+        with self._lock:
+            return self._next_id - 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "subscribers": len(self._subscribers)}
+
+EVENTS = EventBus()
+
+# Les flux SSE ne finissent jamais d'eux-mêmes : sans ce signal, l'arrêt
+# gracieux d'uvicorn attendrait indéfiniment les clients connectés
+STREAMS_CLOSING = threading.Event()
+
+def close_streams_on_exit():
+    """Enchaîne les handlers SIGINT / SIGTERM du serveur pour fermer les flux d'abord"""
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            STREAMS_CLOSING.set()
+            previous(signum, frame)
+
+        signal.signal(sig, handler)
@@ -0,0 +1,213 @@
+"""KPI en mémoire par (projet, type_lead), tenus à jour par les écritures"""
+
+import bisect
+import threading
+
+from relance.db.schema import history_sources
+
+# ================= KPI =================
+def filter_keys(projet: str, type_lead: str):
+    """Les 4 combinaisons de filtres (projet, type_lead) auxquelles contribue un lead"""
+    return ((projet, type_lead), (projet, ""), ("", type_lead), ("", ""))
+
+class MinuteCounts:
+    """Effectifs par minute (arbre de Fenwick) : ajout, retrait, k-ième valeur et cumul en O(log M).
+
+    M, la plus grande minute vue, double au besoin. Les minutes négatives (premier
+    appel daté avant le lead, rare) restent dans une petite liste triée.
+    """
+
+    __slots__ = ("tree", "negatives", "count")
+
+    def __init__(self, size: int = 1024):
+        self.tree = [0] * (size + 1)  # tree[i] : effectif des minutes [i - lowbit(i), i - 1]
+        self.negatives = []
+        self.count = 0
+
+    @classmethod
+    def build(cls, minutes: list) -> "MinuteCounts":
+        """Construction en O(n + M) depuis toutes les valeurs (chargement)"""
+        size = 1024
+        top = max(minutes, default=0)
+        while top >= size:
+            size *= 2
+        counts = cls(size)
+        tree = counts.tree
+        for m in minutes:
+            if m < 0:
+                counts.negatives.append(m)
+            else:
+                tree[m + 1] += 1
+        counts.negatives.sort()
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        counts.count = len(minutes)
+        return counts
+
+    def _grow(self, minutes: int):
+        size = len(self.tree) - 1
+        while minutes >= size:
+            # Taille puissance de 2 : le nouveau dernier nœud couvre tout, les autres sont vides
+            self.tree.extend([0] * size)
+            self.tree[2 * size] = self.tree[size]
+            size *= 2
+
+    def _update(self, minutes: int, delta: int):
+        tree = self.tree
+        i = minutes + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def at_most(self, minutes: int) -> int:
+        """Nombre de valeurs <= minutes"""
+        if minutes < 0:
+            return bisect.bisect_right(self.negatives, minutes)
+        tree = self.tree
+        total = len(self.negatives)
+        i = min(minutes + 1, len(tree) - 1)
+        while i:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def add(self, minutes: int):
+        if minutes < 0:
+            bisect.insort(self.negatives, minutes)
+        else:
+            self._grow(minutes)
+            self._update(minutes, 1)
+        self.count += 1
+
+    def remove(self, minutes: int) -> bool:
+        """Retire une occurrence ; False si la valeur n'y est pas"""
+        if minutes < 0:
+            i = bisect.bisect_left(self.negatives, minutes)
+            if i == len(self.negatives) or self.negatives[i] != minutes:
+                return False
+            self.negatives.pop(i)
+        else:
+            if self.at_most(minutes) == self.at_most(minutes - 1):
+                return False
+            self._update(minutes, -1)
+        self.count -= 1
+        return True
+
+    def kth(self, k: int) -> int:
+        """k-ième plus petite valeur (k à partir de 1, k <= count)"""
+        if k <= len(self.negatives):
+            return self.negatives[k - 1]
+        k -= len(self.negatives)
+        tree = self.tree
+        size = len(tree) - 1
+        pos, step = 0, size
+        while step:
+            if pos + step <= size and tree[pos + step] < k:
+                pos += step
+                k -= tree[pos]
+            step //= 2
+        return pos  # l'indice pos + 1 porte la minute pos
+
+class KpiBucket:
+    """Totaux d'un filtre + statistiques d'ordre des réactivités mesurées"""
+
+    __slots__ = ("leads", "calls", "in_scope", "reacs", "reac_sum")
+
+    def __init__(self):
+        self.leads = 0
+        self.calls = 0
+        self.in_scope = 0
+        self.reacs = MinuteCounts()  # médiane par k-ième valeur, ≤45 par cumul
+        self.reac_sum = 0
+
+    def add_reac(self, minutes: int):
+        self.reacs.add(minutes)
+        self.reac_sum += minutes
+
+    def remove_reac(self, minutes: int):
+        if self.reacs.remove(minutes):
+            self.reac_sum -= minutes
+
+class KpiEngine:
+    """KPI du dashboard sur toute la population, mis à jour à chaque écriture"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self.version = 0  # incrémenté à chaque changement : le flux SSE pousse le snapshot
+
+    def load(self, c):
+        buckets = {}
+        reacs = {}
+        # Leads archivés compris : l'archivage ne change pas les KPI
+        for _, leads_src, stats_src in history_sources(c):
+            # Totaux et sommes calculés côté SQL
+            for projet, type_lead, leads, calls, in_scope, reac_sum in c.execute(f"""
+                SELECT l.projet, l.type_lead, COUNT(*), SUM(s.call_count),
+                       SUM(s.reactivity_in_scope),
+                       SUM(CASE WHEN s.reactivity_in_scope=1 THEN s.reactivity_minutes END)
+                FROM {stats_src} s
+                JOIN {leads_src} l ON l.id=s.lead_id
+                GROUP BY l.projet, l.type_lead
+            """):
+                for key in filter_keys(projet, type_lead):
+                    b = buckets.setdefault(key, KpiBucket())
+                    b.leads += leads
+                    b.calls += calls or 0
+                    b.in_scope += in_scope or 0
+                    b.reac_sum += reac_sum or 0
+            for projet, type_lead, minutes in c.execute(f"""
+                SELECT l.projet, l.type_lead, s.reactivity_minutes
+                FROM {stats_src} s
+                JOIN {leads_src} l ON l.id=s.lead_id
+                WHERE s.reactivity_in_scope=1 AND s.reactivity_minutes IS NOT NULL
+            """):
+                for key in filter_keys(projet, type_lead):
+                    reacs.setdefault(key, []).append(minutes)
+        for key, minutes in reacs.items():
+            buckets[key].reacs = MinuteCounts.build(minutes)
+        with self._lock:
+            self._buckets = buckets
+            self.version += 1
+
+    def apply(self, projet: str, type_lead: str, old, new):
+        """Applique le passage d'un lead de `old` à `new` : (call_count, in_scope, minutes) ou None"""
+        with self._lock:
+            for key in filter_keys(projet, type_lead):
+                b = self._buckets.setdefault(key, KpiBucket())
+                if old is None:
+                    b.leads += 1
+                else:
+                    b.calls -= old[0]
+                    b.in_scope -= old[1]
+                    if old[1] == 1 and old[2] is not None:
+                        b.remove_reac(old[2])
+                b.calls += new[0]
+                b.in_scope += new[1]
+                if new[1] == 1 and new[2] is not None:
+                    b.add_reac(new[2])
+            self.version += 1
+
+    def snapshot(self, projet: str = "", type_lead: str = "") -> dict:
+        with self._lock:
+            b = self._buckets.get((projet, type_lead)) or KpiBucket()
+            measured = b.reacs.count
+            if measured:
+                mid = measured // 2
+                median = b.reacs.kth(mid + 1) if measured % 2 else (b.reacs.kth(mid) + b.reacs.kth(mid + 1)) / 2
+                under_45 = b.reacs.at_most(45)
+            comb = (b.calls / b.leads) if b.leads else 0.0
+            return {
+                "leads_total": b.leads,
+                "calls_total": b.calls,
+                "combativite_calls_per_lead": round(comb, 2),
+                "reactivite_mean_minutes": round(b.reac_sum / measured, 1) if measured else None,
+                "reactivite_median_minutes": round(median, 1) if measured else None,
+                "reactivite_pct_under_45": round(100.0 * under_45 / measured, 1) if measured else 0.0,
+                "reactivite_measured_leads": measured,
+                "reactivite_in_scope_leads": b.in_scope,
+            }
+
+KPI = KpiEngine()
@@ -0,0 +1,250 @@
+"""Agrégats par lead (lead_stats) et calcul de la réactivité"""
+
+from datetime import date, datetime, timedelta, timezone
+
+try:
+    import numpy as np  # optionnel : calcul vectorisé de la réactivité
+except ImportError:
+    np = None
+
+from relance.calendar import PARIS, default_calendar, in_business_hours
+from relance.db.writer import WRITER
+from relance.kpi import KPI
+from relance.rollups import rollup_lead
+
+# ================= LEAD STATS =================
+# Une ligne agrégée par lead, tenue à jour dans la transaction de chaque écriture
+LEAD_STATS_COLUMNS = ("call_count, first_done_at, first_call_at, first_agent, last_result, last_done_at, "
+                      "reactivity_in_scope, reactivity_minutes")
+
+# ---------- REACTIVITY ----------
+# Les dates sont en heure de Paris, avec offset (iso_now) ou sans (seed, saisie) :
+# une date naïve est lue comme heure murale Paris, une date avec offset telle quelle.
+REACTIVITY_VECTOR_MIN = 64  # en dessous, la boucle Python coûte moins que la conversion NumPy
+
+def to_aware(value: str) -> datetime:
+    dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo else dt.replace(tzinfo=PARIS)
+
+def compute_reactivity(lead_created_at: str | None, first_call_at: str | None):
+    """(reactivity_in_scope, reactivity_minutes) d'un lead"""
+    if not lead_created_at or not first_call_at:
+        return 0, None
+    try:
+        dt_lead = to_aware(lead_created_at)
+        dt_first = to_aware(first_call_at)
+    except ValueError:
+        return 0, None
+    if not in_business_hours(dt_lead.astimezone(PARIS)):
+        return 0, None
+    # Écart en UTC : entre deux dates du même fuseau, Python ignorerait le changement d'heure
+    delta = dt_first.astimezone(timezone.utc) - dt_lead.astimezone(timezone.utc)
+    return 1, int(delta.total_seconds() // 60)
+
+ISO_WIDTH = 32          # "YYYY-MM-DDTHH:MM:SS.ffffff+HH:MM"
+MICROS_PER_MINUTE = 60 * 10**6
+MICROS_PER_DAY = 24 * 60 * MICROS_PER_MINUTE
+
+def dst_edges(first_year: int, last_year: int, utc: bool):
+    """Changements d'heure de Paris (règle UE) en µs epoch, et offset (minutes) qui s'applique ensuite.
+
+    Le changement a lieu à 01:00 UTC, soit 03:00 en heure murale : l'heure sautée
+    ou répétée garde l'offset précédent, comme zoneinfo avec fold=0.
+    """
+    edges, offsets = [], []
+    for year in range(first_year, last_year + 1):
+        for month, offset in ((3, 120), (10, 60)):
+            last = date(year, month, 31)
+            last -= timedelta(days=(last.weekday() + 1) % 7)
+            days = (last - date(1970, 1, 1)).days
+            edges.append(days * MICROS_PER_DAY + (60 if utc else 180) * MICROS_PER_MINUTE)
+            offsets.append(offset)
+    return np.array(edges, dtype=np.int64), np.array(offsets, dtype=np.int64)
+
+def paris_offset(times, known, utc: bool):
+    """Offset de Paris en minutes pour des µs epoch en UTC ou en heure murale"""
+    if not known.any():
+        return np.full(len(times), 60, dtype=np.int64)
+    years = times[known] // (365 * MICROS_PER_DAY) + 1970
+    edges, offsets = dst_edges(int(years.min()) - 1, int(years.max()) + 1, utc)
+    idx = np.searchsorted(edges, times, side="right")
+    return np.where(idx == 0, 60, offsets[np.maximum(idx - 1, 0)])
+
+def parse_iso_utc(values):
+    """Chaînes ISO (ou None) -> (µs UTC, µs heure murale Paris, présentes) en int64.
+
+    Les octets sont décodés en bloc (matrice ISO_WIDTH x n) : aucune analyse
+    de chaîne ligne à ligne. ValueError si une date est mal formée ou non ASCII.
+    """
+    # Un octet de plus que le format : une chaîne trop longue se voit au lieu d'être tronquée
+    raw = np.array([v or "" for v in values], dtype=f"S{ISO_WIDTH + 1}")
+    n = len(raw)
+    length = (np.strings if hasattr(np, "strings") else np.char).str_len(raw)
+    if (length > ISO_WIDTH).any():
+        raise ValueError("Malformed ISO date")
+    known = length > 0
+    # Une ligne par position de caractère : chaque colonne lue est contiguë
+    codes = np.ascontiguousarray(raw.view(np.uint8).reshape(n, ISO_WIDTH + 1).T).astype(np.int16)
+    digits = codes - 48
+    digit_mask = (digits >= 0) & (digits <= 9)
+    rows = np.arange(n)
+
+    def is_digit(col):
+        return digit_mask[col]
+
+    def number(*cols):
+        value = np.zeros(n, dtype=np.int64)
+        for col in cols:
+            value = value * 10 + digits[col]
+        return value
+
+    has_seconds = codes[16] == 58  # ":"
+    ok = (length >= 16) & (codes[4] == 45) & (codes[7] == 45) \
+        & ((codes[10] == 84) | (codes[10] == 32)) & (codes[13] == 58)
+    for col in (0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15):
+        ok &= is_digit(col)
+    ok &= ~has_seconds | (is_digit(17) & is_digit(18))
+    year, month, day = number(0, 1, 2, 3), number(5, 6), number(8, 9)
+    hour, minute = number(11, 12), number(14, 15)
+    second = np.where(has_seconds, number(17, 18), 0)
+    ok &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31) & (hour < 24) & (minute < 60) & (second < 60)
+    if (known & ~ok).any():
+        raise ValueError("Malformed ISO date")
+
+    # Fraction de seconde : chiffres consécutifs après le "."
+    micros = np.zeros(n, dtype=np.int64)
+    in_fraction = has_seconds & (codes[19] == 46)
+    for k in range(6):
+        in_fraction = in_fraction & is_digit(20 + k)
+        micros += np.where(in_fraction, digits[20 + k].astype(np.int64) * 10 ** (5 - k), 0)
+
+    # Jours depuis l'epoch (algorithme days_from_civil de H. Hinnant)
+    y = year - (month <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    days = era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 + doy - 719468
+    wall = days * MICROS_PER_DAY + (hour * 3600 + minute * 60 + second) * 10**6 + micros
+
+    # Offset explicite "+HH:MM" / "-HH:MM" en fin de chaîne, ou "Z"
+    pos = np.maximum(length - 6, 0)
+    sign_code = codes[pos, rows]
+    sign = np.where(length - 6 >= 16, np.where(sign_code == 43, 1, np.where(sign_code == 45, -1, 0)), 0)
+
+    def at(shift):
+        return digits[np.minimum(pos + shift, ISO_WIDTH), rows].astype(np.int64)
+
+    offset = sign * ((at(1) * 10 + at(2)) * 60 + at(4) * 10 + at(5))
+    aware = (sign != 0) | (codes[np.maximum(length - 1, 0), rows] == 90)
+
+    # Une seule normalisation pour toute la colonne : naïf = heure murale Paris
+    offset = np.where(aware, offset, paris_offset(wall, known, utc=False))
+    utc = wall - offset * MICROS_PER_MINUTE
+    if aware.any():
+        local = utc + paris_offset(utc, known, utc=True) * MICROS_PER_MINUTE
+        wall = np.where(aware, local, wall)
+    return utc, wall, known
+
+def reactivity_batch(lead_created_at: list, first_call_at: list):
+    """compute_reactivity sur des colonnes entières : ([in_scope], [minutes ou None])"""
+    if np is None or len(lead_created_at) < REACTIVITY_VECTOR_MIN:
+        pairs = [compute_reactivity(a, b) for a, b in zip(lead_created_at, first_call_at)]
+        return [p[0] for p in pairs], [p[1] for p in pairs]
+    try:
+        lead_utc, lead_wall, lead_known = parse_iso_utc(lead_created_at)
+        first_utc, _, first_known = parse_iso_utc(first_call_at)
+    except ValueError:
+        # Une date mal formée : calcul ligne à ligne, qui l'ignore proprement
+        pairs = [compute_reactivity(a, b) for a, b in zip(lead_created_at, first_call_at)]
+        return [p[0] for p in pairs], [p[1] for p in pairs]
+
+    weekday = (lead_wall // MICROS_PER_DAY + 3) % 7  # 1970-01-01 était un jeudi
+    minute = lead_wall % MICROS_PER_DAY // MICROS_PER_MINUTE
+    hours = default_calendar().hours
+    opens = np.array([hours.get(d, (0, 0))[0] for d in range(7)])
+    closes = np.array([hours.get(d, (0, 0))[1] for d in range(7)])
+
+    in_scope = lead_known & first_known & (opens[weekday] <= minute) & (minute < closes[weekday])
+    delta = (first_utc - lead_utc) // MICROS_PER_MINUTE
+    minutes = np.where(in_scope, delta, -1).tolist()
+    scope = in_scope.tolist()
+    return [int(x) for x in scope], [m if ok else None for m, ok in zip(minutes, scope)]
+
+def refresh_lead_stats(c, lead_id: int):
+    """Recalcule la ligne lead_stats d'un lead depuis son historique (index lead_id)"""
+    lead = c.execute(
+        "SELECT projet, type_lead, lead_created_at FROM leads_named WHERE id=?",
+        (lead_id,)
+    ).fetchone()
+    if not lead:
+        return
+    projet, type_lead, lead_created_at = lead
+
+    old = c.execute(
+        "SELECT call_count, reactivity_in_scope, reactivity_minutes, first_agent FROM lead_stats WHERE lead_id=?",
+        (lead_id,)
+    ).fetchone()
+
+    call_count, first, last = c.execute("""
+        SELECT
+          (SELECT COUNT(*) FROM calls WHERE lead_id=? AND done_at IS NOT NULL),
+          (SELECT done_at || '|' || created_at || '|' || agent FROM calls_named
+           WHERE lead_id=? AND done_at IS NOT NULL ORDER BY done_at ASC, id ASC LIMIT 1),
+          (SELECT result || '|' || done_at FROM calls_named
+           WHERE lead_id=? AND done_at IS NOT NULL ORDER BY done_at DESC, id DESC LIMIT 1)
+    """, (lead_id, lead_id, lead_id)).fetchone()
+    first_done_at, first_call_at, first_agent = first.split("|", 2) if first else (None, None, None)
+    last_result, last_done_at = last.rsplit("|", 1) if last else (None, None)
+    in_scope, minutes = compute_reactivity(lead_created_at, first_call_at)
+
+    c.execute(f"""
+        INSERT OR REPLACE INTO lead_stats (lead_id, {LEAD_STATS_COLUMNS})
+        VALUES (?,?,?,?,?,?,?,?,?)
+    """, (lead_id, call_count, first_done_at, first_call_at, first_agent, last_result, last_done_at,
+          in_scope, minutes))
+
+    # Rollups : le lead compte dans le créneau de sa création, chez l'agent du 1er appel
+    if old is None or tuple(old[1:]) != (in_scope, minutes, first_agent):
+        if old is not None:
+            rollup_lead(c, lead_created_at, projet, type_lead, old[3], old[1], old[2], -1)
+        rollup_lead(c, lead_created_at, projet, type_lead, first_agent, in_scope, minutes, 1)
+
+    old = old[:3] if old else None
+    new = (call_count, in_scope, minutes)
+    if tuple(old or ()) != new:
+        WRITER.on_commit(lambda: KPI.apply(projet, type_lead, old, new))
+
+def rebuild_lead_stats(c):
+    """Reconstruit toute la table lead_stats (données importées hors API : seed, scripts)"""
+    c.execute("DELETE FROM lead_stats")
+    c.execute("""
+        WITH hist AS (
+            SELECT
+              lead_id, agent_id, result_id, done_at, created_at,
+              COUNT(*) OVER (PARTITION BY lead_id) AS n,
+              ROW_NUMBER() OVER (PARTITION BY lead_id ORDER BY done_at ASC, id ASC) AS rn_first,
+              ROW_NUMBER() OVER (PARTITION BY lead_id ORDER BY done_at DESC, id DESC) AS rn_last
+            FROM calls
+            WHERE done_at IS NOT NULL
+        )
+        INSERT INTO lead_stats (lead_id, call_count, first_done_at, first_call_at, first_agent, last_result, last_done_at)
+        SELECT l.id, COALESCE(f.n, 0), f.done_at, f.created_at,
+               (SELECT name FROM agents WHERE id=f.agent_id), (SELECT name FROM results WHERE id=z.result_id), z.done_at
+        FROM leads l
+        LEFT JOIN hist f ON f.lead_id=l.id AND f.rn_first=1
+        LEFT JOIN hist z ON z.lead_id=l.id AND z.rn_last=1
+    """)
+    rows = c.execute("""
+        SELECT s.lead_id, l.lead_created_at, s.first_call_at
+        FROM lead_stats s
+        JOIN leads_named l ON l.id=s.lead_id
+        WHERE s.first_call_at IS NOT NULL
+    """).fetchall()
+    if not rows:
+        return
+    lead_ids, created, first = zip(*rows)
+    in_scope, minutes = reactivity_batch(list(created), list(first))
+    c.executemany(
+        "UPDATE lead_stats SET reactivity_in_scope=?, reactivity_minutes=? WHERE lead_id=?",
+        zip(in_scope, minutes, lead_ids)
+    )
@@ -0,0 +1,313 @@
+"""Métriques Prometheus : requêtes HTTP, requêtes SQL chronométrées, journal des requêtes lentes"""
+
+from fastapi.responses import JSONResponse
+from functools import lru_cache
+import bisect
+import contextvars
+import os
+import re
+import sqlite3
+import logging
+import threading
+import time
+
+try:
+    import orjson  # optionnel : sérialisation JSON des réponses
+except ImportError:
+    orjson = None
+
+# ================= METRICS =================
+# Histogrammes et compteurs au format Prometheus (GET /metrics), sans dépendance :
+# latence par route et par phase, durée et lignes par requête SQL, ouverture des
+# connexions et attentes (pool, files lecteur / writer, verrou d'écriture)
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))  # seuil du journal des requêtes lentes
+
+slow_logger = logging.getLogger(f"{__name__}.slow")
+
+class Histogram:
+    """Observations comptées par borne (le), avec somme et nombre"""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # dernière case : +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+def prom_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+class MetricsRegistry:
+    """Familles de métriques : une série par jeu de labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}  # nom -> (type, aide, bornes, {labels: Histogram | nombre})
+
+    def describe(self, name: str, kind: str, help_text: str, buckets: tuple = ()):
+        self._families[name] = (kind, help_text, buckets, {})
+
+    def observe(self, name: str, value: float, **labels):
+        key = tuple(labels.items())
+        with self._lock:
+            _, _, buckets, series = self._families[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = tuple(labels.items())
+        with self._lock:
+            series = self._families[name][3]
+            series[key] = series.get(key, 0) + value
+
+    def render(self, gauges: dict | None = None) -> str:
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, buckets, series) in self._families.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in series.items():
+                    labels = dict(key)
+                    if kind != "histogram":
+                        lines.append(f"{name}{prom_labels(labels)} {value}")
+                        continue
+                    cumulative = 0
+                    for bound, n in zip(buckets + (float("inf"),), value.counts):
+                        cumulative += n
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f"{name}_bucket{prom_labels({**labels, 'le': le})} {cumulative}")
+                    lines.append(f"{name}_sum{prom_labels(labels)} {value.sum}")
+                    lines.append(f"{name}_count{prom_labels(labels)} {value.count}")
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+METRICS = MetricsRegistry()
+METRICS.describe("relance_http_request_duration_seconds", "histogram",
+                 "Latence des requêtes HTTP par route, jusqu'à la fin de la réponse", HTTP_BUCKETS)
+METRICS.describe("relance_http_request_phase_seconds", "histogram",
+                 "Temps d'une requête par phase : sql (exécution et lecture des lignes), "
+                 "render (sérialisation JSON), app (reste : boucles Python, validation)", HTTP_BUCKETS)
+METRICS.describe("relance_sqlite_statement_duration_seconds", "histogram",
+                 "Durée par requête SQL, exécution et fetch compris", SQL_BUCKETS)
+METRICS.describe("relance_sqlite_statement_rows_total", "counter",
+                 "Lignes lues (SELECT) ou modifiées par requête SQL")
+METRICS.describe("relance_sqlite_slow_statements_total", "counter",
+                 "Requêtes SQL au-delà de SLOW_QUERY_MS")
+METRICS.describe("relance_sqlite_connection_open_seconds", "histogram",
+                 "Ouverture d'une connexion (connect et PRAGMA)", SQL_BUCKETS)
+METRICS.describe("relance_sqlite_pool_acquire_seconds", "histogram",
+                 "Obtention d'une connexion du pool, attente et ouverture comprises", SQL_BUCKETS)
+METRICS.describe("relance_sqlite_write_lock_wait_seconds", "histogram",
+                 "Attente du verrou d'écriture par transaction (BEGIN IMMEDIATE et reprises sur SQLITE_BUSY)",
+                 SQL_BUCKETS)
+METRICS.describe("relance_sqlite_write_lock_hold_seconds", "histogram",
+                 "Détention du verrou d'écriture par transaction, de BEGIN IMMEDIATE au COMMIT / ROLLBACK",
+                 SQL_BUCKETS)
+METRICS.describe("relance_writer_queue_wait_seconds", "histogram",
+                 "Attente d'une écriture dans la file du writer", SQL_BUCKETS)
+METRICS.describe("relance_reader_queue_wait_seconds", "histogram",
+                 "Attente d'une lecture avant un thread lecteur", SQL_BUCKETS)
+
+class RequestTimings:
+    """Temps cumulés d'une requête HTTP, suivis jusque dans les threads lecteur / writer"""
+    __slots__ = ("label", "sql", "rows", "statements", "render")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.sql = 0.0
+        self.rows = 0
+        self.statements = 0
+        self.render = 0.0
+
+REQUEST_TIMINGS = contextvars.ContextVar("request_timings", default=None)
+
+@lru_cache(maxsize=1024)
+def statement_key(sql: str) -> str:
+    """Texte normalisé : une seule série par requête, quelle que soit la taille des listes IN (?,?,…)"""
+    return re.sub(r"\?(\s*,\s*\?)+", "?,…", " ".join(sql.split()))
+
+def record_statement(sql: str, seconds: float, rows: int):
+    key = statement_key(sql)
+    METRICS.observe("relance_sqlite_statement_duration_seconds", seconds, statement=key)
+    if rows:
+        METRICS.inc("relance_sqlite_statement_rows_total", rows, statement=key)
+    timings = REQUEST_TIMINGS.get()
+    if timings:
+        timings.sql += seconds
+        timings.rows += rows
+        timings.statements += 1
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        METRICS.inc("relance_sqlite_slow_statements_total", statement=key)
+        where = f" [{timings.label}]" if timings else ""
+        slow_logger.warning(f"Requête lente {seconds * 1000:.0f} ms, {rows} ligne(s){where} : {key}")
+
+class TimedCursor(sqlite3.Cursor):
+    """Mesure chaque requête : exécution puis fetch*, enregistrée à fetchall, au execute
+    suivant ou à close. L'itération directe (for row in cur) n'est pas chronométrée : elle
+    coûterait un appel Python par ligne. Pas de __del__ : rien n'est mesuré pendant le
+    ramasse-miettes ; TimedConnection.close_cursors ferme les curseurs restants."""
+    _sql = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._start(sql, started)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._start(sql, started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def _start(self, sql, started):
+        self._sql, self._elapsed, self._rows = sql, time.perf_counter() - started, 0
+        if self.description is None:
+            # Écriture ou DDL : rien à lire, la requête est terminée
+            self._rows = max(self.rowcount, 0)
+            self._finish()
+
+    def _fetched(self, started, rows):
+        if self._sql is not None:
+            self._elapsed += time.perf_counter() - started
+            self._rows += rows
+
+    def _finish(self):
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            record_statement(sql, self._elapsed, self._rows)
+
+class TimedConnection(sqlite3.Connection):
+    """Connexion dont les requêtes passent par TimedCursor (pool et writer).
+
+    Garde ses curseurs jusqu'à close_cursors : appelé par le writer après chaque job
+    et par le pool au retour de la connexion, sur le thread qui l'utilisait.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cursors = []
+
+    def cursor(self, factory=TimedCursor):
+        cur = super().cursor(factory)
+        self._cursors.append(cur)
+        return cur
+
+    def close_cursors(self):
+        cursors, self._cursors = self._cursors, []
+        for cur in cursors:
+            cur.close()
+
+    def close(self):
+        self.close_cursors()
+        super().close()
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+class TimedJSONResponse(JSONResponse):
+    """Réponse JSON par défaut des routes : la sérialisation compte dans la phase render.
+
+    orjson s'il est installé (même sortie compacte UTF-8), json sinon ou pour ce qu'il
+    refuse (entier hors 64 bits). Les listes la renvoient elles-mêmes : un dict rendu
+    par la route passe d'abord par jsonable_encoder (~3 ms pour 100 lignes), inutile
+    sur des valeurs lues dans SQLite.
+    """
+
+    def render(self, content) -> bytes:
+        started = time.perf_counter()
+        try:
+            if orjson is not None:
+                try:
+                    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+                except TypeError:
+                    pass
+            return super().render(content)
+        finally:
+            timings = REQUEST_TIMINGS.get()
+            if timings:
+                timings.render += time.perf_counter() - started
+
+def record_request(method: str, route: str, status: int, seconds: float, timings: RequestTimings):
+    METRICS.observe("relance_http_request_duration_seconds", seconds,
+                    method=method, route=route, status=str(status))
+    app_seconds = max(seconds - timings.sql - timings.render, 0.0)
+    for phase, value in (("sql", timings.sql), ("render", timings.render), ("app", app_seconds)):
+        METRICS.observe("relance_http_request_phase_seconds", value, route=route, phase=phase)
+
+class TimingMiddleware:
+    """Latence par route et par phase. ASGI pur : les flux (SSE, exports) passent sans tampon ;
+    un flux SSE, ouvert pour des heures, n'est pas compté comme une latence."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings(f"{scope['method']} {scope['path']}")
+        token = REQUEST_TIMINGS.set(timings)
+        started = time.perf_counter()
+        status, stream = 500, False
+
+        async def send_timed(message):
+            nonlocal status, stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                stream = any(k == b"content-type" and v.startswith(b"text/event-stream")
+                             for k, v in message.get("headers", []))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            REQUEST_TIMINGS.reset(token)
+            if not stream:
+                # Gabarit de la route (/relance/{call_id}) : une série par route, pas par URL
+                route = getattr(scope.get("route"), "path", None) or scope.get("cache_route") or "unmatched"
+                record_request(scope["method"], route, status, time.perf_counter() - started, timings)
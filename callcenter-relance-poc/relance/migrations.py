@@ -0,0 +1,177 @@
+"""Création de la base et migrations (PRAGMA user_version)"""
+
+import sqlite3
+import logging
+
+from relance.agents import AGENT_TRIGGERS, rebuild_agent_stats
+from relance.archive import ensure_archive_schema
+from relance.db.pool import DB, attach_archive, configure_connection
+from relance.db.schema import (DICTIONARIES, ENCODED_COPIES, ENCODED_INDEXES, ENCODED_TABLES, NAMED_VIEWS,
+                               create_schema)
+from relance.db.writer import UnitOfWork
+from relance.lead_stats import rebuild_lead_stats
+from relance.rollups import rebuild_rollups
+
+logger = logging.getLogger(__name__)
+
+# ================= DB INIT =================
+def init_db(path: str = DB):
+    c = configure_connection(sqlite3.connect(path))
+    try:
+        # Base neuve : pages libérées rendues par le compactage (ARCHIVE) ; sans effet sinon
+        c.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        # WAL : les lectures ne sont jamais bloquées par l'écrivain
+        c.execute("PRAGMA journal_mode=WAL")
+        create_schema(c)
+        c.commit()
+        # Avant les migrations : les tables dérivées se reconstruisent aussi depuis l'archive
+        attach_archive(c)
+        ensure_archive_schema(c)
+        migrate(c)
+    finally:
+        c.close()
+
+def encode_dictionaries(c):
+    """Migration des colonnes texte vers les tables de correspondance (reconstruction des tables)"""
+    # Les triggers de calls citent leads : supprimés avant la reconstruction, recréés ensuite
+    for trigger in ("calls_agent_id", "agent_stats_insert", "agent_stats_update", "agent_stats_delete"):
+        c.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    for column, (table, source) in DICTIONARIES.items():
+        c.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL)")
+        c.execute(f"INSERT OR IGNORE INTO {table} (name) SELECT DISTINCT {column} FROM {source}")
+    for source in ("leads", "calls"):
+        c.execute(ENCODED_TABLES[source].format(name=f"{source}_encoded"))
+        c.execute(ENCODED_COPIES[source].format(name=f"{source}_encoded"))
+        c.execute(f"DROP TABLE {source}")
+        c.execute(f"ALTER TABLE {source}_encoded RENAME TO {source}")
+    for statement in ENCODED_INDEXES + NAMED_VIEWS + AGENT_TRIGGERS:
+        c.execute(statement)
+
+# ================= MIGRATIONS =================
+# (version, description, étapes) — la version appliquée est PRAGMA user_version
+MIGRATIONS = [
+    (1, "index des chemins d'accès relances / appels / leads", [
+        # /relances : relances en attente triées par échéance
+        """CREATE INDEX IF NOT EXISTS idx_calls_pending
+           ON calls(next_call_at)
+           WHERE done_at IS NULL AND next_call_at IS NOT NULL""",
+        # /leads : historique d'un lead, couvre résultat et date du 1er appel
+        """CREATE INDEX IF NOT EXISTS idx_calls_lead_done
+           ON calls(lead_id, done_at, result, created_at)""",
+        # /calls : historique trié par date de réalisation
+        """CREATE INDEX IF NOT EXISTS idx_calls_done
+           ON calls(done_at)
+           WHERE done_at IS NOT NULL""",
+        # /leads : tri par date de création, avec ou sans filtres
+        "CREATE INDEX IF NOT EXISTS idx_leads_created ON leads(lead_created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_leads_projet_type ON leads(projet, type_lead, lead_created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_leads_type ON leads(type_lead, lead_created_at)",
+        "ANALYZE",
+    ]),
+    (2, "table lead_stats (agrégats par lead pour les KPI)", [
+        """CREATE TABLE IF NOT EXISTS lead_stats (
+            lead_id INTEGER PRIMARY KEY,
+            call_count INTEGER NOT NULL DEFAULT 0,
+            first_done_at TEXT,
+            first_call_at TEXT,
+            first_agent TEXT,
+            last_result TEXT,
+            last_done_at TEXT,
+            reactivity_in_scope INTEGER NOT NULL DEFAULT 0,
+            reactivity_minutes INTEGER,
+            FOREIGN KEY (lead_id) REFERENCES leads(id)
+        )""",
+        rebuild_lead_stats,
+    ]),
+    # Les dates naïves (seed, saisie) sont lues en heure de Paris : réactivités à recalculer
+    (3, "réactivité : dates naïves en heure de Paris, écarts calculés en UTC", [
+        rebuild_lead_stats,
+    ]),
+    (4, "dernier appel dans lead_stats : /leads filtre et trie sans lire calls", [
+        # /leads?no_call=1 et /leads?last_result=...
+        "CREATE INDEX IF NOT EXISTS idx_lead_stats_calls ON lead_stats(call_count)",
+        "CREATE INDEX IF NOT EXISTS idx_lead_stats_last_result ON lead_stats(last_result, last_done_at)",
+        # /leads?sort=last_call : même expression que le tri (les leads jamais appelés en dernier)
+        "CREATE INDEX IF NOT EXISTS idx_lead_stats_last_call ON lead_stats(COALESCE(last_done_at, ''), lead_id)",
+        rebuild_lead_stats,
+        "ANALYZE",
+    ]),
+    (5, "rollups KPI par heure / jour et (projet, type_lead, agent)", [
+        """CREATE TABLE IF NOT EXISTS kpi_rollups (
+            grain TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            projet TEXT NOT NULL,
+            type_lead TEXT NOT NULL,
+            agent TEXT NOT NULL,
+            calls INTEGER NOT NULL DEFAULT 0,
+            leads INTEGER NOT NULL DEFAULT 0,
+            measured INTEGER NOT NULL DEFAULT 0,
+            reac_sum INTEGER NOT NULL DEFAULT 0,
+            under_45 INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (grain, bucket, projet, type_lead, agent)
+        ) WITHOUT ROWID""",
+        rebuild_lead_stats,  # renseigne first_agent
+        rebuild_rollups,
+    ]),
+    (6, "dimension agent et compteurs agent_stats tenus par triggers", [
+        """CREATE TABLE IF NOT EXISTS agents (
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS agent_stats (
+            agent_id INTEGER NOT NULL,
+            projet TEXT NOT NULL,
+            calls_done INTEGER NOT NULL DEFAULT 0,
+            pending INTEGER NOT NULL DEFAULT 0,
+            definitive INTEGER NOT NULL DEFAULT 0,
+            attempts_sum INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (agent_id, projet),
+            FOREIGN KEY (agent_id) REFERENCES agents(id)
+        ) WITHOUT ROWID""",
+        # Historique et relances d'un agent
+        "CREATE INDEX IF NOT EXISTS idx_calls_agent ON calls(agent_id, done_at)",
+        rebuild_agent_stats,
+        *AGENT_TRIGGERS,
+    ]),
+    (7, "projet, type, agent, résultat et priorité encodés en entiers (tables de correspondance)", [
+        encode_dictionaries,
+        rebuild_agent_stats,
+        "ANALYZE",
+    ]),
+    (8, "réservations des relances en base (leased_by, lease_until)", [
+        "ALTER TABLE calls ADD COLUMN leased_by TEXT",
+        "ALTER TABLE calls ADD COLUMN lease_until TEXT",
+        # Réservations actives : quelques lignes, lues par échéance
+        """CREATE INDEX IF NOT EXISTS idx_calls_leased
+           ON calls(lease_until)
+           WHERE leased_by IS NOT NULL""",
+    ]),
+]
+
+# Tables dérivées de leads / calls : recalculées une seule fois, après la dernière
+# migration en attente, donc toujours sur le schéma final
+DERIVED_REBUILDS = [rebuild_lead_stats, rebuild_rollups, rebuild_agent_stats]
+
+def migrate(c):
+    current = c.execute("PRAGMA user_version").fetchone()[0]
+    pending = [m for m in MIGRATIONS if m[0] > current]
+    if not pending:
+        return
+    # Une seule transaction : une base n'est jamais laissée entre deux schémas
+    with UnitOfWork(c, "migrate"):
+        rebuilds = []
+        for version, description, statements in pending:
+            for step in statements:
+                # Une étape est une requête SQL ou une fonction de migration de données
+                if step in DERIVED_REBUILDS:
+                    if step not in rebuilds:
+                        rebuilds.append(step)
+                elif callable(step):
+                    step(c)
+                else:
+                    c.execute(step)
+        for step in sorted(rebuilds, key=DERIVED_REBUILDS.index):
+            step(c)
+        c.execute(f"PRAGMA user_version={pending[-1][0]}")
+    for version, description, _ in pending:
+        logger.info(f"Migration {version} appliquée : {description}")
@@ -0,0 +1,153 @@
+"""Relances : validation, placement sur les créneaux (capacité) et diffusion"""
+
+from datetime import datetime, timedelta
+from pydantic import BaseModel, field_validator, model_validator
+import logging
+import time
+
+from relance.calendar import (AGENT_CALLS_PER_SLOT, CAPACITY_LOOKBACK_DAYS, CAPACITY_TTL, PARIS, SLOT_MINUTES,
+                              calendar_for, paris_wall_time)
+from relance.db.schema import encode
+from relance.db.writer import WRITER
+from relance.events import EVENTS
+from relance.queries import ACTIVE_AGENTS_SQL, PENDING_FROM_SQL, RELANCE_EVENT_SQL
+from relance.scheduler import SCHEDULER
+from relance.validation import Int, Text, invalid
+
+logger = logging.getLogger(__name__)
+
+# ================= RELANCES =================
+class RelanceIn(BaseModel):
+    """Relance optionnelle d'une action ou d'une clôture (relance_level absent, vide ou "none" : aucune)"""
+    relance_level: Int | None = None
+    relance_at: str | None = None
+    relance_priority: Text = "NORMAL"
+
+    @field_validator("relance_level", mode="before")
+    @classmethod
+    def _no_relance(cls, value):
+        return None if not value or value == "none" else value
+
+    @model_validator(mode="after")
+    def _relance_at(self):
+        if self.relance_level is None:
+            return self
+        if not self.relance_at:
+            raise invalid("Missing relance_at")
+        try:
+            self.relance_at = datetime.fromisoformat(self.relance_at).isoformat()
+        except ValueError:
+            raise invalid("Invalid relance_at")
+        return self
+
+    @property
+    def relance(self) -> tuple | None:
+        """(level, at_iso, priority), ou None"""
+        if self.relance_level is None:
+            return None
+        return self.relance_level, self.relance_at, self.relance_priority
+
+def relance_item(r) -> dict:
+    """Ligne de /relances (et des événements du flux) à partir de RELANCE_EVENT_SQL"""
+    return {
+        "call_id": r[0],
+        "lead_key": r[1],
+        "phone": r[2],
+        "projet": r[3],
+        "type_lead": r[4],
+        "agent": r[5],
+        "attempt_level": r[6],
+        "priority": r[7],
+        "next_call_at": r[8],
+    }
+
+def publish_relance(c, call_id, kind):
+    """Relance telle qu'écrite, appliquée après le COMMIT au scheduler puis au flux SSE"""
+    row = c.execute(RELANCE_EVENT_SQL, (call_id,)).fetchone()
+    if row is None:
+        # Appel sans lead (jointure vide) : rien à planifier ni à diffuser
+        logger.warning(f"publish_relance: call {call_id} has no lead, event skipped")
+        return
+    item = relance_item(row)
+
+    def apply():
+        if kind == "completed":
+            SCHEDULER.remove(item["call_id"])
+        else:
+            SCHEDULER.schedule(item["call_id"], item["projet"], item["priority"], item["next_call_at"])
+        EVENTS.publish(kind, item)
+
+    WRITER.on_commit(apply)
+
+LEVEL_MAX_SLOTS = 200  # créneaux explorés au plus pour placer une relance
+
+_capacity_cache = {}  # projet -> (capacité, calculée à)
+
+def projet_capacity(c, projet: str) -> int:
+    """Relances absorbables par créneau : agents actifs récemment x AGENT_CALLS_PER_SLOT"""
+    cached = _capacity_cache.get(projet)
+    if cached and time.monotonic() - cached[1] < CAPACITY_TTL:
+        return cached[0]
+    since = datetime.now(PARIS).replace(tzinfo=None) - timedelta(days=CAPACITY_LOOKBACK_DAYS)
+    agents = c.execute(ACTIVE_AGENTS_SQL, (since.isoformat(), projet)).fetchone()[0]
+    capacity = max(1, agents) * AGENT_CALLS_PER_SLOT
+    _capacity_cache[projet] = (capacity, time.monotonic())
+    return capacity
+
+def slot_key(dt: datetime) -> datetime:
+    return dt.replace(minute=dt.minute - dt.minute % SLOT_MINUTES, second=0, microsecond=0)
+
+def level_relance(c, projet: str, when: datetime) -> datetime:
+    """Premier créneau ouvert à partir de `when` qui a encore de la place.
+
+    Une seule requête pour toute la fenêtre (PENDING_FROM_SQL, triée par l'index) lue
+    au fil des créneaux du calendrier : la lecture s'arrête au premier créneau libre,
+    sans une requête COUNT par créneau dans la transaction du writer.
+    """
+    cal = calendar_for(projet)
+    capacity = projet_capacity(c, projet)
+    slot = first = cal.slot_at(when)
+    cur = c.execute(PENDING_FROM_SQL, (first.isoformat(), projet))
+    try:
+        row = next(cur, None)  # itération directe : pas de mesure par ligne (TimedCursor)
+        for _ in range(LEVEL_MAX_SLOTS):
+            start = slot.isoformat()
+            end = (slot_key(slot) + timedelta(minutes=SLOT_MINUTES)).isoformat()
+            load = 0
+            while row and row[0] < end:
+                load += row[0] >= start  # avant le créneau : période fermée, non comptée
+                row = next(cur, None)
+            if load < capacity:
+                return slot
+            slot = cal.next_slot(slot)
+        return first
+    finally:
+        cur.close()
+
+def normalize_relance_at(c, lead_id: int, relance_iso: str) -> str:
+    """Heure Paris sans offset ; hors ouverture (soir, fermeture, férié) : premier créneau libre"""
+    row = c.execute("SELECT projet FROM leads_named WHERE id=?", (lead_id,)).fetchone()
+    projet = row[0] if row else ""
+    when = paris_wall_time(relance_iso)
+    if calendar_for(projet).is_open(when):
+        return when.isoformat()
+    return level_relance(c, projet, when).isoformat()
+
+def insert_relance(c, lead_id, agent, relance, now):
+    level, relance_iso, relance_priority = relance
+    relance_iso = normalize_relance_at(c, lead_id, relance_iso)
+    cur = c.execute("""
+        INSERT INTO calls
+        (lead_id, agent_id, attempt_level, result_id, priority_id, next_call_at, done_at, created_at)
+        VALUES (?,?,?,?,?,?,?,?)
+    """, (
+        lead_id,
+        encode(c, "agent", agent),
+        level,
+        encode(c, "result", "Planifiée"),
+        encode(c, "priority", relance_priority),
+        relance_iso,
+        None,
+        now
+    ))
+    publish_relance(c, cur.lastrowid, "scheduled")
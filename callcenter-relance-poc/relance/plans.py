@@ -0,0 +1,153 @@
+"""Garde-fous : plans de requêtes sans full scan, /leads égal à la requête de référence"""
+
+import re
+
+from relance.db.pool import archive_attached
+from relance.queries import (ACTIVE_AGENTS_SQL, LEADS_SORTS, PENDING_FROM_SQL, RELANCE_CONTEXT_SQL,
+                             RELANCE_EVENT_SQL, RELANCE_PENDING_SQL, agent_hourly_sql, agent_stats_sql,
+                             calls_sql, export_calls_sql, export_leads_sql, filter_where, leads_sql,
+                             overdue_relances_sql, relances_sql, trend_sql)
+from relance.rollups import TREND_GRAINS, TREND_GROUPS
+from relance.scheduler import ACTIVE_LEASES_SQL, DROP_AGENT_LEASES_SQL
+
+# ================= LEADS : ÉQUIVALENCE =================
+# Forme historique de /leads (4 sous-requêtes corrélées par lead), gardée comme référence
+LEADS_REFERENCE_SQL = """
+    SELECT
+      l.id, l.lead_key, l.phone, l.projet, l.type_lead, l.lead_created_at,
+      (SELECT result FROM calls_named WHERE lead_id=l.id AND done_at IS NOT NULL ORDER BY done_at DESC, id DESC LIMIT 1),
+      (SELECT done_at FROM calls WHERE lead_id=l.id AND done_at IS NOT NULL ORDER BY done_at DESC, id DESC LIMIT 1),
+      (SELECT created_at FROM calls WHERE lead_id=l.id AND done_at IS NOT NULL ORDER BY done_at ASC, id ASC LIMIT 1),
+      (SELECT COUNT(*) FROM calls WHERE lead_id=l.id AND done_at IS NOT NULL)
+    FROM leads_named l
+    {where}
+    ORDER BY l.lead_created_at DESC, l.id DESC
+    LIMIT ? OFFSET ?
+"""
+
+def check_leads_equivalence(c, page_size: int = 100) -> list[str]:
+    """Compare page par page leads_sql() (lead_stats) à la requête de référence sur calls ; renvoie les écarts.
+
+    Test d'équivalence de /leads : tests/test_leads.py sur la base seedée, et
+    `python main.py check-leads` sur une base réelle (code de sortie non nul au moindre écart).
+    """
+    mismatches = []
+    for projet, type_lead in PLAN_FILTERS:
+        count_sql, params, page_sql, _ = leads_sql(projet, type_lead)
+        where, _ = filter_where([], projet, type_lead)
+        reference_sql = LEADS_REFERENCE_SQL.format(where=("WHERE " + " AND ".join(where)) if where else "")
+        total = c.execute(count_sql, params).fetchone()[0]
+        for offset in range(0, total, page_size):
+            expected = c.execute(reference_sql, params + [page_size, offset]).fetchall()
+            got = [r[:10] for r in c.execute(page_sql, params + [page_size, offset])]
+            for a, b in zip(expected, got):
+                if a != b:
+                    mismatches.append(f"projet={projet!r} type_lead={type_lead!r} lead {a[0]}: {a[6:]} != {b[6:]}")
+            if len(expected) != len(got):
+                mismatches.append(f"projet={projet!r} type_lead={type_lead!r} offset {offset}: {len(expected)} != {len(got)} lignes")
+    return mismatches
+
+# ================= QUERY PLAN GUARD =================
+PLAN_FILTERS = [("", ""), ("Colisée", ""), ("", "Web"), ("Colisée", "Web")]
+
+def route_queries(archive: bool = True):
+    """Toutes les requêtes des routes, pour chaque combinaison de filtres (et avec l'archive)"""
+    for name, builder in (("relances", relances_sql), ("leads", leads_sql), ("calls", calls_sql)):
+        for projet, type_lead in PLAN_FILTERS:
+            count_sql, count_params, page_sql, page_params = builder(projet, type_lead)
+            label = f"{name}[projet={projet!r}, type_lead={type_lead!r}]"
+            yield f"{label} count", count_sql, count_params
+            yield f"{label} page", page_sql, page_params + [20, 0]
+            _, _, page_sql, page_params = builder(projet, type_lead, ("2026-01-01T00:00:00", 1))
+            yield f"{label} cursor", page_sql, page_params + [20, 0]
+            if archive and name != "relances":
+                count_sql, count_params, page_sql, page_params = builder(
+                    projet, type_lead, ("2026-01-01T00:00:00", 1), archive=True
+                )
+                yield f"{label} archive count", count_sql, count_params
+                yield f"{label} archive cursor", page_sql, page_params + [20, 0]
+    for sort in LEADS_SORTS:
+        for extra in ({"no_call": True}, {"last_result": "Injoignable"}, {}):
+            for projet, type_lead in PLAN_FILTERS:
+                count_sql, count_params, page_sql, page_params = leads_sql(projet, type_lead, sort=sort, **extra)
+                label = f"leads[sort={sort}, {extra}, projet={projet!r}, type_lead={type_lead!r}]"
+                if extra:
+                    yield f"{label} count", count_sql, count_params
+                yield f"{label} page", page_sql, page_params + [20, 0]
+                if archive and not extra.get("no_call"):
+                    count_sql, count_params, page_sql, page_params = leads_sql(
+                        projet, type_lead, sort=sort, archive=True, **extra
+                    )
+                    yield f"{label} archive count", count_sql, count_params
+                    yield f"{label} archive page", page_sql, page_params + [20, 0]
+    for name, builder in (("export_calls", export_calls_sql), ("export_leads", export_leads_sql)):
+        for projet, type_lead in PLAN_FILTERS:
+            for with_archive in ((False, True) if archive else (False,)):
+                sql, params, _ = builder(projet, type_lead, "2026-01-01T00:00:00", "2026-02-01T00:00:00", with_archive)
+                label = f"{name}[projet={projet!r}, type_lead={type_lead!r}]"
+                yield label + (" archive" if with_archive else ""), sql, params
+    for grain in TREND_GRAINS:
+        for group_by in TREND_GROUPS:
+            sql, params = trend_sql(grain, group_by, "Colisée", "", "", "2026-01-01", "2026-02-01")
+            yield f"trend[grain={grain}, group_by={group_by!r}]", sql, params
+    for projet in ("", "Colisée"):
+        sql, params = agent_stats_sql(projet)
+        yield f"agent stats[projet={projet!r}]", sql, params
+        sql, params = agent_hourly_sql(projet, "2026-01-01T00")
+        yield f"agent hourly[projet={projet!r}]", sql, params
+    yield "relance_context", RELANCE_CONTEXT_SQL, [1]
+    yield "relance event", RELANCE_EVENT_SQL, [1]
+    yield "relance claim", RELANCE_PENDING_SQL, [1]
+    yield "active leases", ACTIVE_LEASES_SQL, ["2026-01-01T00:00:00"]
+    yield "drop agent leases", DROP_AGENT_LEASES_SQL, ["Joy", "2026-01-01T00:00:00", 1]
+    for projet, type_lead in PLAN_FILTERS:
+        sql, params = overdue_relances_sql(projet, type_lead)
+        yield f"overdue relances[projet={projet!r}, type_lead={type_lead!r}]", sql, ["2026-01-01T00:00:00"] + params
+    yield "pending from", PENDING_FROM_SQL, ["2026-01-01T09:00:00", "Colisée"]
+    yield "active agents", ACTIVE_AGENTS_SQL, ["2026-01-01T00:00:00", "Colisée"]
+    yield "complete_relance lookup", "SELECT lead_id, agent, done_at, next_call_at FROM calls_named WHERE id=?", [1]
+    yield "create_lead lookup", "SELECT id FROM leads WHERE lead_key=?", ["x"]
+    if archive:
+        yield "create_lead archive lookup", "SELECT lead_key, id FROM archive.leads WHERE lead_key IN (?,?)", ["x", "y"]
+
+# Parcours d'index admis pour une page : l'index donne l'ORDER BY, la lecture s'arrête au LIMIT
+PLAN_ORDERED_SCANS = {"idx_leads_created", "idx_lead_stats_last_call"}
+
+# Parcours complets admis, requête par requête : (motif du nom, motif de la ligne du plan)
+PLAN_ALLOWED_SCANS = [
+    # Dimension : une ligne par agent
+    (r"agent stats\[", r"SCAN a USING COVERING INDEX sqlite_autoindex_agents_1$"),
+    # COUNT(*) sans filtre : calculé une fois puis tenu à jour par COUNTS / ARCHIVE
+    (r"(leads|calls)\[.*projet='', type_lead=''\]( archive)? count$", r"SCAN l USING COVERING INDEX \w+$"),
+]
+
+def check_query_plans(c) -> list[str]:
+    """EXPLAIN QUERY PLAN de chaque requête ; renvoie celles qui parcourent une table ou un index.
+
+    Seuls passent les SEARCH, les parcours ordonnés arrêtés par le LIMIT d'une page
+    (PLAN_ORDERED_SCANS, sans tri en B-tree temporaire) et PLAN_ALLOWED_SCANS.
+    """
+    failures = []
+    for name, sql, params in route_queries(archive_attached(c)):
+        plan = [row[3] for row in c.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        # Les CTE / sous-requêtes sont déjà bornées (page) : seules les tables comptent
+        derived = set(re.findall(r"(\w+)\s+AS\s*\(", sql, re.IGNORECASE))
+        for source, alias in re.findall(r"\b(?:FROM|JOIN)\s+(\w+)\s+(\w+)", sql, re.IGNORECASE):
+            if source in derived:
+                derived.add(alias)
+        # Trié à part, un parcours ordonné lit tout avant le LIMIT
+        paged = re.search(r"\bLIMIT\b", sql, re.IGNORECASE) and "USE TEMP B-TREE FOR ORDER BY" not in plan
+        scans = []
+        for p in plan:
+            if not p.startswith("SCAN ") or p.startswith("SCAN (") or p.split()[1] in derived:
+                continue
+            index = re.search(r"USING (?:COVERING )?INDEX (\w+)", p)
+            index = index and index.group(1)
+            if paged and index in PLAN_ORDERED_SCANS:
+                continue
+            if any(re.match(pattern, name) and re.match(line, p) for pattern, line in PLAN_ALLOWED_SCANS):
+                continue
+            scans.append(p)
+        if scans:
+            failures.append(f"{name}: {'; '.join(scans)}")
+    return failures
@@ -0,0 +1,291 @@
+"""Requêtes des routes de lecture, partagées avec le garde-fou des plans"""
+
+from relance.db.schema import archive_named, dictionary_id_sql
+from relance.rollups import ROLLUP_MEASURES, TREND_GRAINS
+
+# ================= QUERIES =================
+# Requêtes des routes de lecture, partagées avec check_query_plans()
+def filter_where(where: list[str], projet: str, type_lead: str):
+    where = list(where)
+    params = []
+    if projet:
+        where.append(f"l.projet_id={dictionary_id_sql('projet')}"); params.append(projet)
+    if type_lead:
+        where.append(f"l.type_lead_id={dictionary_id_sql('type_lead')}"); params.append(type_lead)
+    return where, params
+
+# Pages relances / appels : CROSS JOIN garde calls en tête, lue dans l'ordre de l'index
+# de tri jusqu'au LIMIT ; sinon SQLite part de l'index projet et trie (et décode) toutes
+# les lignes du projet
+def relances_sql(projet: str = "", type_lead: str = "", after: tuple | None = None):
+    where, params = filter_where(["c.done_at IS NULL", "c.next_call_at IS NOT NULL"], projet, type_lead)
+    count_sql = f"""
+        SELECT COUNT(*)
+        FROM calls_named c
+        JOIN leads_named l ON l.id=c.lead_id
+        WHERE {" AND ".join(where)}
+    """
+    count_params = list(params)
+    if after:
+        # Keyset : reprend après la dernière clé (tri, id) servie
+        where.append("(c.next_call_at, c.id) > (?, ?)"); params.extend(after)
+    page_sql = f"""
+        SELECT
+          c.id, l.lead_key, l.phone, l.projet, l.type_lead,
+          c.agent, c.attempt_level, c.priority, c.next_call_at
+        FROM calls_named c
+        CROSS JOIN leads_named l ON l.id=c.lead_id
+        WHERE {" AND ".join(where)}
+        ORDER BY c.next_call_at ASC, c.id ASC
+        LIMIT ? OFFSET ?
+    """
+    return count_sql, count_params, page_sql, params
+
+# Tris de /leads : (clé de tri, départage, jointure, borne de l'archive), chacun servi par
+# un index. Tri sur lead_stats : CROSS JOIN la garde en tête, parcourue dans l'ordre de son
+# index (sinon SQLite préfère le petit index leads encodé, suivi d'un tri complet)
+LEADS_SORTS = {
+    "created": ("l.lead_created_at", "l.id", "{leads} l JOIN {stats} s", "leads_created"),
+    "last_call": ("COALESCE(s.last_done_at, '')", "s.lead_id", "{stats} s CROSS JOIN {leads} l", "leads_last_call"),
+}
+
+# Avec archive=True, les builders de listes renvoient le comptage de l'archive seule et
+# la page sur la base et l'archive réunies (UNION ALL fusionné par SQLite dans l'ordre
+# des index de chaque côté)
+def leads_sql(projet: str = "", type_lead: str = "", after: tuple | None = None,
+              sort: str = "created", no_call: bool = False, last_result: str = "", archive: bool = False):
+    where, params = filter_where([], projet, type_lead)
+    # Filtres sur l'agrégat par lead (lead_stats) : jamais de lecture de calls
+    if no_call:
+        where.append("s.call_count=0")
+    if last_result:
+        where.append("s.last_result=?"); params.append(last_result)
+    leads_src, stats_src = (archive_named("leads"), "archive.lead_stats") if archive else ("leads_named", "lead_stats")
+    count_sql = f"""
+        SELECT COUNT(*)
+        FROM {leads_src} l
+        JOIN {stats_src} s ON s.lead_id=l.id
+        {("WHERE " + " AND ".join(where)) if where else ""}
+    """
+    count_params = list(params)
+    sort_key, tie, join, _ = LEADS_SORTS[sort]
+    if after:
+        where.append(f"({sort_key}, {tie}) < (?, ?)"); params.extend(after)
+
+    def select(leads, stats):
+        return f"""
+        SELECT
+          {tie} AS id, l.lead_key, l.phone, l.projet, l.type_lead, l.lead_created_at,
+          s.last_result, s.last_done_at, s.first_call_at, s.call_count,
+          s.reactivity_in_scope, s.reactivity_minutes, {sort_key} AS sort_key
+        FROM {join.format(leads=leads, stats=stats)} ON s.lead_id=l.id
+        {("WHERE " + " AND ".join(where)) if where else ""}"""
+
+    if not archive:
+        page_sql = select("leads_named", "lead_stats") + f"""
+        ORDER BY {sort_key} DESC, {tie} DESC
+        LIMIT ? OFFSET ?
+    """
+        return count_sql, count_params, page_sql, params
+    page_sql = select("leads_named", "lead_stats") + """
+        UNION ALL""" + select(leads_src, stats_src) + """
+        ORDER BY sort_key DESC, id DESC
+        LIMIT ? OFFSET ?
+    """
+    return count_sql, count_params, page_sql, params + params
+
+def calls_sql(projet: str = "", type_lead: str = "", after: tuple | None = None, archive: bool = False):
+    where, params = filter_where(["c.done_at IS NOT NULL"], projet, type_lead)
+    calls_src, leads_src = (archive_named("calls"), archive_named("leads")) if archive else ("calls_named", "leads_named")
+    count_sql = f"""
+        SELECT COUNT(*)
+        FROM {calls_src} c
+        JOIN {leads_src} l ON l.id=c.lead_id
+        WHERE {" AND ".join(where)}
+    """
+    count_params = list(params)
+    if after:
+        where.append("(c.done_at, c.id) < (?, ?)"); params.extend(after)
+
+    def select(calls, leads):
+        return f"""
+        SELECT
+          c.id AS id, l.lead_key, l.phone, l.projet, l.type_lead,
+          c.agent, c.attempt_level, c.result, c.priority, c.done_at AS done_at
+        FROM {calls} c
+        CROSS JOIN {leads} l ON l.id=c.lead_id
+        WHERE {" AND ".join(where)}"""
+
+    if not archive:
+        page_sql = select("calls_named", "leads_named") + """
+        ORDER BY c.done_at DESC, c.id DESC
+        LIMIT ? OFFSET ?
+    """
+        return count_sql, count_params, page_sql, params
+    page_sql = select("calls_named", "leads_named") + """
+        UNION ALL""" + select(calls_src, leads_src) + """
+        ORDER BY done_at DESC, id DESC
+        LIMIT ? OFFSET ?
+    """
+    return count_sql, count_params, page_sql, params + params
+
+def export_calls_sql(projet: str = "", type_lead: str = "", date_from: str | None = None, date_to: str | None = None,
+                     archive: bool = False):
+    where, params = filter_where(["c.done_at IS NOT NULL"], projet, type_lead)
+    if date_from:
+        where.append("c.done_at >= ?"); params.append(date_from)
+    if date_to:
+        where.append("c.done_at < ?"); params.append(date_to)
+    columns = ["call_id", "lead_key", "phone", "projet", "type_lead",
+               "agent", "attempt_level", "result", "priority", "done_at"]
+
+    def select(calls, leads):
+        return f"""
+        SELECT
+          c.id AS id, l.lead_key, l.phone, l.projet, l.type_lead,
+          c.agent, c.attempt_level, c.result, c.priority, c.done_at AS done_at
+        FROM {calls} c
+        JOIN {leads} l ON l.id=c.lead_id
+        WHERE {" AND ".join(where)}"""
+
+    if not archive:
+        sql = select("calls_named", "leads_named") + """
+        ORDER BY c.done_at ASC, c.id ASC
+    """
+        return sql, params, columns
+    sql = select("calls_named", "leads_named") + """
+        UNION ALL""" + select(archive_named("calls"), archive_named("leads")) + """
+        ORDER BY done_at ASC, id ASC
+    """
+    return sql, params + params, columns
+
+def export_leads_sql(projet: str = "", type_lead: str = "", date_from: str | None = None, date_to: str | None = None,
+                     archive: bool = False):
+    where, params = filter_where([], projet, type_lead)
+    if date_from:
+        where.append("l.lead_created_at >= ?"); params.append(date_from)
+    if date_to:
+        where.append("l.lead_created_at < ?"); params.append(date_to)
+    columns = ["lead_id", "lead_key", "phone", "projet", "type_lead", "lead_created_at",
+               "last_result", "last_done_at", "call_count", "reactivity_minutes", "reactivity_in_scope"]
+
+    def select(leads, stats):
+        return f"""
+        SELECT
+          l.id AS id, l.lead_key, l.phone, l.projet, l.type_lead, l.lead_created_at AS lead_created_at,
+          s.last_result, s.last_done_at,
+          COALESCE(s.call_count, 0), s.reactivity_minutes, COALESCE(s.reactivity_in_scope, 0)
+        FROM {leads} l
+        LEFT JOIN {stats} s ON s.lead_id=l.id
+        {("WHERE " + " AND ".join(where)) if where else ""}"""
+
+    if not archive:
+        sql = select("leads_named", "lead_stats") + """
+        ORDER BY l.lead_created_at ASC, l.id ASC
+    """
+        return sql, params, columns
+    sql = select("leads_named", "lead_stats") + """
+        UNION ALL""" + select(archive_named("leads"), "archive.lead_stats") + """
+        ORDER BY lead_created_at ASC, id ASC
+    """
+    return sql, params + params, columns
+
+def overdue_relances_sql(projet: str = "", type_lead: str = ""):
+    where, params = filter_where(
+        ["c.done_at IS NULL", "c.next_call_at IS NOT NULL", "c.next_call_at < ?"], projet, type_lead
+    )
+    sql = f"""
+        SELECT
+          c.id, l.lead_key, l.phone, l.projet, l.type_lead,
+          c.agent, c.attempt_level, c.priority, c.next_call_at
+        FROM calls_named c
+        JOIN leads_named l ON l.id=c.lead_id
+        WHERE {" AND ".join(where)}
+    """
+    return sql, params
+
+# Relances déjà planifiées d'un projet à partir d'une date (charge des créneaux), dans
+# l'ordre de idx_calls_pending : level_relance s'arrête au premier créneau libre
+PENDING_FROM_SQL = """
+    SELECT c.next_call_at
+    FROM calls_named c
+    JOIN leads_named l ON l.id=c.lead_id
+    WHERE c.done_at IS NULL AND c.next_call_at IS NOT NULL
+      AND c.next_call_at >= ? AND l.projet_id=(SELECT id FROM projets WHERE name=?)
+    ORDER BY c.next_call_at
+"""
+
+ACTIVE_AGENTS_SQL = """
+    SELECT COUNT(DISTINCT c.agent_id)
+    FROM calls_named c
+    JOIN leads_named l ON l.id=c.lead_id
+    WHERE c.done_at IS NOT NULL AND c.done_at >= ? AND l.projet_id=(SELECT id FROM projets WHERE name=?)
+"""
+
+RELANCE_EVENT_SQL = """
+    SELECT
+      c.id, l.lead_key, l.phone, l.projet, l.type_lead,
+      c.agent, c.attempt_level, c.priority, c.next_call_at
+    FROM calls_named c
+    JOIN leads_named l ON l.id=c.lead_id
+    WHERE c.id=?
+"""
+
+RELANCE_PENDING_SQL = RELANCE_EVENT_SQL + """    AND c.done_at IS NULL AND c.next_call_at IS NOT NULL
+"""
+
+RELANCE_CONTEXT_SQL = """
+    SELECT
+      c.id, c.lead_id, c.agent, c.attempt_level, c.priority, c.next_call_at,
+      l.lead_key, l.phone, l.projet, l.type_lead, l.lead_created_at
+    FROM calls_named c
+    JOIN leads_named l ON l.id=c.lead_id
+    WHERE c.id=?
+"""
+
+def trend_sql(grain: str = "day", group_by: str = "", projet: str = "", type_lead: str = "", agent: str = "",
+              bucket_from: str = "", bucket_to: str = "9999"):
+    """Série de /dashboard/trend sur kpi_rollups : seek sur (grain, bucket), jamais calls"""
+    table_grain, period = TREND_GRAINS[grain]
+    where, params = ["grain=?", "bucket >= ?", "bucket < ?"], [table_grain, bucket_from, bucket_to]
+    for column, value in (("projet", projet), ("type_lead", type_lead), ("agent", agent)):
+        if value:
+            where.append(f"{column}=?"); params.append(value)
+    group = f", {group_by}" if group_by else ""
+    sql = f"""
+        SELECT {period} AS period{group}, {", ".join(f"SUM({m})" for m in ROLLUP_MEASURES)}
+        FROM kpi_rollups
+        WHERE {" AND ".join(where)}
+        GROUP BY period{group}
+        ORDER BY period{group}
+    """
+    return sql, params
+
+def agent_stats_sql(projet: str = ""):
+    """Compteurs par agent (agent_stats, tenus par triggers) : une ligne par agent et projet"""
+    where, params = [], []
+    if projet:
+        where.append("s.projet=?"); params.append(projet)
+    sql = f"""
+        SELECT a.id, a.name, SUM(s.calls_done), SUM(s.pending), SUM(s.definitive), SUM(s.attempts_sum)
+        FROM agents a
+        JOIN agent_stats s ON s.agent_id=a.id
+        {("WHERE " + " AND ".join(where)) if where else ""}
+        GROUP BY a.name
+        ORDER BY a.name
+    """
+    return sql, params
+
+def agent_hourly_sql(projet: str = "", bucket_from: str = ""):
+    """Appels réalisés par agent et par heure, lus dans les rollups"""
+    where, params = ["grain='hour'", "bucket >= ?", "agent != ''"], [bucket_from]
+    if projet:
+        where.append("projet=?"); params.append(projet)
+    sql = f"""
+        SELECT bucket, agent, SUM(calls)
+        FROM kpi_rollups
+        WHERE {" AND ".join(where)}
+        GROUP BY bucket, agent
+        ORDER BY bucket
+    """
+    return sql, params
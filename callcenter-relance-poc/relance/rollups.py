@@ -0,0 +1,84 @@
+"""Rollups KPI par heure / jour et (projet, type_lead, agent)"""
+
+from relance.db.schema import history_sources
+
+# ================= ROLLUPS =================
+# Agrégats par créneau (heure, jour) et (projet, type_lead, agent) pour /dashboard/trend.
+# Les dates sont en heure murale de Paris (naïves ou avec l'offset de Paris) :
+# le créneau se lit directement dans la chaîne, comme côté SQL pour la reconstruction.
+ROLLUP_MEASURES = ("calls", "leads", "measured", "reac_sum", "under_45")
+TREND_GRAINS = {
+    # grain -> (table de créneaux lue, expression du regroupement)
+    "hour": ("hour", "bucket"),
+    "day": ("day", "bucket"),
+    "week": ("day", "date(bucket, '-6 days', 'weekday 1')"),  # lundi de la semaine
+    "month": ("day", "substr(bucket, 1, 7)"),
+}
+TREND_GROUPS = ("", "projet", "type_lead", "agent")
+TREND_DEFAULT_DAYS = {"hour": 2, "day": 30, "week": 12 * 7, "month": 365}
+
+def rollup_buckets(ts: str) -> dict[str, str]:
+    return {"hour": f"{ts[:10]}T{ts[11:13]}", "day": ts[:10]}
+
+def rollup_bucket_sql(column: str, grain: str) -> str:
+    """Même découpage que rollup_buckets(), côté SQL"""
+    if grain == "hour":
+        return f"substr({column}, 1, 10) || 'T' || substr({column}, 12, 2)"
+    return f"substr({column}, 1, 10)"
+
+def rollup_add(c, ts: str, projet: str, type_lead: str, agent: str, **deltas):
+    """Ajoute des deltas aux créneaux heure et jour de ts (transaction de l'écriture)"""
+    values = [deltas.get(m, 0) for m in ROLLUP_MEASURES]
+    for grain, bucket in rollup_buckets(ts).items():
+        c.execute(f"""
+            INSERT INTO kpi_rollups (grain, bucket, projet, type_lead, agent, {", ".join(ROLLUP_MEASURES)})
+            VALUES (?,?,?,?,?,?,?,?,?,?)
+            ON CONFLICT (grain, bucket, projet, type_lead, agent) DO UPDATE SET
+              {", ".join(f"{m}={m}+excluded.{m}" for m in ROLLUP_MEASURES)}
+        """, (grain, bucket, projet, type_lead, agent or "", *values))
+
+def rollup_lead(c, lead_created_at, projet, type_lead, agent, in_scope, minutes, sign: int):
+    """Contribution d'un lead : compté, et sa réactivité si mesurée"""
+    measured = 1 if in_scope and minutes is not None else 0
+    rollup_add(
+        c, lead_created_at, projet, type_lead, agent or "",
+        leads=sign,
+        measured=sign * measured,
+        reac_sum=sign * minutes if measured else 0,
+        under_45=sign if measured and minutes <= 45 else 0,
+    )
+
+def rollup_call(c, lead_id: int, agent: str, done_at: str, sign: int = 1):
+    """Un appel réalisé compte dans le créneau de done_at, chez son agent"""
+    lead = c.execute("SELECT projet, type_lead FROM leads_named WHERE id=?", (lead_id,)).fetchone()
+    if lead:
+        rollup_add(c, done_at, lead[0], lead[1], agent, calls=sign)
+
+def rebuild_rollups(c):
+    """Recalcule kpi_rollups depuis calls et lead_stats, archive comprise (backfill, import hors API)"""
+    c.execute("DELETE FROM kpi_rollups")
+    for grain in ("hour", "day"):
+        call_bucket = rollup_bucket_sql("c.done_at", grain)
+        lead_bucket = rollup_bucket_sql("l.lead_created_at", grain)
+        parts = [f"""
+                SELECT {call_bucket} AS bucket, l.projet, l.type_lead, c.agent,
+                       1 AS calls, 0 AS leads, 0 AS measured, 0 AS reac_sum, 0 AS under_45
+                FROM {calls_src} c
+                JOIN {leads_src} l ON l.id=c.lead_id
+                WHERE c.done_at IS NOT NULL
+                UNION ALL
+                SELECT {lead_bucket}, l.projet, l.type_lead, COALESCE(s.first_agent, ''), 0, 1,
+                       s.reactivity_in_scope=1 AND s.reactivity_minutes IS NOT NULL,
+                       CASE WHEN s.reactivity_in_scope=1 THEN COALESCE(s.reactivity_minutes, 0) ELSE 0 END,
+                       s.reactivity_in_scope=1 AND COALESCE(s.reactivity_minutes <= 45, 0)
+                FROM {leads_src} l
+                JOIN {stats_src} s ON s.lead_id=l.id""" for calls_src, leads_src, stats_src in history_sources(c)]
+        union = "\n                UNION ALL".join(parts)
+        c.execute(f"""
+            INSERT INTO kpi_rollups (grain, bucket, projet, type_lead, agent, {", ".join(ROLLUP_MEASURES)})
+            SELECT ?, bucket, projet, type_lead, agent,
+                   SUM(calls), SUM(leads), SUM(measured), SUM(reac_sum), SUM(under_45)
+            FROM ({union}
+            )
+            GROUP BY bucket, projet, type_lead, agent
+        """, (grain,))
@@ -0,0 +1 @@
+"""Routes HTTP par domaine, un APIRouter par module (inclus par main.py)"""
@@ -0,0 +1,121 @@
+"""Routes actions : appel et relance optionnelle, unitaire ou par lot"""
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from pydantic import Field, field_validator
+
+from relance.calendar import iso_now
+from relance.counts import count_on_commit
+from relance.db.pool import archive_attached
+from relance.db.schema import encode
+from relance.db.writer import WRITER, bump_on_commit
+from relance.lead_stats import refresh_lead_stats
+from relance.planning import RelanceIn, insert_relance
+from relance.rollups import rollup_call
+from relance.routes.common import BatchIn, apply_batch, batch_items, batch_response
+from relance.validation import Int, Ok, Text, invalid, json_body, parse_body, validate_model
+
+router = APIRouter()
+
+# Écriture refusée sur un lead : message -> statut HTTP (dans un lot : le message seul)
+LEAD_ERRORS = {"Not found": 404, "Lead archived": 409}
+
+def lead_error(c, lead_id: int) -> str | None:
+    """None si le lead est dans la base, sinon la clé de LEAD_ERRORS.
+
+    Un lead archivé n'accepte plus d'appel : il serait écrit dans la base sans son lead.
+    """
+    if c.execute("SELECT 1 FROM leads WHERE id=?", (lead_id,)).fetchone():
+        return None
+    if archive_attached(c) and c.execute("SELECT 1 FROM archive.leads WHERE id=?", (lead_id,)).fetchone():
+        return "Lead archived"
+    return "Not found"
+
+def _save_action(c, action, now):
+    """Appel (et relance) d'un lead ; True, ou l'erreur de lead_error (rien n'est écrit)"""
+    lead_id = action.lead_id
+    error = lead_error(c, lead_id)
+    if error:
+        return error
+
+    # Update phone
+    c.execute("UPDATE leads SET phone=? WHERE id=?", (action.phone, lead_id))
+
+    # Appel exécuté
+    c.execute("""
+        INSERT INTO calls
+        (lead_id, agent_id, attempt_level, result_id, priority_id, next_call_at, done_at, created_at)
+        VALUES (?,?,?,?,?,?,?,?)
+    """, (
+        lead_id,
+        encode(c, "agent", action.agent),
+        action.attempt_level,
+        encode(c, "result", action.result),
+        encode(c, "priority", action.priority),
+        None,
+        now,
+        now
+    ))
+    rollup_call(c, lead_id, action.agent, now)
+
+    # Relance planifiée (optionnelle)
+    relance = action.relance
+    if relance:
+        insert_relance(c, lead_id, action.agent, relance, now)
+
+    refresh_lead_stats(c, lead_id)
+    count_on_commit(c, lead_id, calls=1, relances=1 if relance else 0)
+    bump_on_commit("leads", "calls")
+    return True
+
+class ActionIn(RelanceIn):
+    lead_id: Int = Field(gt=0)
+    phone: Text
+    agent: Text
+    attempt_level: Int = Field(gt=0)
+    result: Text
+    priority: Text
+
+    @field_validator("phone", mode="before")
+    @classmethod
+    def _phone_number(cls, value):
+        # Saisi en nombre par certains clients
+        return str(value) if isinstance(value, int) and not isinstance(value, bool) else value
+
+    @field_validator("phone")
+    @classmethod
+    def _phone_digits(cls, value: str) -> str:
+        if not value.isdigit():
+            raise invalid("Phone must be digits only (ex: 337XXXXXXXX)")
+        return value
+
+def validate_action(data) -> tuple[tuple | None, str | None]:
+    """(action,) validée, ou message d'erreur.
+
+    Le lead est vérifié ensuite, en tête du job d'écriture (_save_action, lead_error) :
+    404 / 409 sur /action, erreur de l'élément dans /actions/batch.
+    """
+    action, error = validate_model(ActionIn, data, "Action")
+    return ((action,) if action else None), error
+
+@router.post("/action", response_model=Ok, openapi_extra=json_body(ActionIn))
+async def save_action(request: Request):
+    action, error = await parse_body(request, ActionIn, "Action")
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+    # Validée avant toute écriture : plus d'appel inséré puis rejeté
+    result = await WRITER.run(_save_action, action, iso_now())
+    if result is not True:
+        return JSONResponse({"error": result}, status_code=LEAD_ERRORS[result])
+    return {"ok": True}
+
+@router.post("/actions/batch", openapi_extra=json_body(BatchIn))
+async def save_actions_batch(request: Request):
+    """N actions (appel + relance optionnelle) en une transaction, validées une à une"""
+    batch, error = await parse_body(request, BatchIn, "Batch")
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+    valid, errors = batch_items(batch, validate_action)
+
+    outcome = await WRITER.run(apply_batch, _save_action, valid, iso_now()) if valid else {}
+    return batch_response("saved", valid, errors, outcome)
@@ -0,0 +1,53 @@
+"""Route de l'historique des appels"""
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+import logging
+
+from relance.db.reader import READER
+from relance.metrics import TimedJSONResponse
+from relance.queries import calls_sql
+from relance.routes.common import cursor_page, fetch_page, validate_pagination
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+# ---------- CALLS ----------
+@router.get("/calls")
+async def calls(projet: str = "", type_lead: str = "", page: int = 1, limit: int = 20,
+          cursor: str | None = None, with_total: bool = False):
+    try:
+        page, limit, after = validate_pagination(page, limit, cursor)
+        archive = (calls_sql(projet, type_lead, after, archive=True), 9, "calls")
+        rows, total_rows = await READER.run(
+            fetch_page, "calls", projet, type_lead, calls_sql(projet, type_lead, after),
+            page, limit, cursor is not None, with_total, archive
+        )
+
+        data = [{
+            "call_id": r[0],
+            "lead_key": r[1],
+            "phone": r[2],
+            "projet": r[3],
+            "type_lead": r[4],
+            "agent": r[5],
+            "attempt_level": r[6],
+            "result": r[7],
+            "priority": r[8],
+            "done_at": r[9],
+        } for r in rows]
+
+        if cursor is not None:
+            next_key = (rows[-1][9], rows[-1][0]) if rows else None
+            return cursor_page(data, limit, next_key, total_rows)
+
+        return TimedJSONResponse({
+            "data": data,
+            "page": page,
+            "limit": limit,
+            "total": total_rows,
+            "pages": (total_rows + limit - 1) // limit
+        })
+    except Exception as e:
+        logger.error(f"Error in calls: {str(e)}")
+        return JSONResponse({"error": "Failed to fetch calls"}, status_code=500)
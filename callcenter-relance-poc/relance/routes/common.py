@@ -0,0 +1,167 @@
+"""Pagination, pages de listes et lots d'écritures partagés par les routes"""
+
+from datetime import datetime, timedelta
+from pydantic import BaseModel, ConfigDict, field_validator
+import base64
+import json
+import logging
+
+from relance.archive import ARCHIVE
+from relance.counts import COUNTS
+from relance.db.writer import WRITER, is_busy_error
+from relance.metrics import TimedJSONResponse
+from relance.validation import invalid
+
+logger = logging.getLogger(__name__)
+
+# ================= PAGINATION =================
+def encode_cursor(key) -> str:
+    """Jeton opaque pour la pagination par curseur : dernière clé (tri, id) servie"""
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token: str | None):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        sort_value, row_id = json.loads(raw)
+        return str(sort_value), int(row_id)
+    except Exception:
+        return None
+
+def validate_pagination(page: int, limit: int, cursor: str | None = None) -> tuple[int, int, tuple | None]:
+    """Valide et nettoie les paramètres de pagination (page/limit, ou curseur)"""
+    try:
+        page = max(1, int(page))
+        limit = max(1, min(100, int(limit)))  # Max 100 items par page
+    except (ValueError, TypeError):
+        page = 1
+        limit = 20
+    # Mode curseur : un jeton illisible (ou "start") repart du début, comme une page invalide
+    after = decode_cursor(cursor) if cursor is not None else None
+    return page, limit, after
+
+def cursor_page(data: list, limit: int, next_key, total=None) -> TimedJSONResponse:
+    return TimedJSONResponse({
+        "data": data,
+        "limit": limit,
+        "next_cursor": encode_cursor(next_key) if next_key and len(data) == limit else None,
+        "total": total,
+    })
+
+# ================= LOTS =================
+BATCH_MAX_ITEMS = 1000  # éléments par lot : une seule transaction, un seul COMMIT
+
+class BatchIn(BaseModel):
+    """Lot {"items": [...], champs communs} : les champs hors "items" valent pour chaque
+    élément qui ne les précise pas. Chaque élément est validé à part (batch_items)."""
+    model_config = ConfigDict(extra="allow")
+
+    items: list
+
+    @field_validator("items", mode="wrap")
+    @classmethod
+    def _items(cls, value, handler):
+        if not isinstance(value, list) or not value:
+            raise invalid("Missing items")
+        if len(value) > BATCH_MAX_ITEMS:
+            raise invalid(f"Too many items (max {BATCH_MAX_ITEMS})")
+        return handler(value)
+
+def batch_items(batch: BatchIn, validate) -> tuple[list, list]:
+    """(valides, erreurs) des éléments d'un lot, validés un à un"""
+    shared = batch.model_extra
+
+    valid, errors = [], []
+    for index, item in enumerate(batch.items):
+        args, error = validate({**shared, **item} if isinstance(item, dict) else item)
+        if error:
+            errors.append({"index": index, "error": error})
+        else:
+            valid.append((index, args))
+    return valid, errors
+
+def apply_batch(c, fn, items, now):
+    """`fn(c, *args, now)` pour chaque élément, dans la transaction du writer.
+
+    Un SAVEPOINT par élément : un échec n'annule que le sien. Renvoie {index: True,
+    message d'erreur (False : "Not found") ou None (échec)}.
+    """
+    outcome = {}
+    for index, args in items:
+        try:
+            with WRITER.savepoint(c):
+                result = fn(c, *args, now)
+                outcome[index] = "Not found" if result is False else result
+        except Exception as e:
+            if is_busy_error(e):
+                raise  # verrou : le writer rejoue tout le lot
+            logger.error(f"Batch item {index} failed: {str(e)}")
+            outcome[index] = None
+    return outcome
+
+def batch_response(done_key: str, valid: list, errors: list, outcome: dict) -> TimedJSONResponse:
+    results = list(errors)
+    for index, _ in valid:
+        ok = outcome[index]
+        if ok is True:
+            results.append({"index": index, "ok": True})
+        else:
+            results.append({"index": index, "error": ok or "Write failed"})
+    results.sort(key=lambda r: r["index"])
+    done = sum(1 for r in results if r.get("ok"))
+    return TimedJSONResponse({done_key: done, "errors": len(results) - done, "results": results})
+
+# ================= PAGES =================
+def fetch_page(c, endpoint, projet, type_lead, queries, page, limit, cursor_mode, with_total, archive=None):
+    """Page + total d'une liste paginée, exécuté sur un thread lecteur.
+
+    archive : (requêtes avec l'archive, colonne de la clé de tri, nom de la borne).
+    L'archive ne contient que des clés <= borne : elle n'est lue que si la page
+    descend jusque-là.
+    """
+    count_sql, count_params, page_sql, page_params = queries
+
+    def count():
+        # endpoint None : filtres que le cache ne sait pas ajuster, comptage direct sur index
+        if endpoint is None:
+            return c.execute(count_sql, count_params).fetchone()[0]
+        return COUNTS.get(c, endpoint, projet, type_lead, count_sql, count_params)
+
+    if cursor_mode:
+        # Mode curseur : seek sur l'index, total indicatif seulement si demandé
+        offset = 0
+        rows = c.execute(page_sql, page_params + [limit, offset]).fetchall()
+        total_rows = count() if with_total else None
+    else:
+        # Compter le total (en cache : ajusté par les écritures)
+        total_rows = count()
+
+        # Récupérer page spécifique
+        offset = (page - 1) * limit
+        rows = c.execute(page_sql, page_params + [limit, offset]).fetchall()
+
+    bound = ARCHIVE.bound(c, archive[2]) if archive else None
+    if bound is not None:
+        (archive_count_sql, archive_count_params, union_sql, union_params), key, _ = archive
+        if len(rows) < limit or rows[-1][key] <= bound:
+            rows = c.execute(union_sql, union_params + [limit, offset]).fetchall()
+        if total_rows is not None:
+            total_rows += ARCHIVE.count(c, archive_count_sql, archive_count_params)
+    return rows, total_rows
+
+# ================= PÉRIODES =================
+def parse_export_range(date_from: str, date_to: str):
+    """Bornes ISO [date_from, date_to[ ; une date seule couvre toute la journée"""
+    bounds = []
+    for value, is_end in ((date_from, False), (date_to, True)):
+        value = value.strip()
+        if not value:
+            bounds.append(None)
+            continue
+        dt = datetime.fromisoformat(value)  # ValueError si invalide
+        if is_end and len(value) == 10:
+            dt += timedelta(days=1)
+        bounds.append(dt.replace(tzinfo=None).isoformat())
+    return bounds
@@ -0,0 +1,96 @@
+"""Routes du tableau de bord : KPI, tendances et agents"""
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from datetime import datetime, timedelta
+
+from relance.calendar import paris_wall_now
+from relance.db.reader import READER
+from relance.kpi import KPI
+from relance.metrics import TimedJSONResponse
+from relance.queries import agent_hourly_sql, agent_stats_sql, trend_sql
+from relance.rollups import TREND_DEFAULT_DAYS, TREND_GRAINS, TREND_GROUPS, rollup_buckets
+from relance.routes.common import parse_export_range
+
+router = APIRouter()
+
+# ---------- AGENTS ----------
+AGENT_HOURS_MAX = 7 * 24
+
+def _fetch_agent_stats(c, projet, bucket_from):
+    sql, params = agent_stats_sql(projet)
+    totals = c.execute(sql, params).fetchall()
+    sql, params = agent_hourly_sql(projet, bucket_from)
+    return totals, c.execute(sql, params).fetchall()
+
+@router.get("/agents/stats")
+async def agents_stats(projet: str = "", hours: int = 24):
+    # Compteurs agent_stats + rollups horaires : coût fonction du nombre d'agents, pas des appels
+    hours = max(1, min(AGENT_HOURS_MAX, hours))
+    since = datetime.fromisoformat(paris_wall_now()) - timedelta(hours=hours - 1)
+    totals, hourly = await READER.run(_fetch_agent_stats, projet, rollup_buckets(since.isoformat())["hour"])
+
+    per_hour = {}
+    for bucket, agent, calls in hourly:
+        per_hour.setdefault(agent, {})[bucket] = calls
+    agents = []
+    for aid, name, calls_done, pending, definitive, attempts_sum in totals:
+        agents.append({
+            "agent_id": aid,
+            "agent": name,
+            "calls_done": calls_done,
+            "pending_relances": pending,
+            "definitive_results": definitive,
+            "avg_attempts_to_definitive": round(attempts_sum / definitive, 2) if definitive else None,
+            "calls_per_hour": per_hour.get(name, {}),
+        })
+    return TimedJSONResponse({"projet": projet, "hours": hours, "agents": agents})
+
+# ---------- DASHBOARD ----------
+@router.get("/dashboard")
+async def dashboard(projet: str = "", type_lead: str = ""):
+    # Tous les leads, sans requête : KPI tenus à jour par les écritures
+    return KPI.snapshot(projet, type_lead)
+
+def _fetch_trend(c, sql, params):
+    return c.execute(sql, params).fetchall()
+
+@router.get("/dashboard/trend")
+async def dashboard_trend(grain: str = "day", group_by: str = "", projet: str = "", type_lead: str = "",
+                          agent: str = "", date_from: str = "", date_to: str = ""):
+    # Séries lues dans les rollups (heure / jour), tenus à jour par les écritures
+    if grain not in TREND_GRAINS:
+        return JSONResponse({"error": f"Invalid grain ({', '.join(TREND_GRAINS)})"}, status_code=400)
+    if group_by not in TREND_GROUPS:
+        return JSONResponse({"error": "Invalid group_by (projet, type_lead, agent)"}, status_code=400)
+    try:
+        start, end = parse_export_range(date_from, date_to)
+    except ValueError:
+        return JSONResponse({"error": "Invalid date_from / date_to (ISO 8601)"}, status_code=400)
+
+    table_grain = TREND_GRAINS[grain][0]
+    if start is None:
+        start = (datetime.fromisoformat(paris_wall_now()) - timedelta(days=TREND_DEFAULT_DAYS[grain])).isoformat()
+    bucket_from = rollup_buckets(start)[table_grain]
+    bucket_to = rollup_buckets(end)[table_grain] if end else "9999"
+    sql, params = trend_sql(grain, group_by, projet, type_lead, agent, bucket_from, bucket_to)
+    rows = await READER.run(_fetch_trend, sql, params)
+
+    series = []
+    for r in rows:
+        calls, leads, measured, reac_sum, under_45 = r[-5:]
+        point = {"period": r[0]}
+        if group_by:
+            point[group_by] = r[1]
+        point.update({
+            "calls_total": calls,
+            "leads_total": leads,
+            "combativite_calls_per_lead": round(calls / leads, 2) if leads else 0.0,
+            "reactivite_mean_minutes": round(reac_sum / measured, 1) if measured else None,
+            "reactivite_pct_under_45": round(100.0 * under_45 / measured, 1) if measured else 0.0,
+            "reactivite_measured_leads": measured,
+        })
+        series.append(point)
+    return TimedJSONResponse({
+        "grain": grain, "group_by": group_by, "date_from": start, "date_to": end, "series": series
+    })
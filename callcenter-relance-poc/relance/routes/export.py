@@ -0,0 +1,87 @@
+"""Exports CSV / JSON en flux"""
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, StreamingResponse
+import csv
+import io
+import json
+import zlib
+
+from relance.archive import ARCHIVE
+from relance.db.pool import db
+from relance.db.reader import READER
+from relance.queries import export_calls_sql, export_leads_sql
+from relance.routes.common import parse_export_range
+
+router = APIRouter()
+
+# ---------- EXPORT ----------
+EXPORT_FETCH_SIZE = 1000
+
+def iter_export(sql: str, params: list, columns: list[str], fmt: str, gzip: bool):
+    """Produit l'export par lots de fetchmany : mémoire constante quelle que soit la taille"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+
+    def emit(text: str) -> bytes:
+        data = text.encode()
+        return compressor.compress(data) if compressor else data
+
+    with db() as c:
+        cur = c.execute(sql, params)
+        buf = io.StringIO()
+        writer = csv.writer(buf) if fmt == "csv" else None
+        if writer:
+            writer.writerow(columns)
+        while True:
+            rows = cur.fetchmany(EXPORT_FETCH_SIZE)
+            if not rows:
+                break
+            for r in rows:
+                if writer:
+                    writer.writerow(r)
+                else:
+                    buf.write(json.dumps(dict(zip(columns, r)), ensure_ascii=False))
+                    buf.write("\n")
+            chunk = emit(buf.getvalue())
+            buf.seek(0)
+            buf.truncate()
+            if chunk:
+                yield chunk
+        tail = emit(buf.getvalue())
+        if tail:
+            yield tail
+    if compressor:
+        yield compressor.flush()
+
+EXPORT_ARCHIVE_BOUNDS = {"calls": "calls", "leads": "leads_created"}
+
+async def export_response(name: str, builder, projet: str, type_lead: str,
+                    date_from: str, date_to: str, format: str, gzip: bool):
+    if format not in ("csv", "ndjson"):
+        return JSONResponse({"error": "Invalid format (csv, ndjson)"}, status_code=400)
+    try:
+        start, end = parse_export_range(date_from, date_to)
+    except ValueError:
+        return JSONResponse({"error": "Invalid date_from / date_to (ISO 8601)"}, status_code=400)
+
+    # L'archive n'est lue que si la période commence avant sa clé la plus récente
+    bound = await READER.run(ARCHIVE.bound, EXPORT_ARCHIVE_BOUNDS[name])
+    archive = bound is not None and (start is None or start <= bound)
+    sql, params, columns = builder(projet, type_lead, start, end, archive)
+    filename = f"{name}.{format}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else ("text/csv" if format == "csv" else "application/x-ndjson")
+    return StreamingResponse(
+        READER.iterate(iter_export(sql, params, columns, format, gzip)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/export/calls")
+async def export_calls(projet: str = "", type_lead: str = "", date_from: str = "", date_to: str = "",
+                 format: str = "csv", gzip: bool = False):
+    return await export_response("calls", export_calls_sql, projet, type_lead, date_from, date_to, format, gzip)
+
+@router.get("/export/leads")
+async def export_leads(projet: str = "", type_lead: str = "", date_from: str = "", date_to: str = "",
+                 format: str = "csv", gzip: bool = False):
+    return await export_response("leads", export_leads_sql, projet, type_lead, date_from, date_to, format, gzip)
@@ -0,0 +1,325 @@
+"""Routes leads : création, import en masse et liste"""
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, field_validator
+import codecs
+import json
+import logging
+
+from relance.archive import archived_lead_ids
+from relance.calendar import iso_now, parse_fr_dt
+from relance.counts import COUNTS, count_on_commit
+from relance.db.reader import READER
+from relance.db.schema import encode
+from relance.db.writer import WRITER, bump_on_commit
+from relance.kpi import KPI
+from relance.lead_stats import refresh_lead_stats
+from relance.metrics import TimedJSONResponse
+from relance.queries import LEADS_SORTS, leads_sql
+from relance.rollups import rollup_add, rollup_buckets
+from relance.routes.common import cursor_page, fetch_page, validate_pagination
+from relance.validation import Text, invalid, json_body, parse_body, validate_model
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+# ---------- LEAD ----------
+def _insert_lead(c, lead_key, projet, type_lead, lead_created_at_iso):
+    # Clé déjà archivée : même lead, jamais recréé dans la base
+    archived = archived_lead_ids(c, [lead_key])
+    if archived:
+        return archived[lead_key]
+
+    cur = c.execute("""
+        INSERT OR IGNORE INTO leads
+        (lead_key, phone, projet_id, type_lead_id, lead_created_at, created_at)
+        VALUES (?,?,?,?,?,?)
+    """, (
+        lead_key,
+        None,
+        encode(c, "projet", projet),
+        encode(c, "type_lead", type_lead),
+        lead_created_at_iso,
+        iso_now()
+    ))
+
+    row = c.execute(
+        "SELECT id FROM leads WHERE lead_key=?",
+        (lead_key,)
+    ).fetchone()
+    if cur.rowcount:
+        refresh_lead_stats(c, row[0])
+        count_on_commit(c, row[0], leads=1)
+        bump_on_commit("leads")
+    return row[0]
+
+class LeadIn(BaseModel):
+    lead_key: Text
+    projet: Text
+    type_lead: Text
+    lead_created_at: Text  # DD/MM/YYYY HH:mm, converti en ISO
+
+    @field_validator("lead_created_at")
+    @classmethod
+    def _lead_created_at(cls, value: str) -> str:
+        iso = parse_fr_dt(value)
+        if not iso:
+            raise invalid("Invalid lead_created_at (DD/MM/YYYY HH:mm)")
+        return iso
+
+    def row(self) -> tuple:
+        return self.lead_key, self.projet, self.type_lead, self.lead_created_at
+
+class LeadCreated(BaseModel):
+    lead_id: int
+
+def validate_lead(data) -> tuple[tuple | None, str | None]:
+    """(lead_key, projet, type_lead, lead_created_at_iso) nettoyés, ou message d'erreur"""
+    lead, error = validate_model(LeadIn, data, "Lead")
+    return (lead.row() if lead else None), error
+
+@router.post("/lead", response_model=LeadCreated, openapi_extra=json_body(LeadIn))
+async def create_lead(request: Request):
+    lead, error = await parse_body(request, LeadIn, "Lead")
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+
+    lead_id = await WRITER.run(_insert_lead, *lead.row())
+    return {"lead_id": lead_id}
+
+# ---------- LEADS BULK ----------
+BULK_CHUNK_SIZE = 500              # leads par transaction
+BULK_MAX_ITEM_BYTES = 64 * 1024    # un lead plus gros est refusé : borne la mémoire tampon
+
+class BulkPayloadError(Exception):
+    pass
+
+async def iter_bulk_items(request: Request):
+    """(index, objet | erreur) d'un tableau JSON ou d'un flux NDJSON, lus au fil de l'eau"""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    mode = None
+    index = 0
+    done = False
+
+    async def chunks():
+        async for chunk in request.stream():
+            yield utf8.decode(chunk)
+        yield utf8.decode(b"", final=True)
+
+    async for text in chunks():
+        buf = buf[pos:] + text
+        pos = 0
+
+        if mode is None:
+            stripped = buf.lstrip()
+            if not stripped:
+                continue
+            mode = "array" if stripped[0] == "[" else "ndjson"
+            pos = len(buf) - len(stripped) + (1 if mode == "array" else 0)
+
+        if mode == "ndjson":
+            while True:
+                end = buf.find("\n", pos)
+                if end < 0:
+                    break
+                line = buf[pos:end].strip()
+                pos = end + 1
+                if line:
+                    try:
+                        yield index, json.loads(line)
+                    except ValueError:
+                        yield index, BulkPayloadError("Invalid JSON line")
+                    index += 1
+        else:
+            while not done:
+                while pos < len(buf) and buf[pos] in " \t\r\n,":
+                    pos += 1
+                if pos >= len(buf):
+                    break
+                if buf[pos] == "]":
+                    done = True
+                    pos += 1
+                    break
+                try:
+                    item, pos = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    break  # objet incomplet : on attend la suite du flux
+                yield index, item
+                index += 1
+
+        if len(buf) - pos > BULK_MAX_ITEM_BYTES:
+            raise BulkPayloadError(f"Item {index} exceeds {BULK_MAX_ITEM_BYTES} bytes")
+
+    rest = buf[pos:].strip()
+    if mode == "ndjson" and rest:
+        try:
+            yield index, json.loads(rest)
+        except ValueError:
+            yield index, BulkPayloadError("Invalid JSON line")
+    elif mode == "array" and (rest or not done):
+        raise BulkPayloadError(f"Malformed JSON array near item {index}")
+
+def _insert_leads_chunk(c, rows):
+    """Insère un lot de leads validés ; renvoie {lead_key: (lead_id, créé)}"""
+    keys = [r[0] for r in rows]
+    placeholders = ",".join("?" * len(keys))
+    existing = {k for (k,) in c.execute(
+        f"SELECT lead_key FROM leads WHERE lead_key IN ({placeholders})", keys
+    )}
+    # Clés archivées : le lead archivé est renvoyé, rien n'est inséré
+    archived = archived_lead_ids(c, keys)
+    existing.update(archived)
+
+    now = iso_now()
+    c.executemany("""
+        INSERT OR IGNORE INTO leads
+        (lead_key, phone, projet_id, type_lead_id, lead_created_at, created_at)
+        VALUES (?,?,?,?,?,?)
+    """, [
+        (k, None, encode(c, "projet", projet), encode(c, "type_lead", type_lead), created, now)
+        for k, projet, type_lead, created in rows
+        if k not in archived
+    ])
+
+    ids = dict(c.execute(
+        f"SELECT lead_key, id FROM leads WHERE lead_key IN ({placeholders})", keys
+    ).fetchall())
+    ids.update(archived)
+
+    # Premier exemplaire de chaque clé nouvelle : stats à zéro, KPI et totaux ajustés
+    created = {}
+    per_hour = {}
+    for k, projet, type_lead, lead_created_at in rows:
+        if k not in existing and k not in created:
+            created[k] = (projet, type_lead)
+            hour = (rollup_buckets(lead_created_at)["hour"], projet, type_lead)
+            per_hour[hour] = per_hour.get(hour, 0) + 1
+    c.executemany(
+        "INSERT OR IGNORE INTO lead_stats (lead_id) VALUES (?)",
+        [(ids[k],) for k in created]
+    )
+    # Rollups : une mise à jour par créneau horaire, pas par lead
+    for (hour, projet, type_lead), n in per_hour.items():
+        rollup_add(c, hour, projet, type_lead, "", leads=n)
+
+    def after_commit():
+        per_filter = {}
+        for projet, type_lead in created.values():
+            KPI.apply(projet, type_lead, None, (0, 0, None))
+            per_filter[(projet, type_lead)] = per_filter.get((projet, type_lead), 0) + 1
+        for (projet, type_lead), n in per_filter.items():
+            COUNTS.adjust("leads", projet, type_lead, n)
+    if created:
+        WRITER.on_commit(after_commit)
+        bump_on_commit("leads")
+
+    return {k: (ids[k], k in created) for k in keys}
+
+@router.post("/leads/bulk")
+async def create_leads_bulk(request: Request):
+    results = []
+    inserted = duplicates = errors = 0
+    pending = []  # (index, lead validé)
+
+    async def flush():
+        nonlocal inserted, duplicates
+        outcome = await WRITER.run(_insert_leads_chunk, [lead for _, lead in pending])
+        seen = set()
+        for index, lead in pending:
+            lead_id, created = outcome[lead[0]]
+            if created and lead[0] not in seen:
+                inserted += 1
+            else:
+                duplicates += 1
+            seen.add(lead[0])
+            results.append({"index": index, "lead_id": lead_id})
+        pending.clear()
+
+    try:
+        async for index, item in iter_bulk_items(request):
+            lead, error = (None, str(item)) if isinstance(item, BulkPayloadError) else validate_lead(item)
+            if error:
+                errors += 1
+                results.append({"index": index, "error": error})
+                continue
+            pending.append((index, lead))
+            if len(pending) >= BULK_CHUNK_SIZE:
+                await flush()
+        if pending:
+            await flush()
+    except BulkPayloadError as e:
+        # Les lots déjà committés restent acquis : on les renvoie avec l'erreur
+        return JSONResponse({
+            "error": str(e),
+            "inserted": inserted,
+            "duplicates": duplicates,
+            "errors": errors,
+            "results": results,
+        }, status_code=400)
+
+    results.sort(key=lambda r: r["index"])
+    return {
+        "inserted": inserted,
+        "duplicates": duplicates,
+        "errors": errors,
+        "results": results,
+    }
+
+# ---------- LEADS ----------
+@router.get("/leads")
+async def leads(projet: str = "", type_lead: str = "", page: int = 1, limit: int = 20,
+          cursor: str | None = None, with_total: bool = False,
+          sort: str = "created", no_call: bool = False, last_result: str = ""):
+    if sort not in LEADS_SORTS:
+        return JSONResponse({"error": f"Invalid sort (expected {', '.join(LEADS_SORTS)})"}, status_code=400)
+    try:
+        page, limit, after = validate_pagination(page, limit, cursor)
+        # Totaux en cache seulement pour les filtres projet / type que les écritures ajustent
+        endpoint = None if no_call or last_result else "leads"
+        # Leads archivés : toujours appelés, jamais dans no_call
+        archive = None if no_call else (
+            leads_sql(projet, type_lead, after, sort, no_call, last_result, archive=True), 12, LEADS_SORTS[sort][3]
+        )
+        rows, total_rows = await READER.run(
+            fetch_page, endpoint, projet, type_lead,
+            leads_sql(projet, type_lead, after, sort, no_call, last_result),
+            page, limit, cursor is not None, with_total, archive
+        )
+
+        out = []
+        for r in rows:
+            (lead_id, lead_key, phone, prj, tl, lead_created_at, last_result_, last_done_at, _,
+             call_count, reactivity_in_scope, reactivity_minutes, _) = r
+
+            out.append({
+                "lead_id": lead_id,
+                "lead_key": lead_key,
+                "phone": phone,
+                "projet": prj,
+                "type_lead": tl,
+                "lead_created_at": lead_created_at,
+                "last_result": last_result_,
+                "last_done_at": last_done_at,
+                "call_count": call_count,
+                "reactivity_minutes": reactivity_minutes,
+                "reactivity_in_scope": reactivity_in_scope,
+            })
+        
+        if cursor is not None:
+            next_key = (rows[-1][12], rows[-1][0]) if rows else None
+            return cursor_page(out, limit, next_key, total_rows)
+
+        return TimedJSONResponse({
+            "data": out,
+            "page": page,
+            "limit": limit,
+            "total": total_rows,
+            "pages": (total_rows + limit - 1) // limit
+        })
+    except Exception as e:
+        logger.error(f"Error in leads: {str(e)}")
+        return JSONResponse({"error": "Failed to fetch leads"}, status_code=500)
@@ -0,0 +1,91 @@
+"""Routes d'exploitation : santé, métriques et archivage"""
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, ValidationError, field_validator
+import asyncio
+import logging
+
+from relance.archive import (ARCHIVE, ARCHIVE_AFTER_DAYS, ARCHIVE_MIN_DAYS, archive_horizon, archive_once,
+                             space_report)
+from relance.cache import HTTP_CACHE
+from relance.counts import COUNTS
+from relance.db.pool import POOL
+from relance.db.reader import READER
+from relance.db.writer import WRITER
+from relance.events import EVENTS
+from relance.metrics import METRICS
+from relance.scheduler import SCHEDULER
+from relance.validation import Int, invalid, json_body, parse_body
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+# ---------- HEALTH ----------
+def _ping(c):
+    return c.execute("SELECT 1").fetchone()
+
+@router.get("/health/db")
+async def health_db():
+    try:
+        await READER.run(_ping)
+        return {"ok": True, "pool": POOL.stats(), "reader": READER.stats(),
+                "writer": WRITER.stats(), "counts": COUNTS.stats(), "http_cache": HTTP_CACHE.stats(),
+                "events": EVENTS.stats(), "scheduler": SCHEDULER.stats(), "archive": ARCHIVE.stats()}
+    except Exception as e:
+        logger.error(f"Error in health_db: {str(e)}")
+        return JSONResponse(
+            {"ok": False, "pool": POOL.stats(), "reader": READER.stats(), "writer": WRITER.stats()},
+            status_code=503
+        )
+
+# ---------- METRICS ----------
+@router.get("/metrics")
+async def metrics():
+    """Format d'exposition Prometheus ; les compteurs de /health/db en jauges"""
+    stats = {"pool": POOL.stats(), "reader": READER.stats(), "writer": WRITER.stats(),
+             "counts": COUNTS.stats(), "http_cache": HTTP_CACHE.stats(), "events": EVENTS.stats(),
+             "scheduler": SCHEDULER.stats(), "archive": ARCHIVE.stats()}
+    gauges = {
+        f"relance_{component}_{key}": value
+        for component, values in stats.items()
+        for key, value in values.items()
+        if isinstance(value, (int, float))
+    }
+    return PlainTextResponse(METRICS.render(gauges), media_type="text/plain; version=0.0.4")
+
+# ---------- ARCHIVE ----------
+@router.get("/archive")
+async def archive_status():
+    try:
+        return {**ARCHIVE.status(), "space": await READER.run(space_report)}
+    except Exception as e:
+        logger.error(f"Error in archive_status: {str(e)}")
+        return JSONResponse({"error": "Failed to read archive status"}, status_code=500)
+
+class ArchiveRunIn(BaseModel):
+    days: Int = ARCHIVE_AFTER_DAYS
+
+    @field_validator("days", mode="wrap")
+    @classmethod
+    def _days(cls, value, handler):
+        try:
+            days = handler(value)
+        except ValidationError:
+            days = None
+        if days is None or days < ARCHIVE_MIN_DAYS:
+            raise invalid(f"Invalid days (>= {ARCHIVE_MIN_DAYS})")
+        return days
+
+@router.post("/archive/run", openapi_extra=json_body(ArchiveRunIn))
+async def archive_run(request: Request):
+    """Lance un archivage en tâche de fond (leads clos depuis `days` jours)"""
+    body, error = await parse_body(request, ArchiveRunIn, "Archive")
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+    days = body.days
+    if not ARCHIVE.try_start():
+        return JSONResponse({"error": "Archive already running"}, status_code=409)
+    # Le rapport est lu ensuite sur GET /archive (last_run)
+    ARCHIVE.task = asyncio.create_task(archive_once(days, claimed=True))
+    return JSONResponse({"started": True, "days": days, "horizon": archive_horizon(days)}, status_code=202)
@@ -0,0 +1,400 @@
+"""Routes relances : liste, flux, contexte, réservation, replanification et clôture"""
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from datetime import datetime, timedelta
+from pydantic import BaseModel, Field, ValidationError, field_validator
+import asyncio
+import json
+import logging
+import time
+
+from relance.calendar import PARIS, calendar_for, iso_now, paris_wall_time
+from relance.counts import count_on_commit
+from relance.db.reader import READER
+from relance.db.schema import encode
+from relance.db.writer import WRITER, bump_on_commit
+from relance.events import EVENTS, STREAMS_CLOSING, Subscription
+from relance.kpi import KPI
+from relance.lead_stats import refresh_lead_stats
+from relance.metrics import TimedJSONResponse
+from relance.planning import (RelanceIn, insert_relance, projet_capacity, publish_relance, relance_item,
+                              slot_key)
+from relance.queries import (PENDING_FROM_SQL, RELANCE_CONTEXT_SQL, RELANCE_PENDING_SQL, overdue_relances_sql,
+                             relances_sql)
+from relance.rollups import rollup_call
+from relance.routes.common import (BatchIn, apply_batch, batch_items, batch_response, cursor_page, fetch_page,
+                                   validate_pagination)
+from relance.scheduler import (ACTIVE_LEASES_SQL, LEASE_MAX_SECONDS, LEASE_SECONDS, SCHEDULER, lease_clock,
+                               lease_in_db, lease_remaining, priority_rank)
+from relance.validation import Filter, Int, Ok, Text, invalid, json_body, parse_body, validate_model
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+# ---------- RELANCES ----------
+@router.get("/relances")
+async def relances(projet: str = "", type_lead: str = "", page: int = 1, limit: int = 20,
+             cursor: str | None = None, with_total: bool = False):
+    try:
+        page, limit, after = validate_pagination(page, limit, cursor)
+        # Avant la lecture : les événements jusqu'à event_id y sont déjà, le client ignore leur delta
+        event_id = EVENTS.last_id()
+        rows, total_rows = await READER.run(
+            fetch_page, "relances", projet, type_lead, relances_sql(projet, type_lead, after),
+            page, limit, cursor is not None, with_total
+        )
+
+        data = [relance_item(r) for r in rows]
+
+        if cursor is not None:
+            next_key = (rows[-1][8], rows[-1][0]) if rows else None
+            return cursor_page(data, limit, next_key, total_rows)
+
+        return TimedJSONResponse({
+            "data": data,
+            "page": page,
+            "limit": limit,
+            "total": total_rows,
+            "pages": (total_rows + limit - 1) // limit,
+            "event_id": event_id
+        })
+    except Exception as e:
+        logger.error(f"Error in relances: {str(e)}")
+        return JSONResponse({"error": "Failed to fetch relances"}, status_code=500)
+
+# ---------- RELANCES STREAM ----------
+SSE_RETRY_MS = 3000
+SSE_HEARTBEAT = 15.0      # secondes : garde la connexion ouverte derrière les proxys
+KPI_PUSH_INTERVAL = 1.0   # snapshot KPI poussé au plus une fois par seconde
+
+def sse(kind: str, data, event_id: int | None = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def relance_events(request: Request, sub: Subscription):
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        kpi_version = None
+        kpi_pushed_at = 0.0
+        last_sent = time.monotonic()
+        while not STREAMS_CLOSING.is_set() and not await request.is_disconnected():
+            try:
+                event_id, kind, data = await asyncio.wait_for(sub.queue.get(), timeout=KPI_PUSH_INTERVAL)
+                if kind == "reset":
+                    sub.lost = False
+                yield sse(kind, data, event_id)
+                last_sent = time.monotonic()
+            except asyncio.TimeoutError:
+                pass
+
+            now = time.monotonic()
+            if KPI.version != kpi_version and now - kpi_pushed_at >= KPI_PUSH_INTERVAL:
+                kpi_version, kpi_pushed_at = KPI.version, now
+                yield sse("kpi", KPI.snapshot())
+                last_sent = now
+            elif now - last_sent >= SSE_HEARTBEAT:
+                yield ": ping\n\n"
+                last_sent = now
+    finally:
+        EVENTS.unsubscribe(sub)
+
+@router.get("/relances/stream")
+async def relances_stream(request: Request):
+    """Server-Sent Events : scheduled / completed / reprioritized, kpi, reset"""
+    last_event_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    sub = EVENTS.subscribe(last_event_id)
+    return StreamingResponse(
+        relance_events(request, sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ---------- CONTEXT RELANCE ----------
+def _fetch_relance_context(c, call_id):
+    return c.execute(RELANCE_CONTEXT_SQL, (call_id,)).fetchone()
+
+@router.get("/relance/{call_id}")
+async def relance_context(call_id: int, agent: str = ""):
+    # Avec `agent`, ouvrir la relance la réserve : un autre agent reçoit 409
+    if agent:
+        agent = agent.strip()
+        holder = SCHEDULER.acquire(call_id, agent)
+        if not holder:
+            held = await WRITER.run(lease_in_db, call_id, agent)
+            if held:
+                SCHEDULER.yield_to(call_id, agent, held[0], lease_remaining(held[1]))
+                holder = held[0]
+        if holder:
+            return JSONResponse({"error": f"Relance already claimed by {holder}"}, status_code=409)
+
+    row = await READER.run(_fetch_relance_context, call_id)
+
+    if not row:
+        return JSONResponse({"error": "Not found"}, status_code=404)
+
+    return {
+        "call_id": row[0],
+        "lead_id": row[1],
+        "agent": row[2],
+        "attempt_level": row[3],
+        "priority": row[4],
+        "next_call_at": row[5],
+        "lead_key": row[6],
+        "phone": row[7],
+        "projet": row[8],
+        "type_lead": row[9],
+        "lead_created_at": row[10],
+    }
+
+# ---------- CLAIM RELANCE ----------
+CLAIM_MAX_ATTEMPTS = 10
+
+def _fetch_pending_relance(c, call_id):
+    return c.execute(RELANCE_PENDING_SQL, (call_id,)).fetchone()
+
+def _claim_relance(c, call_id, agent, lease_seconds):
+    """(relance, None) réservée en base, (None, (détenteur, échéance)) ou (None, None) si traitée"""
+    holder = lease_in_db(c, call_id, agent, lease_seconds)
+    if holder:
+        return None, holder
+    return _fetch_pending_relance(c, call_id), None
+
+class ClaimIn(BaseModel):
+    agent: Text
+    projet: Filter = ""
+    lease_seconds: Int = LEASE_SECONDS
+
+    @field_validator("lease_seconds", mode="wrap")
+    @classmethod
+    def _lease(cls, value, handler):
+        # Absent, null, vide ou 0 : durée par défaut
+        try:
+            lease = handler(value) if value or isinstance(value, bool) else LEASE_SECONDS
+        except ValidationError:
+            lease = None
+        if lease is None or not 0 < lease <= LEASE_MAX_SECONDS:
+            raise invalid(f"Invalid lease_seconds (1-{LEASE_MAX_SECONDS})")
+        return lease
+
+@router.post("/relances/next", openapi_extra=json_body(ClaimIn))
+async def claim_next_relance(request: Request):
+    """Attribue à l'agent la relance due la plus prioritaire, réservée `lease_seconds`"""
+    claim, error = await parse_body(request, ClaimIn, "Claim")
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+    agent, projet, lease = claim.agent, claim.projet, claim.lease_seconds
+
+    for _ in range(CLAIM_MAX_ATTEMPTS):
+        call_id = SCHEDULER.claim(agent, projet, lease)
+        if call_id is None:
+            return {"relance": None}
+        row, holder = await WRITER.run(_claim_relance, call_id, agent, lease)
+        if row:
+            expires_at = datetime.now(PARIS) + timedelta(seconds=lease)
+            return {"relance": relance_item(row), "lease_expires_at": expires_at.isoformat()}
+        if holder:
+            # Réservée en base par un autre process : écartée, candidate suivante
+            SCHEDULER.yield_to(call_id, agent, holder[0], lease_remaining(holder[1]))
+        else:
+            # Traitée hors de ce process (script, autre outil) : on l'oublie
+            SCHEDULER.remove(call_id)
+    return JSONResponse({"error": "Failed to claim relance"}, status_code=503)
+
+class ReleaseIn(BaseModel):
+    agent: Text
+
+def _release_relance(c, call_id, agent):
+    return c.execute(
+        "UPDATE calls SET leased_by=NULL, lease_until=NULL WHERE id=? AND leased_by=? AND lease_until > ?",
+        (call_id, agent, lease_clock())
+    ).rowcount > 0
+
+@router.post("/relance/{call_id}/release", response_model=Ok, openapi_extra=json_body(ReleaseIn))
+async def release_relance(call_id: int, request: Request):
+    release, error = await parse_body(request, ReleaseIn, "Release")
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+    released = SCHEDULER.release(call_id, release.agent)
+    if not await WRITER.run(_release_relance, call_id, release.agent) and not released:
+        return JSONResponse({"error": "Relance not claimed by this agent"}, status_code=409)
+    return {"ok": True}
+
+# ---------- RESCHEDULE RELANCES ----------
+RESCHEDULE_EVENTS_MAX = 100  # au-delà, un seul "reset" plutôt qu'un événement par relance
+
+def plan_reschedule(c, projet: str, type_lead: str, capacity: int | None = None, busy=SCHEDULER.leased):
+    """Replace les relances en retard sur les prochains créneaux ouverts, sans dépasser la capacité.
+
+    Remplissage glouton par projet : P1 d'abord, puis par ancienneté ; la charge
+    déjà planifiée des créneaux est prise en compte. Une relance qu'un agent a
+    réservée (busy, ou en base) reste en place : elle est comptée dans "leased".
+    """
+    now = datetime.now(PARIS).replace(tzinfo=None)
+    sql, params = overdue_relances_sql(projet, type_lead)
+    by_projet = {}
+    for r in c.execute(sql, [now.isoformat()] + params):
+        by_projet.setdefault(r[3], []).append(r)
+    ids = [r[0] for rows in by_projet.values() for r in rows]
+    # Réservées en base (autre process, avant un redémarrage) : laissées en place elles aussi
+    in_db = {row[0] for row in c.execute(ACTIVE_LEASES_SQL, (lease_clock(),))}
+    leased = busy([i for i in ids if i not in in_db]) | in_db.intersection(ids)
+
+    moves, summary = [], {}
+    for prj, rows in by_projet.items():
+        held = len(rows)
+        rows = [r for r in rows if r[0] not in leased]
+        held -= len(rows)
+        rows.sort(key=lambda r: (priority_rank(r[7]), r[8], r[0]))
+        cal = calendar_for(prj)
+        cap = capacity or projet_capacity(c, prj)
+        start = cal.slot_at(now)
+
+        load = {}
+        for (at,) in c.execute(PENDING_FROM_SQL, (start.isoformat(), prj)):
+            key = slot_key(paris_wall_time(at))
+            load[key] = load.get(key, 0) + 1
+
+        slot = start
+        for r in rows:
+            while load.get(slot_key(slot), 0) >= cap:
+                slot = cal.next_slot(slot)
+            load[slot_key(slot)] = load.get(slot_key(slot), 0) + 1
+            moves.append((r, slot.isoformat()))
+        summary[prj] = {
+            "rescheduled": len(rows),
+            "leased": held,
+            "capacity_per_slot": cap,
+            "first_slot": start.isoformat(),
+            "last_slot": slot.isoformat(),
+        }
+    return moves, summary
+
+RESCHEDULE_HOLDER = "(replanification)"
+RESCHEDULE_HOLD_SECONDS = 30  # réservation des relances déplacées, jusqu'au COMMIT
+
+def _reschedule_relances(c, projet, type_lead, capacity):
+    # Réservées le temps de l'écriture : aucun agent ne les prend entre le plan et le COMMIT
+    moves, summary = plan_reschedule(
+        c, projet, type_lead, capacity,
+        busy=lambda ids: SCHEDULER.hold(ids, RESCHEDULE_HOLDER, RESCHEDULE_HOLD_SECONDS)
+    )
+    c.executemany(
+        "UPDATE calls SET next_call_at=? WHERE id=? AND done_at IS NULL",
+        [(at, r[0]) for r, at in moves]
+    )
+    items = [{**relance_item(r), "next_call_at": at} for r, at in moves]
+
+    def apply():
+        for item in items:
+            SCHEDULER.schedule(item["call_id"], item["projet"], item["priority"], item["next_call_at"])
+        if len(items) > RESCHEDULE_EVENTS_MAX:
+            EVENTS.publish("reset", {})
+        else:
+            for item in items:
+                EVENTS.publish("reprioritized", item)
+
+    WRITER.on_commit(apply)
+    if moves:
+        bump_on_commit("calls")
+    return summary
+
+class RescheduleIn(BaseModel):
+    projet: Filter = ""
+    type_lead: Filter = ""
+    capacity_per_slot: Int | None = Field(None, ge=1)  # None : capacité du calendrier
+    dry_run: bool = False
+
+@router.post("/relances/reschedule", openapi_extra=json_body(RescheduleIn))
+async def reschedule_relances(request: Request):
+    """Replace toutes les relances en retard (filtres optionnels) en une transaction"""
+    body, error = await parse_body(request, RescheduleIn, "Reschedule")
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+    projet, type_lead, capacity = body.projet, body.type_lead, body.capacity_per_slot
+
+    if body.dry_run:
+        moves, summary = await READER.run(plan_reschedule, projet, type_lead, capacity)
+        return {"dry_run": True, "rescheduled": len(moves),
+                "leased": sum(p["leased"] for p in summary.values()), "projets": summary}
+
+    summary = await WRITER.run(_reschedule_relances, projet, type_lead, capacity)
+    return {"rescheduled": sum(p["rescheduled"] for p in summary.values()),
+            "leased": sum(p["leased"] for p in summary.values()), "projets": summary}
+
+# ---------- COMPLETE RELANCE ----------
+def _complete_relance(c, call_id, completion, now):
+    row = c.execute(
+        "SELECT lead_id, agent, done_at, next_call_at FROM calls_named WHERE id=?",
+        (call_id,)
+    ).fetchone()
+
+    if not row:
+        return False
+
+    lead_id, agent, done_at, next_call_at = row
+    was_pending = done_at is None and next_call_at is not None
+    if was_pending:
+        publish_relance(c, call_id, "completed")
+
+    c.execute("""
+        UPDATE calls
+        SET done_at=?, result_id=?, priority_id=?, next_call_at=NULL, leased_by=NULL, lease_until=NULL
+        WHERE id=?
+    """, (now, encode(c, "result", completion.result), encode(c, "priority", completion.priority), call_id))
+    # Un appel déjà réalisé change de créneau
+    if done_at:
+        rollup_call(c, lead_id, agent, done_at, -1)
+    rollup_call(c, lead_id, agent, now)
+
+    relance = completion.relance
+    if relance:
+        insert_relance(c, lead_id, agent, relance, now)
+
+    refresh_lead_stats(c, lead_id)
+    count_on_commit(
+        c, lead_id,
+        calls=0 if done_at else 1,
+        relances=(1 if relance else 0) - (1 if was_pending else 0)
+    )
+    bump_on_commit("calls")
+    return True
+
+class CompletionIn(RelanceIn):
+    result: Text
+    priority: Text
+
+@router.post("/relance/{call_id}/complete", response_model=Ok, openapi_extra=json_body(CompletionIn))
+async def complete_relance(call_id: int, request: Request):
+    completion, error = await parse_body(request, CompletionIn, "Completion")
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+
+    if not await WRITER.run(_complete_relance, call_id, completion, iso_now()):
+        return JSONResponse({"error": "Not found"}, status_code=404)
+    return {"ok": True}
+
+# ---------- COMPLETE RELANCES (lot) ----------
+class BatchCompletionIn(CompletionIn):
+    call_id: Int
+
+def validate_batch_completion(data) -> tuple[tuple | None, str | None]:
+    """(call_id, completion) d'un élément de /relances/complete-batch"""
+    completion, error = validate_model(BatchCompletionIn, data, "Completion")
+    return ((completion.call_id, completion) if completion else None), error
+
+@router.post("/relances/complete-batch", openapi_extra=json_body(BatchIn))
+async def complete_relances_batch(request: Request):
+    """Clôture N relances en une transaction (clôture de masse d'une campagne)"""
+    batch, error = await parse_body(request, BatchIn, "Batch")
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+    valid, errors = batch_items(batch, validate_batch_completion)
+
+    outcome = await WRITER.run(apply_batch, _complete_relance, valid, iso_now()) if valid else {}
+    return batch_response("completed", valid, errors, outcome)
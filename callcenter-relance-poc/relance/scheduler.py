@@ -0,0 +1,242 @@
+"""Relances en attente en mémoire et réservations des agents (leases)"""
+
+from datetime import datetime, timedelta, timezone
+import heapq
+import threading
+import time
+
+from relance.calendar import paris_wall_now
+
+# ================= SCHEDULER =================
+LEASE_SECONDS = 300         # durée de réservation d'une relance par un agent
+LEASE_MAX_SECONDS = 3600
+
+# Réservations en base (migration 8) : posées dans la transaction du claim, elles
+# survivent à un redémarrage et une relance réservée n'est servie par aucun autre process
+LEASE_SQL = """
+    UPDATE calls SET leased_by=?, lease_until=?
+    WHERE id=? AND done_at IS NULL AND next_call_at IS NOT NULL
+      AND (leased_by IS NULL OR leased_by=? OR lease_until <= ?)
+"""
+ACTIVE_LEASES_SQL = "SELECT id, leased_by, lease_until FROM calls WHERE leased_by IS NOT NULL AND lease_until > ?"
+# Une relance réservée par agent : sa réservation précédente est rendue
+DROP_AGENT_LEASES_SQL = """
+    UPDATE calls SET leased_by=NULL, lease_until=NULL
+    WHERE leased_by=? AND lease_until > ? AND id<>?
+"""
+
+def lease_clock(seconds: float = 0) -> str:
+    """Échéance d'une réservation en base : UTC à largeur fixe, comparable en texte quelle que soit l'heure d'été"""
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).isoformat(timespec="microseconds")
+
+def lease_remaining(lease_until: str) -> float:
+    return (datetime.fromisoformat(lease_until) - datetime.now(timezone.utc)).total_seconds()
+
+def lease_in_db(c, call_id: int, agent: str, lease_seconds: int = LEASE_SECONDS):
+    """Réserve la relance en base pour `agent`.
+
+    Renvoie (détenteur, échéance) si un autre agent la détient encore, sinon None :
+    réservée, ou plus en attente (rien n'est écrit).
+    """
+    now = lease_clock()
+    if c.execute(LEASE_SQL, (agent, lease_clock(lease_seconds), call_id, agent, now)).rowcount:
+        c.execute(DROP_AGENT_LEASES_SQL, (agent, now, call_id))
+        return None
+    return c.execute(
+        "SELECT leased_by, lease_until FROM calls WHERE id=? AND done_at IS NULL AND next_call_at IS NOT NULL",
+        (call_id,)
+    ).fetchone()
+
+def priority_rank(priority: str) -> int:
+    # P1 passe avant NORMAL (et toute autre valeur)
+    return 0 if priority == "P1" else 1
+
+def scheduler_keys(projet: str, rank: int):
+    """Tas où figure une relance : celui de son projet et celui de tous les projets ("")"""
+    return ((projet, rank), ("", rank))
+
+class RelanceScheduler:
+    """Relances en attente en mémoire : un tas par (projet, priorité), trié par next_call_at.
+
+    Chaque relance est aussi dans le tas ("", priorité) : une réservation, filtrée par
+    projet ou non, ne lit que deux tas (P1 puis NORMAL), en O(log n).
+    Suppression paresseuse : une entrée du tas n'est valide que si elle correspond
+    encore à `_pending` et n'est pas réservée ; chacune n'est dépilée qu'une fois.
+    Une relance réservée (lease) n'est proposée à aucun autre agent jusqu'à sa
+    complétion, sa libération ou son expiration. Les réservations sont aussi en base
+    (lease_in_db) : rechargées au démarrage, elles font foi face à un autre process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heaps = {}      # (projet ou "", rang) -> [(next_call_at, call_id)]
+        self._pending = {}    # call_id -> (next_call_at, projet, rang)
+        self._leases = {}     # call_id -> (agent, expire_at monotonic)
+        self._by_agent = {}   # agent -> call_id : une relance réservée par agent
+        self._expiries = []   # tas (expire_at, call_id)
+        self._stats = {"claims": 0, "empty_claims": 0, "conflicts": 0, "expired": 0}
+
+    def load(self, c):
+        heaps, pending = {}, {}
+        for call_id, projet, priority, next_call_at in c.execute("""
+            SELECT c.id, l.projet, c.priority, c.next_call_at
+            FROM calls_named c
+            JOIN leads_named l ON l.id=c.lead_id
+            WHERE c.done_at IS NULL AND c.next_call_at IS NOT NULL
+        """):
+            key = (projet, priority_rank(priority))
+            for heap_key in scheduler_keys(*key):
+                heaps.setdefault(heap_key, []).append((next_call_at, call_id))
+            pending[call_id] = (next_call_at, *key)
+        for heap in heaps.values():
+            heapq.heapify(heap)
+        leases = [(call_id, agent, lease_remaining(until))
+                  for call_id, agent, until in c.execute(ACTIVE_LEASES_SQL, (lease_clock(),))]
+        with self._lock:
+            self._heaps, self._pending = heaps, pending
+            self._leases, self._by_agent, self._expiries = {}, {}, []
+            # Réservations d'avant le redémarrage : tenues jusqu'à leur échéance
+            for call_id, agent, seconds in leases:
+                if call_id in pending:
+                    self._lease(call_id, agent, seconds)
+
+    def schedule(self, call_id: int, projet: str, priority: str, next_call_at: str):
+        """Nouvelle relance ou relance déplacée / repriorisée (l'ancienne entrée devient caduque)"""
+        with self._lock:
+            self._drop_lease(call_id)
+            key = (projet, priority_rank(priority))
+            self._pending[call_id] = (next_call_at, *key)
+            self._push(call_id)
+
+    def remove(self, call_id: int):
+        with self._lock:
+            self._pending.pop(call_id, None)
+            self._drop_lease(call_id)
+
+    def claim(self, agent: str, projet: str = "", lease_seconds: int = LEASE_SECONDS,
+              now: str | None = None) -> int | None:
+        """Réserve la relance due la plus prioritaire : P1 d'abord, puis la plus en retard"""
+        now = now or paris_wall_now()
+        with self._lock:
+            self._expire()
+            held = self._by_agent.get(agent)
+            if held is not None:
+                # Un agent ne compose qu'une relance à la fois : on lui rend la sienne
+                self._lease(held, agent, lease_seconds)
+                return held
+
+            for rank in (0, 1):
+                heap = self._heaps.get((projet, rank))
+                top = self._clean_top(rank, heap) if heap else None
+                if top and top[0] <= now:
+                    heapq.heappop(heap)
+                    call_id = top[1]
+                    self._lease(call_id, agent, lease_seconds)
+                    self._stats["claims"] += 1
+                    return call_id
+            self._stats["empty_claims"] += 1
+            return None
+
+    def acquire(self, call_id: int, agent: str, lease_seconds: int = LEASE_SECONDS) -> str | None:
+        """Réserve une relance précise ; renvoie l'agent qui la détient déjà, sinon None"""
+        with self._lock:
+            self._expire()
+            holder = self._leases.get(call_id)
+            if holder and holder[0] != agent:
+                self._stats["conflicts"] += 1
+                return holder[0]
+            if call_id in self._pending:
+                self._lease(call_id, agent, lease_seconds)
+            return None
+
+    def yield_to(self, call_id: int, agent: str, holder: str, seconds: float):
+        """Réservée en base par `holder` (autre process) : rendue par `agent`, écartée jusqu'à l'échéance"""
+        with self._lock:
+            self._stats["conflicts"] += 1
+            if self._by_agent.get(agent) == call_id:
+                del self._by_agent[agent]
+            if call_id in self._pending:
+                self._lease(call_id, holder, seconds)
+
+    def release(self, call_id: int, agent: str) -> bool:
+        with self._lock:
+            holder = self._leases.get(call_id)
+            if not holder or holder[0] != agent:
+                return False
+            self._drop_lease(call_id)
+            return True
+
+    def holder(self, call_id: int) -> str | None:
+        with self._lock:
+            self._expire()
+            holder = self._leases.get(call_id)
+            return holder[0] if holder else None
+
+    def leased(self, call_ids) -> set:
+        """Relances de `call_ids` réservées en ce moment"""
+        with self._lock:
+            self._expire()
+            return {call_id for call_id in call_ids if call_id in self._leases}
+
+    def hold(self, call_ids, holder: str, seconds: float) -> set:
+        """Réserve d'un coup des relances pour une écriture qui les déplace ; renvoie celles
+        déjà réservées par un autre. schedule() rend les autres aux agents après le COMMIT,
+        l'expiration si l'écriture échoue."""
+        with self._lock:
+            self._expire()
+            busy = {c for c in call_ids if c in self._leases and self._leases[c][0] != holder}
+            expire_at = time.monotonic() + seconds
+            for call_id in call_ids:
+                if call_id not in busy:
+                    self._leases[call_id] = (holder, expire_at)
+                    heapq.heappush(self._expiries, (expire_at, call_id))
+            return busy
+
+    def _clean_top(self, rank, heap):
+        # Dépile les entrées caduques (complétées, déplacées, repriorisées, réservées)
+        while heap:
+            next_call_at, call_id = heap[0]
+            entry = self._pending.get(call_id)
+            if entry and entry[0] == next_call_at and entry[2] == rank and call_id not in self._leases:
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    def _push(self, call_id):
+        next_call_at, projet, rank = self._pending[call_id]
+        for key in scheduler_keys(projet, rank):
+            heapq.heappush(self._heaps.setdefault(key, []), (next_call_at, call_id))
+
+    def _lease(self, call_id, agent, lease_seconds):
+        previous = self._by_agent.get(agent)
+        if previous is not None and previous != call_id:
+            self._drop_lease(previous)
+        expire_at = time.monotonic() + lease_seconds
+        self._leases[call_id] = (agent, expire_at)
+        self._by_agent[agent] = call_id
+        heapq.heappush(self._expiries, (expire_at, call_id))
+
+    def _drop_lease(self, call_id):
+        holder = self._leases.pop(call_id, None)
+        if not holder:
+            return
+        if self._by_agent.get(holder[0]) == call_id:
+            del self._by_agent[holder[0]]
+        # Toujours en attente : de nouveau proposée aux agents
+        if call_id in self._pending:
+            self._push(call_id)
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._expiries and self._expiries[0][0] <= now:
+            expire_at, call_id = heapq.heappop(self._expiries)
+            holder = self._leases.get(call_id)
+            if holder and holder[1] == expire_at:
+                self._stats["expired"] += 1
+                self._drop_lease(call_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "pending": len(self._pending), "leased": len(self._leases)}
+
+SCHEDULER = RelanceScheduler()
@@ -1,22 +1,41 @@
+"""
+Données métier factices, au schéma d'origine (la base est encodée par les
+migrations au démarrage du serveur).
+
+    python seed_fake_data_metier.py                   # 999 leads
+    python seed_fake_data_metier.py --leads 100000    # bancs : 10k / 100k / 1M leads
+
+Même --seed, mêmes données (dates relatives au jour du seed).
+"""
+import argparse
 import os
 import sqlite3
 from datetime import datetime, timedelta
 import random
 
-DB = "calls.db"
+parser = argparse.ArgumentParser(description="Génère calls.db avec des leads et appels factices")
+parser.add_argument("--leads", type=int, default=999)
+parser.add_argument("--db", default="calls.db")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+DB = args.db
+random.seed(args.seed)
 
 # =====================
 # RESET DB
 # =====================
 if os.path.exists(DB):
     os.remove(DB)
-    print("🧹 calls.db supprimée")
+    print(f"🧹 {DB} supprimée")
 
 conn = sqlite3.connect(DB)
 c = conn.cursor()
+# Pages libérées par l'archivage rendues au disque par étapes (voir relance/archive.py)
+c.execute("PRAGMA auto_vacuum=INCREMENTAL")
 
 # =====================
-# SCHEMA (identique prod)
+# SCHEMA (d'origine, encodé par les migrations au démarrage du serveur)
 # =====================
 c.execute("""
 CREATE TABLE leads (
@@ -57,133 +76,94 @@ NON_DEFINITIFS = ["Pas de réponse", "Injoignable", "À rappeler"]
 DEFINITIFS = ["Qualifié", "Pas intéressé", "Annulé"]
 
 now = datetime.now().replace(hour=14, minute=0, second=0, microsecond=0)
+created_at = now.isoformat()
+lead_base = now.replace(hour=10)
 
 # =====================
-# 10 LEADS MÉTIER
+# LEADS MÉTIER
 # =====================
-for i in range(1, 1000):
-    lead_key = f"FAKE-LEAD-{i}"
-    lead_created = now.replace(hour=10) - timedelta(minutes=i * 10)
-
-    c.execute("""
-        INSERT INTO leads
-        (lead_key, phone, projet, type_lead, lead_created_at, created_at)
-        VALUES (?,?,?,?,?,?)
-    """, (
-        lead_key,
-        f"336000000{i}",
-        projets[i % 2],
-        "Web",
-        lead_created.isoformat(),
-        now.isoformat()
-    ))
-
-    lead_id = c.lastrowid
-    agent = random.choice(agents)
+# Insertion par tranches (executemany) : une requête préparée par table et par tranche
+CHUNK = 10_000
+
+INSERT_LEAD = """
+    INSERT INTO leads
+    (id, lead_key, phone, projet, type_lead, lead_created_at, created_at)
+    VALUES (?,?,?,?,?,?,?)
+"""
+INSERT_CALL = """
+    INSERT INTO calls
+    (lead_id, agent, attempt_level, result, priority, next_call_at, done_at, created_at)
+    VALUES (?,?,?,?,?,?,?,?)
+"""
+
+
+def lead_calls(lead_id, lead_created, agent, p1):
+    """Appels d'un lead, selon un cas tiré au hasard (mêmes proportions que l'ancien i % 1000)"""
+    case = random.randrange(1000)
 
     # =====================
     # CAS 1 — lead clos dès le 1er appel
     # =====================
-    if i in (1, 2):
+    if case in (1, 2):
         first_call = lead_created + timedelta(minutes=20)
-        c.execute("""
-            INSERT INTO calls
-            (lead_id, agent, attempt_level, result, priority, next_call_at, done_at, created_at)
-            VALUES (?,?,?,?,?,?,?,?)
-        """, (
-            lead_id,
-            agent,
-            1,
-            random.choice(DEFINITIFS),
-            "NORMAL",
-            None,
-            first_call.isoformat(),
-            now.isoformat()
-        ))
-        continue
+        return [(lead_id, agent, 1, random.choice(DEFINITIFS), "NORMAL",
+                 None, first_call.isoformat(), created_at)]
 
     # =====================
     # CAS 2 — lead avec plusieurs appels, dernier définitif
     # =====================
-    if i in (3, 4, 5, 6):
+    if case in (3, 4, 5, 6):
         nb_calls = random.choice([3, 4, 5])
         call_time = lead_created + timedelta(minutes=15)
-
+        calls = []
         for lvl in range(1, nb_calls):
-            c.execute("""
-                INSERT INTO calls
-                (lead_id, agent, attempt_level, result, priority, next_call_at, done_at, created_at)
-                VALUES (?,?,?,?,?,?,?,?)
-            """, (
-                lead_id,
-                agent,
-                lvl,
-                random.choice(NON_DEFINITIFS),
-                "NORMAL",
-                None,
-                call_time.isoformat(),
-                now.isoformat()
-            ))
+            calls.append((lead_id, agent, lvl, random.choice(NON_DEFINITIFS), "NORMAL",
+                          None, call_time.isoformat(), created_at))
             call_time += timedelta(minutes=20)
-
         # dernier appel définitif
-        c.execute("""
-            INSERT INTO calls
-            (lead_id, agent, attempt_level, result, priority, next_call_at, done_at, created_at)
-            VALUES (?,?,?,?,?,?,?,?)
-        """, (
-            lead_id,
-            agent,
-            nb_calls,
-            random.choice(DEFINITIFS),
-            "NORMAL",
-            None,
-            call_time.isoformat(),
-            now.isoformat()
-        ))
-        continue
+        calls.append((lead_id, agent, nb_calls, random.choice(DEFINITIFS), "NORMAL",
+                      None, call_time.isoformat(), created_at))
+        return calls
 
     # =====================
     # CAS 3 — lead en cours (non définitif)
     # =====================
     nb_calls = random.choice([1, 2, 3])
     call_time = lead_created + timedelta(minutes=15)
-
+    calls = []
     for lvl in range(1, nb_calls + 1):
-        c.execute("""
-            INSERT INTO calls
-            (lead_id, agent, attempt_level, result, priority, next_call_at, done_at, created_at)
-            VALUES (?,?,?,?,?,?,?,?)
-        """, (
-            lead_id,
-            agent,
-            lvl,
-            random.choice(NON_DEFINITIFS),
-            "NORMAL",
-            None,
-            call_time.isoformat(),
-            now.isoformat()
-        ))
+        calls.append((lead_id, agent, lvl, random.choice(NON_DEFINITIFS), "NORMAL",
+                      None, call_time.isoformat(), created_at))
         call_time += timedelta(minutes=20)
 
     # relance planifiée
     next_call = now + timedelta(minutes=random.choice([30, 60, 120]))
-    c.execute("""
-        INSERT INTO calls
-        (lead_id, agent, attempt_level, result, priority, next_call_at, done_at, created_at)
-        VALUES (?,?,?,?,?,?,?,?)
-    """, (
-        lead_id,
-        agent,
-        nb_calls + 1,
-        "Planifiée",
-        "P1" if i % 3 == 0 else "NORMAL",
-        next_call.isoformat(),
-        None,
-        now.isoformat()
-    ))
+    calls.append((lead_id, agent, nb_calls + 1, "Planifiée", "P1" if p1 else "NORMAL",
+                  next_call.isoformat(), None, created_at))
+    return calls
+
+
+# Base recréée à chaque seed : les ids de leads sont fixés (1..N), sans relire lastrowid.
+# Dates réparties sur une année glissante
+for first in range(1, args.leads + 1, CHUNK):
+    leads, calls = [], []
+    for i in range(first, min(first + CHUNK, args.leads + 1)):
+        lead_created = lead_base - timedelta(minutes=(i * 10) % (365 * 24 * 60))
+        leads.append((
+            i,
+            f"FAKE-LEAD-{i}",
+            f"336000000{i}",
+            projets[i % 2],
+            "Web",
+            lead_created.isoformat(),
+            created_at
+        ))
+        calls.extend(lead_calls(i, lead_created, random.choice(agents), i % 3 == 0))
+
+    c.executemany(INSERT_LEAD, leads)
+    c.executemany(INSERT_CALL, calls)
 
 conn.commit()
 conn.close()
 
-print("✅ Seed métier terminé : appels réalistes, statuts cohérents")
+print(f"✅ Seed métier terminé : {args.leads} leads, appels réalistes, statuts cohérents")
@@ -7,17 +7,57 @@ function qs(params){
     return s ? `?${s}` : "";
 }
 
+// Lectures GET : dernière réponse gardée par URL avec son ETag ; le serveur répond 304
+// sans relire la base si rien n'a été écrit, on resservira alors le corps gardé.
+const ETAG_CACHE_MAX = 50;
+const etagCache = new Map(); // url -> { etag, body, contentType }
+
+function cachedResponse(entry) {
+    return new Response(entry.body, {
+        status: 200,
+        headers: { "Content-Type": entry.contentType, "ETag": entry.etag }
+    });
+}
+
+async function remember(url, response) {
+    const etag = response.headers.get("ETag");
+    if (!etag) {
+        etagCache.delete(url);
+        return;
+    }
+    etagCache.delete(url); // réinsertion : Map garde l'ordre, la plus ancienne sort en premier
+    etagCache.set(url, {
+        etag,
+        body: await response.clone().text(),
+        contentType: response.headers.get("Content-Type") || "application/json"
+    });
+    if (etagCache.size > ETAG_CACHE_MAX) etagCache.delete(etagCache.keys().next().value);
+}
+
 async function fetchWithTimeout(url, options = {}, timeout = 10000) {
     const controller = new AbortController();
     const timeoutId = setTimeout(() => controller.abort(), timeout);
-    
+    const isGet = !options.method || options.method.toUpperCase() === "GET";
+    const cached = isGet ? etagCache.get(url) : null;
+    const headers = cached ? { ...(options.headers || {}), "If-None-Match": cached.etag } : options.headers;
+
     try {
-        const response = await fetch(url, { ...options, signal: controller.signal });
+        // no-store : le cache HTTP du navigateur masquerait les 304 ; on gère l'ETag ici
+        const response = await fetch(url, {
+            ...options,
+            headers,
+            cache: isGet ? "no-store" : options.cache,
+            signal: controller.signal
+        });
         clearTimeout(timeoutId);
+        if (response.status === 304 && cached) {
+            return cachedResponse(cached);
+        }
         if (!response.ok) {
             const error = await response.text();
             throw new Error(error || `HTTP ${response.status}`);
         }
+        if (isGet) await remember(url, response);
         return response;
     } catch (error) {
         clearTimeout(timeoutId);
@@ -1,11 +1,28 @@
 /* ================= PAGINATION CONTROLLER ================= */
 
+// mode "page" : page/limit + total ; mode "cursor" : jeton opaque, coût constant quelle que soit la profondeur
 window.PaginationState = {
-    now: { page: 1, limit: 20 },
-    leads: { page: 1, limit: 20 },
-    calls: { page: 1, limit: 20 }
+    now: { mode: "page", page: 1, limit: 20 },
+    leads: { mode: "cursor", page: 1, limit: 20, cursor: "start", history: [], next: null },
+    calls: { mode: "cursor", page: 1, limit: 20, cursor: "start", history: [], next: null }
 };
 
+function paginationParams(state) {
+    if (state.mode === "cursor") {
+        return { cursor: state.cursor, limit: state.limit };
+    }
+    return { page: state.page, limit: state.limit };
+}
+
+function resetPagination(state) {
+    state.page = 1;
+    if (state.mode === "cursor") {
+        state.cursor = "start";
+        state.history = [];
+        state.next = null;
+    }
+}
+
 function buildPaginationHTML(state, totalPages, onPageChange) {
     if (totalPages <= 1) {
         return '';
@@ -47,6 +64,55 @@ function buildPaginationHTML(state, totalPages, onPageChange) {
     return html;
 }
 
+function buildCursorPaginationHTML(state) {
+    if (!state.history.length && !state.next) {
+        return '';
+    }
+
+    let html = '<button data-cursor="prev"' + (state.history.length ? '' : ' disabled') + '>← Précédent</button>';
+    html += '<button data-cursor="next"' + (state.next ? '' : ' disabled') + '>Suivant →</button>';
+    html += '<span class="info">Page ' + state.page + '</span>';
+
+    return html;
+}
+
+function setupCursorButtons(containerId, state, onPageChange) {
+    const container = document.getElementById(containerId);
+    if (!container) return;
+
+    container.querySelectorAll('button[data-cursor]').forEach(btn => {
+        btn.addEventListener('click', () => {
+            if (btn.getAttribute('data-cursor') === 'next' && state.next) {
+                state.history.push(state.cursor);
+                state.cursor = state.next;
+                state.page += 1;
+            } else if (btn.getAttribute('data-cursor') === 'prev' && state.history.length) {
+                state.cursor = state.history.pop();
+                state.page -= 1;
+            } else {
+                return;
+            }
+            onPageChange();
+        });
+    });
+}
+
+// Rend la pagination d'une réponse d'API, quel que soit le mode
+function renderPagination(containerId, state, response, onPageChange) {
+    const container = document.getElementById(containerId);
+    if (!container) return;
+
+    if (state.mode === "cursor") {
+        state.next = response.next_cursor || null;
+        container.innerHTML = buildCursorPaginationHTML(state);
+        setupCursorButtons(containerId, state, onPageChange);
+        return;
+    }
+
+    container.innerHTML = buildPaginationHTML(state, response.pages || 1, onPageChange);
+    setupPaginationButtons(containerId, state, onPageChange);
+}
+
 function setupPaginationButtons(containerId, state, onPageChange) {
     const container = document.getElementById(containerId);
     if (!container) return;
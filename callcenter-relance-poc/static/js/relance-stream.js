@@ -0,0 +1,29 @@
+/* ================= FLUX RELANCES (SSE) ================= */
+
+// Le serveur pousse les changements (planifiée, terminée, repriorisée) et les KPI :
+// les vues appliquent ces deltas au lieu de recharger listes et dashboard.
+// EventSource se reconnecte seul et renvoie Last-Event-ID : rien n'est perdu.
+// Les handlers reçoivent aussi l'id de l'événement, pour écarter ce qu'une lecture contient déjà.
+(function () {
+    const EVENTS = ["scheduled", "completed", "reprioritized", "kpi", "reset"];
+
+    function connect(handlers) {
+        if (!window.EventSource) return null;
+
+        const source = new EventSource("/relances/stream");
+        EVENTS.forEach(kind => {
+            source.addEventListener(kind, (e) => {
+                const handler = handlers[kind];
+                if (!handler) return;
+                try {
+                    handler(JSON.parse(e.data), e.lastEventId ? Number(e.lastEventId) : null);
+                } catch (error) {
+                    console.error(`RelanceStream ${kind} error:`, error);
+                }
+            });
+        });
+        return source;
+    }
+
+    window.RelanceStream = { connect };
+})();
@@ -67,6 +67,25 @@
         return el;
     }
 
+    function drawDashboard(d) {
+        const el = document.getElementById("view-dashboard");
+        if (!el) return;
+
+        el.innerHTML = `
+          <div class="kpis kpis-hero">
+            <div class="kpi kpi-accent">
+              <div class="kpi-icon">⚡</div>
+              <div class="kpi-title">Réactivité moyenne</div>
+              <div class="kpi-value">${d.reactivite_mean_minutes ?? "—"} min</div>
+            </div>
+            <div class="kpi">
+              <div class="kpi-icon">💪</div>
+              <div class="kpi-title">Combativité</div>
+              <div class="kpi-value">${d.combativite_calls_per_lead}</div>
+            </div>
+          </div>`;
+    }
+
     async function renderDashboard() {
         const el = document.getElementById("view-dashboard");
         if (!el) return;
@@ -75,20 +94,7 @@
             LoadingHandler.show();
             const d = await api.dashboard({});
             LoadingHandler.hide();
-            
-            el.innerHTML = `
-              <div class="kpis kpis-hero">
-                <div class="kpi kpi-accent">
-                  <div class="kpi-icon">⚡</div>
-                  <div class="kpi-title">Réactivité moyenne</div>
-                  <div class="kpi-value">${d.reactivite_mean_minutes ?? "—"} min</div>
-                </div>
-                <div class="kpi">
-                  <div class="kpi-icon">💪</div>
-                  <div class="kpi-title">Combativité</div>
-                  <div class="kpi-value">${d.combativite_calls_per_lead}</div>
-                </div>
-              </div>`;
+            drawDashboard(d);
         } catch (error) {
             LoadingHandler.hide();
             ErrorHandler.showError("Impossible de charger le dashboard");
@@ -156,6 +162,115 @@
         });
     }
 
+    /* ===== VUE "MAINTENANT" : liste locale tenue à jour par le flux ===== */
+    // eventId : dernier événement déjà contenu dans la réponse de /relances.
+    // known : état (pending / done) de chaque call_id vu depuis, page ou hors page :
+    // le total ne bouge que sur un vrai changement d'état, jamais deux fois.
+    const nowList = { rows: [], total: 0, projet: "", eventId: null, known: new Map() };
+
+    // Événements récents, rejoués après un rechargement pour ceux arrivés pendant la requête
+    const NOW_EVENT_LOG = 200;
+    const nowEvents = [];
+
+    function relanceKey(r) {
+        // Même ordre que le serveur : next_call_at puis call_id
+        return [r.next_call_at, r.call_id];
+    }
+
+    function compareRelances(a, b) {
+        const ka = relanceKey(a), kb = relanceKey(b);
+        if (ka[0] !== kb[0]) return ka[0] < kb[0] ? -1 : 1;
+        return ka[1] - kb[1];
+    }
+
+    const refetchNow = debounce(() => renderNow(), 1000);
+
+    function logged(handler) {
+        return (r, id) => {
+            if (id !== null) {
+                nowEvents.push([handler, r, id]);
+                if (nowEvents.length > NOW_EVENT_LOG) nowEvents.shift();
+            }
+            handler(r, id);
+        };
+    }
+
+    function ignored(r, id) {
+        if (nowList.projet && r.projet !== nowList.projet) return true;
+        // Déjà dans la réponse de /relances (ou rejoué après une reconnexion)
+        return id !== null && nowList.eventId !== null && id <= nowList.eventId;
+    }
+
+    function placeRow(r) {
+        // Relance (nouvelle ou déplacée) remise à sa place dans la page 1
+        const state = window.PaginationState.now;
+        const rows = nowList.rows;
+        const i = rows.findIndex(x => x.call_id === r.call_id);
+        if (i !== -1) rows.splice(i, 1);
+
+        const last = rows[rows.length - 1];
+        const unseen = nowList.total - rows.length - 1;  // relances en attente après la page
+        if (!last || compareRelances(r, last) < 0 || unseen <= 0) {
+            rows.push(r);
+            rows.sort(compareRelances);
+            rows.length = Math.min(rows.length, state.limit);
+        } else if (i !== -1) {
+            // Sortie de la page : la suite (non chargée) doit la recompléter
+            refetchNow();
+        }
+    }
+
+    function onRelanceScheduled(r, id = null) {
+        if (ignored(r, id)) return;
+        const previous = nowList.known.get(r.call_id);
+        if (previous === "done") return;  // terminée depuis : événement en retard
+        nowList.known.set(r.call_id, "pending");
+        if (previous === "pending") {
+            onRelanceReprioritized(r, id);
+            return;
+        }
+        nowList.total += 1;
+
+        if (window.PaginationState.now.page !== 1) {
+            // Les pages suivantes se décalent : on recharge (coalescé)
+            refetchNow();
+            return;
+        }
+        placeRow(r);
+        drawNow();
+    }
+
+    function onRelanceCompleted(r, id = null) {
+        if (ignored(r, id)) return;
+        // Jamais vue depuis la lecture : elle y était en attente, donc comptée
+        if (nowList.known.get(r.call_id) === "done") return;
+        nowList.known.set(r.call_id, "done");
+        const state = window.PaginationState.now;
+        nowList.total = Math.max(0, nowList.total - 1);
+        nowList.rows = nowList.rows.filter(x => x.call_id !== r.call_id);
+
+        // Page trop entamée alors que la suite existe : on la recomplète
+        const shown = (state.page - 1) * state.limit + nowList.rows.length;
+        if (nowList.rows.length <= state.limit / 2 && nowList.total > shown) {
+            refetchNow();
+        }
+        drawNow();
+    }
+
+    function onRelanceReprioritized(r, id = null) {
+        if (ignored(r, id)) return;
+        if (nowList.known.get(r.call_id) === "done") return;
+        nowList.known.set(r.call_id, "pending");  // déjà comptée : le total ne change pas
+
+        if (window.PaginationState.now.page !== 1) {
+            // Peut entrer dans la page ou en sortir : ordre des autres pages inconnu
+            refetchNow();
+            return;
+        }
+        placeRow(r);
+        drawNow();
+    }
+
     async function renderNow() {
         const body = document.getElementById("nowBody");
         if (!body) return;
@@ -168,76 +283,18 @@
             const response = await api.relances({ projet, page: state.page, limit: state.limit });
             LoadingHandler.hide();
             
-            const rows = response.data || response;
-            const totalPages = response.pages || 1;
-
-            const fAgent = document.getElementById("f_agent")?.value || "";
-            const fPrio = document.getElementById("f_prio")?.value || "";
-
-            const filtered = rows
-                .filter(r => (!fAgent || r.agent === fAgent) && (!fPrio || r.priority === fPrio))
-                .map(r => {
-                    const date = new Date(r.next_call_at);
-                    const delayMin = Math.floor((Date.now() - date.getTime()) / 60000);
-                    return { ...r, date, delayMin };
-                })
-                .sort((a, b) => b.delayMin - a.delayMin);
-
-            body.innerHTML = "";
-            filtered.forEach(r => {
-                const cd = formatCountdown(r.date);
-                const dateLabel = formatDateFR(r.date);
-                const hourLabel = formatHourFR(r.date);
-
-                const tr = document.createElement("tr");
-                tr.className = `row-action ${cd.late ? "is-late" : ""}`;
-                tr.setAttribute("data-call-id", r.call_id);
-
-                const td1 = document.createElement("td");
-                const countdownDiv = document.createElement("div");
-                countdownDiv.className = `countdown ${cd.cls}`;
-                countdownDiv.textContent = cd.label;
-                const dateDiv = document.createElement("div");
-                dateDiv.className = "countdown-date";
-                dateDiv.textContent = dateLabel;
-                td1.appendChild(countdownDiv);
-                td1.appendChild(dateDiv);
-
-                const td2 = document.createElement("td");
-                td2.textContent = sanitize(r.projet);
-
-                const td3 = document.createElement("td");
-                const relanceDiv = document.createElement("div");
-                relanceDiv.className = "relance-level";
-                relanceDiv.textContent = `Relance ${r.attempt_level - 1}`;
-                const timeDiv = document.createElement("div");
-                timeDiv.className = "relance-time";
-                timeDiv.textContent = `à ${hourLabel}`;
-                td3.appendChild(relanceDiv);
-                td3.appendChild(timeDiv);
-
-                const td4 = document.createElement("td");
-                td4.textContent = sanitize(r.priority);
-
-                tr.appendChild(td1);
-                tr.appendChild(td2);
-                tr.appendChild(td3);
-                tr.appendChild(td4);
-
-                tr.addEventListener("click", () => {
-                    openRelance(tr.getAttribute("data-call-id"));
-                });
-
-                body.appendChild(tr);
-            });
-
-            // Render pagination
-            const paginationHtml = buildPaginationHTML(state, totalPages, renderNow);
-            const paginationEl = document.getElementById("pagination-now");
-            if (paginationEl) {
-                paginationEl.innerHTML = paginationHtml;
-                setupPaginationButtons("pagination-now", state, renderNow);
+            nowList.rows = response.data || response;
+            nowList.total = response.total ?? nowList.rows.length;
+            nowList.projet = projet;
+            nowList.eventId = response.event_id ?? null;
+            nowList.known = new Map(nowList.rows.map(r => [r.call_id, "pending"]));
+            // Arrivés pendant la requête : appliqués à l'ancienne liste, rejoués sur la nouvelle
+            if (nowList.eventId !== null) {
+                nowEvents
+                    .filter(([, , id]) => id > nowList.eventId)
+                    .forEach(([handler, r, id]) => handler(r, id));
             }
+            drawNow();
         } catch (error) {
             LoadingHandler.hide();
             ErrorHandler.showError("Impossible de charger les relances");
@@ -245,6 +302,83 @@
         }
     }
 
+    function drawNow() {
+        const body = document.getElementById("nowBody");
+        if (!body) return;
+
+        const state = window.PaginationState.now;
+        const rows = nowList.rows;
+        const totalPages = Math.max(1, Math.ceil(nowList.total / state.limit));
+
+        const fAgent = document.getElementById("f_agent")?.value || "";
+        const fPrio = document.getElementById("f_prio")?.value || "";
+
+        const filtered = rows
+            .filter(r => (!fAgent || r.agent === fAgent) && (!fPrio || r.priority === fPrio))
+            .map(r => {
+                const date = new Date(r.next_call_at);
+                const delayMin = Math.floor((Date.now() - date.getTime()) / 60000);
+                return { ...r, date, delayMin };
+            })
+            .sort((a, b) => b.delayMin - a.delayMin);
+
+        body.innerHTML = "";
+        filtered.forEach(r => {
+            const cd = formatCountdown(r.date);
+            const dateLabel = formatDateFR(r.date);
+            const hourLabel = formatHourFR(r.date);
+
+            const tr = document.createElement("tr");
+            tr.className = `row-action ${cd.late ? "is-late" : ""}`;
+            tr.setAttribute("data-call-id", r.call_id);
+
+            const td1 = document.createElement("td");
+            const countdownDiv = document.createElement("div");
+            countdownDiv.className = `countdown ${cd.cls}`;
+            countdownDiv.textContent = cd.label;
+            const dateDiv = document.createElement("div");
+            dateDiv.className = "countdown-date";
+            dateDiv.textContent = dateLabel;
+            td1.appendChild(countdownDiv);
+            td1.appendChild(dateDiv);
+
+            const td2 = document.createElement("td");
+            td2.textContent = sanitize(r.projet);
+
+            const td3 = document.createElement("td");
+            const relanceDiv = document.createElement("div");
+            relanceDiv.className = "relance-level";
+            relanceDiv.textContent = `Relance ${r.attempt_level - 1}`;
+            const timeDiv = document.createElement("div");
+            timeDiv.className = "relance-time";
+            timeDiv.textContent = `à ${hourLabel}`;
+            td3.appendChild(relanceDiv);
+            td3.appendChild(timeDiv);
+
+            const td4 = document.createElement("td");
+            td4.textContent = sanitize(r.priority);
+
+            tr.appendChild(td1);
+            tr.appendChild(td2);
+            tr.appendChild(td3);
+            tr.appendChild(td4);
+
+            tr.addEventListener("click", () => {
+                openRelance(tr.getAttribute("data-call-id"));
+            });
+
+            body.appendChild(tr);
+        });
+
+        // Render pagination
+        const paginationHtml = buildPaginationHTML(state, totalPages, renderNow);
+        const paginationEl = document.getElementById("pagination-now");
+        if (paginationEl) {
+            paginationEl.innerHTML = paginationHtml;
+            setupPaginationButtons("pagination-now", state, renderNow);
+        }
+    }
+
     async function renderLeads() {
         const body = document.getElementById("leadsBody");
         if (!body) return;
@@ -252,11 +386,10 @@
         try {
             const state = window.PaginationState.leads;
             LoadingHandler.show();
-            const response = await api.listLeads({ page: state.page, limit: state.limit });
+            const response = await api.listLeads(paginationParams(state));
             LoadingHandler.hide();
             
             const rows = response.data || response;
-            const totalPages = response.pages || 1;
 
             body.innerHTML = "";
             rows.forEach(r => {
@@ -289,12 +422,7 @@
             });
 
             // Render pagination
-            const paginationHtml = buildPaginationHTML(state, totalPages, renderLeads);
-            const paginationEl = document.getElementById("pagination-leads");
-            if (paginationEl) {
-                paginationEl.innerHTML = paginationHtml;
-                setupPaginationButtons("pagination-leads", state, renderLeads);
-            }
+            renderPagination("pagination-leads", state, response, renderLeads);
         } catch (error) {
             LoadingHandler.hide();
             ErrorHandler.showError("Impossible de charger les leads");
@@ -309,11 +437,10 @@
         try {
             const state = window.PaginationState.calls;
             LoadingHandler.show();
-            const response = await api.listCalls({ page: state.page, limit: state.limit });
+            const response = await api.listCalls(paginationParams(state));
             LoadingHandler.hide();
             
             const rows = response.data || response;
-            const totalPages = response.pages || 1;
 
             body.innerHTML = "";
             rows.forEach(r => {
@@ -347,12 +474,7 @@
             });
 
             // Render pagination
-            const paginationHtml = buildPaginationHTML(state, totalPages, renderCalls);
-            const paginationEl = document.getElementById("pagination-calls");
-            if (paginationEl) {
-                paginationEl.innerHTML = paginationHtml;
-                setupPaginationButtons("pagination-calls", state, renderCalls);
-            }
+            renderPagination("pagination-calls", state, response, renderCalls);
         } catch (error) {
             LoadingHandler.hide();
             ErrorHandler.showError("Impossible de charger les appels");
@@ -414,20 +536,49 @@
                 show(b.dataset.target);
                 
                 // Reset pagination to page 1 when changing tab
-                window.PaginationState.now.page = 1;
-                window.PaginationState.leads.page = 1;
-                window.PaginationState.calls.page = 1;
+                const nowOnFirstPage = window.PaginationState.now.page === 1;
+                resetPagination(window.PaginationState.now);
+                resetPagination(window.PaginationState.leads);
+                resetPagination(window.PaginationState.calls);
                 
-                window.__refreshAll();
+                if (isStreamLive()) {
+                    // Relances et KPI déjà à jour via le flux
+                    if (!nowOnFirstPage) renderNow();
+                    renderLeads();
+                    renderCalls();
+                } else {
+                    window.__refreshAll();
+                }
             });
         });
 
         show("prod");
     }
 
+    let relanceStream = null;
+
+    function isStreamLive() {
+        return !!relanceStream && relanceStream.readyState === EventSource.OPEN;
+    }
+
+    function connectRelanceStream() {
+        relanceStream = window.RelanceStream?.connect({
+            scheduled: logged(onRelanceScheduled),
+            completed: logged(onRelanceCompleted),
+            reprioritized: logged(onRelanceReprioritized),
+            kpi: drawDashboard,
+            // Événements perdus (client lent, redémarrage serveur) : rechargement complet
+            reset: () => {
+                renderNow();
+                renderDashboard();
+            }
+        });
+    }
+
     document.addEventListener("DOMContentLoaded", () => {
         bindMainTabs();
         window.__refreshAll();
+        connectRelanceStream();
 
         // Initialize agent filter
         updateAgentFilter("");
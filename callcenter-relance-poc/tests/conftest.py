@@ -0,0 +1,51 @@
+"""Fixtures : une base seedée dans un dossier temporaire (CALLS_DB), jamais calls.db"""
+
+from contextlib import closing
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_LEADS = 300
+TMP_DIR = tempfile.mkdtemp(prefix="relance-tests-")
+
+def seed(path: str, leads: int = SEED_LEADS):
+    """Base au schéma d'origine (user_version 0), comme en production avant migrations"""
+    subprocess.run(
+        [sys.executable, os.path.join(APP_DIR, "seed_fake_data_metier.py"), "--db", path, "--leads", str(leads)],
+        check=True, capture_output=True
+    )
+
+# ================= SESSION =================
+def pytest_configure(config):
+    # Avant tout import de relance : relance.db.pool lit CALLS_DB à l'import
+    os.environ["CALLS_DB"] = os.path.join(TMP_DIR, "calls.db")
+    seed(os.environ["CALLS_DB"])
+    sys.path.insert(0, APP_DIR)
+    os.chdir(APP_DIR)  # static/ et index.html, montés en chemins relatifs
+
+def pytest_unconfigure(config):
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+@pytest.fixture(scope="session")
+def client():
+    """L'app démarrée une fois (verrou, migrations, scheduler, writer) sur la base de test"""
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def db(client):
+    """Connexion de lecture directe à la base servie, archive attachée"""
+    from relance.db.pool import DB, attach_archive
+
+    with closing(attach_archive(sqlite3.connect(DB))) as c:
+        yield c
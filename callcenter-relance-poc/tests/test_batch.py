@@ -0,0 +1,64 @@
+"""Lots : un élément en échec n'annule que son SAVEPOINT, le reste du lot est écrit"""
+
+import relance.routes.actions
+import relance.routes.relances
+
+def failing_rollup(monkeypatch, module, fail_lead_id):
+    """rollup_call de `module` lève pour un lead, après les premières écritures de l'élément"""
+    rollup_call = module.rollup_call
+
+    def rollup(c, lead_id, *args, **kwargs):
+        if lead_id == fail_lead_id:
+            raise RuntimeError("rollup en échec")
+        return rollup_call(c, lead_id, *args, **kwargs)
+
+    monkeypatch.setattr(module, "rollup_call", rollup)
+
+def lead_state(db, lead_id):
+    return (
+        db.execute("SELECT phone FROM leads WHERE id=?", (lead_id,)).fetchone()[0],
+        db.execute("SELECT COUNT(*) FROM calls WHERE lead_id=?", (lead_id,)).fetchone()[0],
+        db.execute("SELECT call_count FROM lead_stats WHERE lead_id=?", (lead_id,)).fetchone()[0],
+    )
+
+def test_actions_batch_rolls_back_failed_item_only(client, db, monkeypatch):
+    lead_ids = [20, 21, 22]
+    before = {lead_id: lead_state(db, lead_id) for lead_id in lead_ids}
+    failing_rollup(monkeypatch, relance.routes.actions, 21)
+
+    r = client.post("/actions/batch", json={
+        "agent": "agent-lot", "attempt_level": 1, "result": "Pas de réponse", "priority": "NORMAL",
+        "items": [{"lead_id": lead_id, "phone": f"3370000{lead_id}"} for lead_id in lead_ids],
+    })
+
+    body = r.json()
+    assert (body["saved"], body["errors"]) == (2, 1)
+    assert body["results"][1] == {"index": 1, "error": "Write failed"}
+    # L'appel inséré et le téléphone modifié avant l'échec sont annulés
+    assert lead_state(db, 21) == before[21]
+    for lead_id in (20, 22):
+        phone, calls, call_count = lead_state(db, lead_id)
+        assert phone == f"3370000{lead_id}"
+        assert (calls, call_count) == (before[lead_id][1] + 1, before[lead_id][2] + 1)
+
+def test_complete_batch_rolls_back_failed_item_only(client, db, monkeypatch):
+    pending = db.execute("""
+        SELECT id, lead_id FROM calls
+        WHERE done_at IS NULL AND next_call_at IS NOT NULL AND leased_by IS NULL
+        ORDER BY id LIMIT 3 OFFSET 10
+    """).fetchall()
+    assert len(pending) == 3
+    failing_rollup(monkeypatch, relance.routes.relances, pending[1][1])
+
+    r = client.post("/relances/complete-batch", json={
+        "result": "Qualifié", "priority": "NORMAL",
+        "items": [{"call_id": call_id} for call_id, _ in pending],
+    })
+
+    body = r.json()
+    assert (body["completed"], body["errors"]) == (2, 1)
+    done = dict(db.execute(
+        f"SELECT id, done_at IS NOT NULL FROM calls WHERE id IN ({','.join('?' * 3)})",
+        [call_id for call_id, _ in pending]
+    ).fetchall())
+    assert [done[call_id] for call_id, _ in pending] == [1, 0, 1]
@@ -0,0 +1,60 @@
+"""État tenu à jour par les écritures de l'API égal à une reconstruction complète"""
+
+from datetime import datetime, timedelta
+
+from relance.agents import rebuild_agent_stats
+from relance.calendar import PARIS
+from relance.kpi import KPI, KpiEngine
+from relance.lead_stats import rebuild_lead_stats
+from relance.plans import PLAN_FILTERS
+from relance.rollups import ROLLUP_MEASURES, rebuild_rollups
+
+# (table, rebuild) ; lignes retombées à zéro par un -1 : absentes d'une reconstruction
+DERIVED = [
+    ("SELECT * FROM lead_stats", rebuild_lead_stats),
+    (f"SELECT * FROM kpi_rollups WHERE {' OR '.join(ROLLUP_MEASURES)}", rebuild_rollups),
+    ("SELECT * FROM agent_stats WHERE calls_done OR pending OR definitive OR attempts_sum", rebuild_agent_stats),
+]
+
+def rows(c, sql):
+    return sorted(tuple(round(v, 6) if isinstance(v, float) else v for v in r) for r in c.execute(sql))
+
+def write_through_api(client, db):
+    relance_at = (datetime.now(PARIS) + timedelta(days=1)).replace(tzinfo=None).isoformat(timespec="minutes")
+    lead_id = client.post("/lead", json={
+        "lead_key": "TEST-INCR-1", "projet": "Colisée", "type_lead": "Web",
+        "lead_created_at": datetime.now(PARIS).strftime("%d/%m/%Y %H:%M"),
+    }).json()["lead_id"]
+    action = {"agent": "agent-incr", "attempt_level": 1, "result": "Pas de réponse", "priority": "NORMAL"}
+    assert client.post("/action", json={
+        **action, "lead_id": lead_id, "phone": "33611111111",
+        "relance_level": 2, "relance_at": relance_at,
+    }).json() == {"ok": True}
+    assert client.post("/actions/batch", json={
+        **action, "items": [{"lead_id": lead_id, "phone": "33622222222"} for lead_id in (30, 31, 32)],
+    }).json()["saved"] == 3
+
+    call_id = db.execute("""
+        SELECT id FROM calls
+        WHERE done_at IS NULL AND next_call_at IS NOT NULL AND leased_by IS NULL
+        ORDER BY id DESC LIMIT 1 OFFSET 5
+    """).fetchone()[0]
+    completion = {"result": "Qualifié", "priority": "NORMAL"}
+    assert client.post(f"/relance/{call_id}/complete", json=completion).json() == {"ok": True}
+    # Appel déjà réalisé : change de créneau (rollup -1 / +1) et de résultat
+    assert client.post(f"/relance/{call_id}/complete", json={**completion, "result": "Pas intéressé"}).json() == {"ok": True}
+    assert client.post("/relances/reschedule", json={}).status_code == 200
+
+def test_incremental_state_matches_rebuild(client, db):
+    write_through_api(client, db)
+
+    for sql, rebuild in DERIVED:
+        incremental = rows(db, sql)
+        rebuild(db)
+        assert rows(db, sql) == incremental, sql
+        db.rollback()
+
+    rebuilt = KpiEngine()
+    rebuilt.load(db)
+    for projet, type_lead in PLAN_FILTERS:
+        assert KPI.snapshot(projet, type_lead) == rebuilt.snapshot(projet, type_lead)
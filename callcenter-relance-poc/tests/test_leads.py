@@ -0,0 +1,24 @@
+"""/leads (lead_stats) égal à la requête de référence sur calls"""
+
+import pytest
+
+from relance.plans import LEADS_REFERENCE_SQL, PLAN_FILTERS, check_leads_equivalence
+from relance.queries import filter_where
+
+PAGE_SIZE = 50
+
+def test_leads_sql_matches_reference(db):
+    assert check_leads_equivalence(db) == []
+
+@pytest.mark.parametrize("projet, type_lead", PLAN_FILTERS)
+def test_leads_route_matches_reference(client, db, projet, type_lead):
+    where, params = filter_where([], projet, type_lead)
+    reference_sql = LEADS_REFERENCE_SQL.format(where=("WHERE " + " AND ".join(where)) if where else "")
+    for page in (1, 2, 3):
+        body = client.get("/leads", params={
+            "projet": projet, "type_lead": type_lead, "page": page, "limit": PAGE_SIZE,
+        }).json()
+        got = [(r["lead_id"], r["lead_key"], r["phone"], r["projet"], r["type_lead"], r["lead_created_at"],
+                r["last_result"], r["last_done_at"], r["call_count"]) for r in body["data"]]
+        expected = [r[:8] + r[9:] for r in db.execute(reference_sql, params + [PAGE_SIZE, (page - 1) * PAGE_SIZE])]
+        assert got == expected
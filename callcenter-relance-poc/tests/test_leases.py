@@ -0,0 +1,55 @@
+"""Réservation des relances : 409 pour un autre agent, en mémoire comme en base"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from relance.calendar import PARIS
+from relance.scheduler import SCHEDULER, lease_clock
+
+PENDING_SQL = """
+    SELECT c.id, l.projet, c.priority FROM calls_named c JOIN leads_named l ON l.id=c.lead_id
+    WHERE c.done_at IS NULL AND c.next_call_at IS NOT NULL
+"""
+
+def leased_by(db, call_id):
+    return db.execute("SELECT leased_by FROM calls WHERE id=?", (call_id,)).fetchone()[0]
+
+@pytest.fixture
+def due_relance(db):
+    """Relance en attente rendue due (le seed les planifie dans les deux heures)"""
+    call_id, projet, priority = db.execute(PENDING_SQL + "ORDER BY c.id LIMIT 1").fetchone()
+    due = (datetime.now(PARIS) - timedelta(hours=1)).replace(tzinfo=None).isoformat(timespec="seconds")
+    db.execute("UPDATE calls SET next_call_at=? WHERE id=?", (due, call_id))
+    db.commit()
+    SCHEDULER.schedule(call_id, projet, priority, due)
+    return call_id
+
+def test_claimed_relance_is_refused_to_another_agent(client, db, due_relance):
+    claimed = client.post("/relances/next", json={"agent": "agent-a"}).json()["relance"]
+    assert claimed is not None
+    call_id = claimed["call_id"]
+    assert leased_by(db, call_id) == "agent-a"
+
+    r = client.get(f"/relance/{call_id}", params={"agent": "agent-b"})
+    assert r.status_code == 409
+    assert "agent-a" in r.json()["error"]
+    assert client.post(f"/relance/{call_id}/release", json={"agent": "agent-b"}).status_code == 409
+
+    assert client.post(f"/relance/{call_id}/release", json={"agent": "agent-a"}).status_code == 200
+    assert leased_by(db, call_id) is None
+    assert client.get(f"/relance/{call_id}", params={"agent": "agent-b"}).status_code == 200
+    assert leased_by(db, call_id) == "agent-b"
+    client.post(f"/relance/{call_id}/release", json={"agent": "agent-b"})
+
+def test_lease_held_in_database_is_refused(client, db):
+    # Réservation écrite par un autre process (ou avant un redémarrage) : absente du scheduler
+    call_id = db.execute(PENDING_SQL + "ORDER BY c.id DESC LIMIT 1").fetchone()[0]
+    db.execute("UPDATE calls SET leased_by=?, lease_until=? WHERE id=?", ("autre-process", lease_clock(300), call_id))
+    db.commit()
+
+    r = client.get(f"/relance/{call_id}", params={"agent": "agent-c"})
+    assert r.status_code == 409
+    assert "autre-process" in r.json()["error"]
+    assert leased_by(db, call_id) == "autre-process"
+    assert SCHEDULER.holder(call_id) == "autre-process"
@@ -0,0 +1,6 @@
+"""Garde-fou des plans de requêtes sur la base migrée"""
+
+from relance.plans import check_query_plans
+
+def test_query_plans_without_full_scan(db):
+    assert check_query_plans(db) == []